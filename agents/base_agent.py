@@ -1,19 +1,53 @@
+import threading
+import time
 from abc import ABC, abstractmethod
 
 # this base agent uses a simple bdi architecture (beliefs, desires, intentions)
 class BaseAgent(ABC):
+    # blackboard keys whose changes make an attached agent run
+    watches = ()
+
     def __init__(self):
         self.beliefs = {}
         self.desires = {}
         self.intentions = []
+        # source name -> rate limiter, a research session shares one set between all of its agents
+        self.rate_limiters = {}
+        # runs can start from several threads at once when the agent is attached to a blackboard
+        self.planning_lock = threading.Lock()
+
+    # waits for the source's rate limiter when there is one, otherwise for the fixed delay the agent always used.
+    # a cancel token cuts the wait short and raises cancel.Cancelled
+    def throttle(self, source, fallback_delay=0, token=None):
+        limiter = self.rate_limiters.get(source)
+        if limiter is not None:
+            limiter.acquire(token)
+        elif fallback_delay:
+            if token is not None:
+                token.wait(fallback_delay)
+            else:
+                time.sleep(fallback_delay)
+        if token is not None:
+            token.check()
 
     @abstractmethod
     def formulate_intentions(self, blackboard: dict):
         pass
 
 
-    # the run method is the main entry point for an agent's execution cycle
+    # the run method is the main entry point for an agent's execution cycle. the blackboard can be a plain dict
+    # or a Blackboard, and intentions are planned under a lock so concurrent runs each act on their own plan
     def run(self, blackboard: dict):
-        self.formulate_intentions(blackboard)
-        for intention in self.intentions:
+        with self.planning_lock:
+            self.formulate_intentions(blackboard)
+            intentions = self.intentions
+        for intention in intentions:
             intention()
+
+    # called with each change to a watched key once the agent is attached, by default the agent just runs again
+    def react(self, blackboard, change):
+        self.run(blackboard)
+
+    # the agent reacts whenever one of its watched keys changes, call the returned function to detach it
+    def attach(self, blackboard):
+        return blackboard.subscribe(self.watches, lambda change: self.react(blackboard, change))
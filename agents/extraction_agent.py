@@ -1,61 +1,130 @@
-import time
 import requests
 import xml.etree.ElementTree as ET
 import re
-import io
-import pdfplumber
-from bs4 import BeautifulSoup
 from .base_agent import BaseAgent
-import os
-import google.generativeai as genai
-import json
 
-from dotenv import load_dotenv
-
-from logging_config import logger
+import cpu_pool
+from cancel import CancelToken, Cancelled
+from extraction_backends import DOI_PATTERN, BackendError, BackendRouter, Document, default_backends
+from fetch import SIZE_LIMITS, NotAPaper, fetch_document
+from logging_config import SAMPLED, log_context, logger
+from paper import Paper, PaperStatus
+
+# dois are read from the references section when the text has one, so the paper's own doi is not counted
+def reference_dois(text):
+    heading = max(text.rfind('References'), text.rfind('REFERENCES'), text.rfind('Bibliography'))
+    section = text[heading:] if heading != -1 else text
+    found = []
+    for match in DOI_PATTERN.finditer(section):
+        doi = match.group(0).rstrip('.,;)]').lower()
+        if doi not in found:
+            found.append(doi)
+    return found
 
 class ExtractionAgent(BaseAgent):
-    def __init__(self):
+    watches = ("papers",)
+    pubmed_base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+    # a short pause before each request keeps us within the rate limits of the sites we fetch from
+    request_delay = 1
+    # the most bytes read for a pdf or a web page, larger responses are abandoned as they download
+    size_limits = SIZE_LIMITS
+
+    model_name = 'models/gemini-flash-lite-latest'
+
+    # backends are the extraction_backends used for web results that carry no citation metadata, by default the
+    # rules backend and gemini. nothing is set up for them until a document needs it
+    def __init__(self, parse_pool=None, backends=None):
         super().__init__()
         self.desires = {'extract_metadata'}
-        load_dotenv()
-        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
-        self.model = genai.GenerativeModel('models/gemini-flash-lite-latest')
+        # a requests.Session can be set here so every fetch reuses pooled connections
+        self.http = requests
+        # an optional cpu_pool.ParsePool, without one documents are parsed in the calling thread. a cancel token only
+        # stops the wait for a worker, parsing in the calling thread runs to the end
+        self.parse_pool = parse_pool
+        self.router = BackendRouter(backends if backends is not None else default_backends(self.model_name))
+
+    def pdf_text(self, content, token=None):
+        if self.parse_pool:
+            return self.parse_pool.pdf_text(content, token)
+        return cpu_pool.pdf_text(content)
+
+    def html_metadata(self, content, token=None):
+        if self.parse_pool:
+            return self.parse_pool.html_metadata(content, token)
+        return cpu_pool.html_metadata(content)
+
+    def html_text(self, content, token=None):
+        if self.parse_pool:
+            return self.parse_pool.html_text(content, token)
+        return cpu_pool.html_text(content)
 
     # this method is used to decide what the agent should do next
     def formulate_intentions(self, blackboard):
-        self.intentions = []
-        papers = blackboard.get("papers", [])
-        for paper in papers:
-            if not paper.get('abstract') or not paper.get('authors'):
-                self.intentions.append(lambda p=paper: self.extract_metadata(p))
+        papers = [Paper.coerce(paper) for paper in blackboard.get("papers") or []]
+        self.intentions = [lambda: self.extract_batch(blackboard, papers)] if papers else []
+
+    # once attached, only the batch that was just added to papers is extracted instead of the whole list
+    def react(self, blackboard, change):
+        if change.added is None:
+            self.run(blackboard)
+        else:
+            self.extract_batch(blackboard, change.added)
 
-    def extract_metadata(self, paper_info: dict) -> dict:
-        if paper_info.get('abstract') and paper_info.get('authors'):
-            return paper_info
+    # the whole batch is added to extracted_data at once, papers that are not usable are left out the same way the
+    # pipeline leaves them out
+    def extract_batch(self, blackboard, papers):
+        from pipeline import is_usable
 
-        url = paper_info.get('url')
+        extracted = [self.extract_metadata(paper) for paper in papers]
+        completed = [paper for paper in extracted if is_usable(paper)]
+        if hasattr(blackboard, 'extend'):
+            blackboard.extend("extracted_data", completed)
+        else:
+            blackboard["extracted_data"] = list(blackboard.get("extracted_data") or []) + completed
+        return extracted
+
+    # the paper is filled in place and its status records how extraction went, failed papers keep what they had.
+    # a cancel token caps every wait and request at the search's deadline, and a paper cut short is marked cancelled.
+    # fetch stats, when given, count the bytes downloaded and the bytes not downloaded for responses that were not papers.
+    # a references list, when given, gets the dois cited by a web result that turns out to be a pdf, from the same download
+    def extract_metadata(self, paper_info: Paper, token=None, stats=None, references=None) -> Paper:
+        paper_info = Paper.coerce(paper_info)
+        token = token or CancelToken()
+        try:
+            with log_context(paper_id=paper_info.identifier):
+                paper_info = self.fetch_metadata(paper_info, token, stats, references)
+        except Cancelled:
+            paper_info.status = PaperStatus.CANCELLED
+        # a request that timed out because the deadline passed says nothing about the site, so it is cancelled too
+        if paper_info.failed and token.cancelled:
+            paper_info.status = PaperStatus.CANCELLED
+        return paper_info
+
+    def fetch_metadata(self, paper_info, token, stats=None, references=None):
+        if paper_info.has_metadata:
+            return paper_info.finish()
+
+        url = paper_info.url
         if not url:
-            return {**paper_info, 'authors': [], 'abstract': 'N/A'}
+            return paper_info.finish()
 
-        logger.info(f"Extracting missing metadata from: {url}")
+        logger.info("Extracting missing metadata from: %s", url, extra=SAMPLED)
 
         if "pubmed.ncbi.nlm.nih.gov" in url:
             try:
-                time.sleep(1)
+                self.throttle('pubmed', self.request_delay, token)
                 pmid = url.strip('/').split('/')[-1]
-                base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-                fetch_url = f"{base_url}efetch.fcgi?db=pubmed&id={pmid}&retmode=xml"
+                fetch_url = f"{self.pubmed_base_url}efetch.fcgi?db=pubmed&id={pmid}&retmode=xml"
 
-                api_response = requests.get(fetch_url, timeout=15)
+                api_response = self.http.get(fetch_url, timeout=token.timeout(15))
                 api_response.raise_for_status()
                 root = ET.fromstring(api_response.content)
                 article = root.find(".//PubmedArticle")
 
                 if article:
-                    logger.info(f"Successfully extracted metadata for {url} from API.")
+                    logger.info("Successfully extracted metadata for %s from API.", url, extra=SAMPLED)
                     title_element = article.find(".//ArticleTitle")
-                    paper_info['title'] = title_element.text if title_element is not None else "N/A"
+                    paper_info.title = title_element.text if title_element is not None else None
                     author_list = article.findall(".//Author")
                     authors = []
                     for author in author_list:
@@ -63,13 +132,13 @@ class ExtractionAgent(BaseAgent):
                         fore_name = author.find("ForeName")
                         if last_name is not None and fore_name is not None:
                             authors.append(f"{fore_name.text} {last_name.text}")
-                    paper_info['authors'] = authors if authors else ['N/A']
+                    paper_info.authors = authors
                     abstract_text_elements = article.findall(".//Abstract/AbstractText")
-                    paper_info['abstract'] = " ".join([elem.text for elem in abstract_text_elements if elem.text]) or 'N/A'
+                    paper_info.abstract = " ".join([elem.text for elem in abstract_text_elements if elem.text]) or None
                     journal_title_element = article.find(".//Journal/Title")
-                    paper_info['venue'] = journal_title_element.text if journal_title_element is not None else 'N/A'
+                    paper_info.venue = journal_title_element.text if journal_title_element is not None else None
                     pub_date_element = article.find(".//PubDate/Year")
-                    year = "N/A"
+                    year = None
                     if pub_date_element is not None:
                         year = pub_date_element.text
                     else:
@@ -78,118 +147,98 @@ class ExtractionAgent(BaseAgent):
                             match = re.search(r'\d{4}', medline_date.text)
                             if match:
                                 year = match.group(0)
-                    paper_info['year'] = year
+                    paper_info.year = year
                     doi_element = article.find(".//ArticleId[@IdType='doi']")
-                    paper_info['doi'] = doi_element.text if doi_element is not None else 'N/A'
-                    return paper_info
+                    paper_info.doi = doi_element.text if doi_element is not None else None
+                return paper_info.finish()
 
             except (requests.exceptions.RequestException, ET.ParseError) as e:
-                logger.error(f"PubMed API call failed for {url}: {e}")
-                return {**paper_info, 'title': 'Extraction Failed', 'authors': [], 'abstract': 'Extraction Failed'}
-
+                logger.error("PubMed API call failed for %s: %s", url, e)
+                paper_info.status = PaperStatus.API_ERROR
+                return paper_info
 
-        elif paper_info.get('source') == 'Web':
-            url = paper_info.get('url')
-            if not url:
-                return {**paper_info, 'authors': [], 'abstract': 'N/A'}
 
-            logger.info(f"Fetching URL: {url}")
+        elif paper_info.source == 'Web':
+            logger.info("Fetching URL: %s", url, extra=SAMPLED)
             try:
-                response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=15)
-                response.raise_for_status()
-
-                content_type = response.headers.get('content-type', '')
+                self.throttle('web', token=token)
+                fetched = fetch_document(self.http, url, headers={'User-Agent': 'Mozilla/5.0'}, timeout=token.timeout(15),
+                                         token=token, limits=self.size_limits, stats=stats)
 
                 # different content types require different parsing strategies
-                if 'application/pdf' in content_type:
-                    logger.info(f"PDF detected, parsing content from: {url}")
-                    with io.BytesIO(response.content) as pdf_file:
-                        with pdfplumber.open(pdf_file) as pdf:
-                            content = " ".join(page.extract_text() for page in pdf.pages)
+                if fetched.kind == 'pdf':
+                    logger.info("PDF detected, parsing content from: %s", url, extra=SAMPLED)
+                    content = self.pdf_text(fetched.content, token)
+                    # the reference list of a pdf is the only citation data we have for papers that are not in pubmed
+                    if references is not None:
+                        references.extend(reference_dois(content))
                 else:
-                    logger.info(f"Parsing HTML content from: {url}")
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    content = soup.get_text()
-
+                    logger.info("Parsing HTML content from: %s", url, extra=SAMPLED)
+                    # pages that carry full citation metadata do not need the model at all
+                    metadata = self.html_metadata(fetched.content, token)
+                    if metadata['title'] and metadata['authors'] and metadata['abstract']:
+                        logger.info("Using citation metadata from page: %s", url, extra=SAMPLED)
+                        paper_info.title = metadata['title']
+                        paper_info.authors = metadata['authors']
+                        paper_info.abstract = metadata['abstract']
+                        paper_info.year = metadata['year']
+                        paper_info.doi = metadata['doi']
+                        return paper_info.finish()
+                    content = self.html_text(fetched.content, token)
+
+            # videos, archives and oversized downloads are dropped without retrying
+            except NotAPaper:
+                paper_info.status = PaperStatus.NOT_ACADEMIC
+                return paper_info
             except (requests.exceptions.RequestException, Exception) as e:
-                logger.error(f"Could not fetch or parse content from: {url}: {e}")
-                return {**paper_info, 'authors': [], 'abstract': 'Fetch/Parse Error'}
-
-            truncated_content = content
-
-            prompt = f"First, determine if the following text is from an academic paper. If it is, output the title, authors, publication date, abstract, and DOI. The authors should be a list of strings, with each string being the full name of an author, with spaces between first and last names. For example, 'John Smith'. Return the information in a JSON object with the keys 'title', 'authors', 'publication_date', 'abstract', and 'doi'. If it is not an academic paper, return the string 'not an academic paper'.\n\nText:{truncated_content}"
-
-            logger.info(f"Running metadata extraction model for: {url}")
-
-            # the gemini api can be flaky, so we retry with exponential backoff
-            max_retries = 3
-            base_delay = 2
-            for attempt in range(max_retries):
-                try:
-                    response = self.model.generate_content(prompt)
-                    break
-                except Exception as e:
-                    logger.warning(f"Gemini API call failed on attempt {attempt + 1}/{max_retries} for {url}: {e}")
-                    if attempt < max_retries - 1:
-                        time.sleep(base_delay * (2 ** attempt))
-                    else:
-                        logger.error(f"All {max_retries} Gemini API calls failed for {url}.")
-                        return {**paper_info, 'authors': [], 'abstract': 'API Error'}
+                logger.error("Could not fetch or parse content from: %s: %s", url, e)
+                paper_info.status = PaperStatus.PARSE_ERROR
+                return paper_info
 
-            logger.info(f"Gemini API Response:\n{response}")
+            logger.info("Running metadata extraction for: %s", url, extra=SAMPLED)
+            try:
+                backend, metadata = self.router.extract(
+                    Document(url, fetched.kind, content), token, lambda backend: self.throttle(backend.name, token=token)
+                )
+            except BackendError as e:
+                logger.error("No extraction backend could handle %s: %s", url, e)
+                paper_info.status = PaperStatus.API_ERROR
+                return paper_info
 
-            if "not an academic paper" in response.text.lower():
-                logger.info(f"Skipping non-academic paper: {url}")
+            if metadata is None:
+                logger.info("Skipping non-academic paper: %s", url, extra=SAMPLED)
+                paper_info.status = PaperStatus.NOT_ACADEMIC
                 return paper_info
+            logger.info("Extracted %s with the %s backend.", url, backend.name, extra=SAMPLED)
+            for field, value in metadata.items():
+                setattr(paper_info, field, value)
 
-            try:
-                match = re.search(r'```json\n(.*?)\n```', response.text, re.DOTALL)
-                if match:
-                    json_text = match.group(1)
-                else:
-                    json_text = response.text
-                metadata = json.loads(json_text)
-                paper_info['title'] = metadata.get('title', 'N/A')
-                paper_info['authors'] = metadata.get('authors', ['N/A'])
-                paper_info['year'] = metadata.get('publication_date', 'N/A')
-                paper_info['abstract'] = metadata.get('abstract', 'N/A')
-                paper_info['doi'] = metadata.get('doi', 'N/A')
-            except (json.JSONDecodeError, AttributeError) as e:
-                logger.error(f"Could not parse JSON from Gemini API response: {e}")
-                paper_info['abstract'] = response.text
-
-            return paper_info
+            return paper_info.finish()
         else:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/102.0.0.0 Safari/537.36'
             }
             try:
-                time.sleep(1)
-                response = requests.get(url, headers=headers, timeout=15)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
-
-                if not paper_info.get('authors'):
-                    authors = [meta['content'] for meta in soup.find_all('meta', {'name': 'citation_author'})]
-                    if not authors:
-                        author_tags = soup.find_all('a', class_=['author', 'authors'])
-                        authors = [tag.text for tag in author_tags]
-                    paper_info['authors'] = authors or ['N/A']
-
-                if not paper_info.get('abstract'):
-                    abstract_tag = soup.find('div', class_=['abstract', 'abstract-content'])
-                    abstract = abstract_tag.text.strip() if abstract_tag else 'N/A'
-                    if abstract == 'N/A':
-                        meta_abstract = soup.find('meta', {'name': ['citation_abstract', 'description']})
-                        if meta_abstract:
-                            abstract = meta_abstract['content']
-                    paper_info['abstract'] = abstract or 'N/A'
+                self.throttle('web', self.request_delay, token)
+                document = fetch_document(self.http, url, headers=headers, timeout=token.timeout(15), token=token,
+                                          limits=self.size_limits, stats=stats)
+                metadata = self.html_metadata(document.content, token)
 
-                return paper_info
+                if not paper_info.authors:
+                    paper_info.authors = metadata['authors']
+
+                if not paper_info.abstract:
+                    paper_info.abstract = metadata['abstract']
+
+                return paper_info.finish()
 
+            except NotAPaper:
+                return paper_info.finish()
             except requests.exceptions.RequestException as e:
-                logger.error(f"Could not fetch or timed out for {url}: {e}")
-                return {**paper_info, 'authors': paper_info.get('authors', ['N/A']), 'abstract': 'Fetch Error'}
+                logger.error("Could not fetch or timed out for %s: %s", url, e)
+                paper_info.status = PaperStatus.FETCH_ERROR
+                return paper_info
             except Exception as e:
-                logger.error(f"An error occurred during extraction from {url}: {e}")
-                return {**paper_info, 'authors': paper_info.get('authors', ['N/A']), 'abstract': 'Extraction Error'}
+                logger.error("An error occurred during extraction from %s: %s", url, e)
+                paper_info.status = PaperStatus.EXTRACTION_ERROR
+                return paper_info
@@ -0,0 +1,29 @@
+from .base_agent import BaseAgent
+from logging_config import logger
+
+class RankingAgent(BaseAgent):
+    def __init__(self, ranker=None):
+        super().__init__()
+        self.desires = {'rank_results'}
+        # the ranker is kept between runs so vectors of papers that were already seen are reused. one agent can rank
+        # several blackboards, so what was ranked last is read from the blackboard rather than kept here
+        self.ranker = ranker
+
+    # ranking is only redone when more papers have been extracted since the last run
+    def formulate_intentions(self, blackboard):
+        papers = blackboard.get("extracted_data") or []
+        if blackboard.get("query") and len(papers) != len(blackboard.get("ranked") or []):
+            self.intentions = [lambda: self.rank(blackboard)]
+        else:
+            self.intentions = []
+
+    def rank(self, blackboard):
+        if self.ranker is None:
+            from ranking import PaperRanker
+
+            self.ranker = PaperRanker()
+
+        ranked = self.ranker.rank(blackboard["query"], blackboard["extracted_data"])
+        # both keys change together, so a reader never sees the ranking next to the unranked list
+        blackboard.update(ranked=ranked, extracted_data=[result.paper for result in ranked])
+        logger.info("Ranked %s papers for '%s'.", len(ranked), blackboard['query'])
@@ -1,20 +1,42 @@
 import os
-import arxiv
+import time
 import requests
 import xml.etree.ElementTree as ET
+from urllib.parse import quote
 
 from .base_agent import BaseAgent
 import threading
-from ddgs import DDGS
 
+from cancel import CancelToken, Cancelled
 from logging_config import logger
+from paper import Paper
+
+DAY = 24 * 60 * 60
+
+def ddg_timelimit(age):
+    for limit, seconds in (('d', DAY), ('w', 7 * DAY), ('m', 31 * DAY), ('y', 366 * DAY)):
+        if age <= seconds:
+            return limit
+    return None
 
 class SearchAgent(BaseAgent):
+    pubmed_base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+
     def __init__(self):
         super().__init__()
         self.desires = {'find_papers'}
+        # a requests.Session can be set here so every request reuses pooled connections
+        self.http = requests
+        self._arxiv_client = None
 
-        self.arxiv_client = arxiv.Client(page_size=20, delay_seconds=3, num_retries=3)
+    # the arxiv and duckduckgo clients are imported on first use to keep startup fast
+    @property
+    def arxiv_client(self):
+        if self._arxiv_client is None:
+            import arxiv
+
+            self._arxiv_client = arxiv.Client(page_size=20, delay_seconds=3, num_retries=3)
+        return self._arxiv_client
 
     # this method is used to decide what the agent should do next
     def formulate_intentions(self, blackboard):
@@ -34,62 +56,111 @@ class SearchAgent(BaseAgent):
         search_pubmed_flag = blackboard.get("search_pubmed", True)
         search_web_flag = blackboard.get("search_web", True)
 
-        logger.info(f"Searching for: {query}...")
+        # watch queries pass the high-water marks of their last run so that only newer papers are requested,
+        # each thread records its new mark in the same dict once its search has succeeded
+        since = blackboard.get("since") or {}
+        marks = blackboard.setdefault("high_water_marks", {})
+        # a cancel token stops every source early, each one still reports what it found before that
+        token = blackboard.get("cancel_token")
+        # with a StageTimings on the blackboard each search records how long it took from its own start to its results
+        timings = blackboard.get("timings")
+        if timings is not None:
+            arxiv_callback = self._timed(timings, "search.arxiv", arxiv_callback)
+            pubmed_callback = self._timed(timings, "search.pubmed", pubmed_callback)
+            web_callback = self._timed(timings, "search.web", web_callback)
+
+        logger.info("Searching for: %s...", query)
 
         # using threads here allows us to search all sources at once, which is much faster
         if search_arxiv_flag:
-            arxiv_thread = threading.Thread(target=self.search_arxiv_thread, args=(query, arxiv_limit, arxiv_callback, arxiv_event))
+            arxiv_thread = threading.Thread(target=self.search_arxiv_thread, args=(query, arxiv_limit, arxiv_callback, arxiv_event, since.get("arxiv"), marks, token))
             arxiv_thread.start()
 
 
 
         if search_pubmed_flag:
-            pubmed_thread = threading.Thread(target=self.search_pubmed_thread, args=(query, pubmed_limit, pubmed_callback, pubmed_event))
+            pubmed_thread = threading.Thread(target=self.search_pubmed_thread, args=(query, pubmed_limit, pubmed_callback, pubmed_event, since.get("pubmed"), marks, token))
             pubmed_thread.start()
 
         if search_web_flag:
-            web_thread = threading.Thread(target=self.search_web_thread, args=(query, ddg_limit, web_callback, web_event))
+            web_thread = threading.Thread(target=self.search_web_thread, args=(query, ddg_limit, web_callback, web_event, since.get("web"), marks, token))
             web_thread.start()
 
-    def search_arxiv_thread(self, query, limit, callback=None, event=None):
+    # the clock starts when the search is started, the callback stops it before anything it triggers runs
+    def _timed(self, timings, stage, callback):
+        start = time.perf_counter()
+
+        def timed_callback(found):
+            timings.record(stage, time.perf_counter() - start)
+            if callback:
+                callback(found)
+        return timed_callback
+
+    # since is the iso timestamp of the newest submission seen before, results then come newest first and stop there
+    def search_arxiv_thread(self, query, limit, callback=None, event=None, since=None, marks=None, token=None):
+        token = token or CancelToken()
         try:
+            import arxiv
+
             logger.info("Starting arXiv search...")
             search = arxiv.Search(
                 query=query,
                 max_results=limit,
-                sort_by=arxiv.SortCriterion.Relevance
+                sort_by=arxiv.SortCriterion.SubmittedDate if since else arxiv.SortCriterion.Relevance
             )
-            results = list(self.arxiv_client.results(search))
+            self.throttle('arxiv', token=token)
+            results = []
+            # the arxiv client pages through results itself, so a cancelled search stops between results
+            for result in self.arxiv_client.results(search):
+                if since and result.published.isoformat() <= since:
+                    break
+                results.append(result)
+                if token.cancelled:
+                    break
             logger.info("arXiv search finished.")
+            # the newest submission is only known once the search ran to the end
+            if marks is not None and not token.cancelled:
+                newest = max((result.published.isoformat() for result in results), default=since)
+                if newest:
+                    marks["arxiv"] = newest
             arxiv_papers = [
-                {
-                    'title': result.title,
-                    'url': result.pdf_url,
-                    'authors': [author.name for author in result.authors],
-                    'abstract': result.summary,
-                    'source': 'arXiv',
-                    'year': result.published.year,
-                    'doi': result.doi
-                }
+                Paper(
+                    title=result.title,
+                    url=result.pdf_url,
+                    authors=[author.name for author in result.authors],
+                    abstract=result.summary,
+                    source='arXiv',
+                    year=str(result.published.year),
+                    doi=result.doi
+                ).finish()
                 for result in results
             ]
             if callback:
                 callback(arxiv_papers)
+        except Cancelled:
+            logger.info("arXiv search cancelled.")
         except Exception as e:
-            logger.error(f"An error occurred in the arXiv search thread: {e}")
+            logger.error("An error occurred in the arXiv search thread: %s", e)
         finally:
             if event:
                 event.set()
 
 
 
-    def search_pubmed_thread(self, query, limit, callback=None, event=None):
+    # since is a YYYY/MM/DD date, only records added to pubmed on or after it are returned
+    def search_pubmed_thread(self, query, limit, callback=None, event=None, since=None, marks=None, token=None):
+        token = token or CancelToken()
         try:
             logger.info("Starting PubMed search...")
-            base_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
-            search_url = f"{base_url}esearch.fcgi?db=pubmed&term={query.replace(' ', '+')}&retmax={limit}"
-            response = requests.get(search_url)
+            search_url = f"{self.pubmed_base_url}esearch.fcgi?db=pubmed&term={query.replace(' ', '+')}&retmax={limit}"
+            if since:
+                search_url += f"&datetype=edat&mindate={since}&maxdate=3000"
+            searched_on = time.strftime("%Y/%m/%d")
+            self.throttle('pubmed', token=token)
+            response = self.http.get(search_url, timeout=token.timeout(None))
             response.raise_for_status()
+            if marks is not None:
+                marks["pubmed"] = searched_on
             root = ET.fromstring(response.content)
             id_list = [id_elem.text for id_elem in root.findall(".//Id")]
 
@@ -100,37 +171,66 @@ class SearchAgent(BaseAgent):
 
             pubmed_papers = []
             for pmid in id_list:
-                pubmed_papers.append({
-                    'url': f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/",
-                    'source': 'PubMed'
-                })
+                pubmed_papers.append(Paper(url=f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/", source='PubMed'))
 
             if callback:
                 callback(pubmed_papers)
 
+        except Cancelled:
+            logger.info("PubMed search cancelled.")
         finally:
             if event:
                 event.set()
 
-    def search_web_thread(self, query, limit, callback=None, event=None):
+    # duckduckgo has no exact date filter, so since (a unix time) only narrows the search to the last day, week, month or year
+    def search_web_thread(self, query, limit, callback=None, event=None, since=None, marks=None, token=None):
+        token = token or CancelToken()
         try:
             logger.info("Starting Web search...")
             # filetype:pdf is used to increase the chances of finding a direct link to a pdf
             search_query = f"{query} academic papers filetype:pdf"
-            logger.info(f"Searching DuckDuckGo for: {search_query}")
-            with DDGS() as ddgs:
-                results = list(ddgs.text(search_query, max_results=limit, region='uk-en', safesearch='moderate'))
-            web_papers = [
-                {
-                    'url': result['href'],
-                    'source': 'Web'
-                }
-                for result in results
-            ]
+            logger.info("Searching DuckDuckGo for: %s", search_query)
+            searched_at = time.time()
+            self.throttle('ddg', token=token)
+            results = self.ddg_text(search_query, limit, timelimit=ddg_timelimit(searched_at - since) if since else None)
+            if marks is not None:
+                marks["web"] = searched_at
+            web_papers = [Paper(url=result['href'], source='Web') for result in results]
             if callback:
                 callback(web_papers)
+        except Cancelled:
+            logger.info("Web search cancelled.")
         except Exception as e:
-            logger.error(f"An error occurred in the Web search thread: {e}")
+            logger.error("An error occurred in the Web search thread: %s", e)
         finally:
             if event:
                 event.set()
+
+    # one elink call returns both the papers a pubmed record cites and the papers that cite it
+    def pubmed_links(self, pmid):
+        link_url = f"{self.pubmed_base_url}elink.fcgi?dbfrom=pubmed&db=pubmed&cmd=neighbor&id={pmid}"
+        self.throttle('pubmed')
+        response = self.http.get(link_url, timeout=15)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        links = {'references': [], 'cited_by': []}
+        for linkset in root.findall(".//LinkSetDb"):
+            name = linkset.findtext("LinkName")
+            key = {'pubmed_pubmed_refs': 'references', 'pubmed_pubmed_citedin': 'cited_by'}.get(name)
+            if key:
+                links[key] = [id_elem.text for id_elem in linkset.findall("./Link/Id")]
+        return links
+
+    def pubmed_id_for_doi(self, doi):
+        search_url = f"{self.pubmed_base_url}esearch.fcgi?db=pubmed&term={quote(doi)}[doi]&retmax=1"
+        self.throttle('pubmed')
+        response = self.http.get(search_url, timeout=15)
+        response.raise_for_status()
+        id_elem = ET.fromstring(response.content).find(".//Id")
+        return id_elem.text if id_elem is not None else None
+
+    def ddg_text(self, search_query, limit, timelimit=None):
+        from ddgs import DDGS
+
+        with DDGS() as ddgs:
+            return list(ddgs.text(search_query, max_results=limit, region='uk-en', safesearch='moderate', timelimit=timelimit))
@@ -1,7 +1,16 @@
+import itertools
 import json
+import os
+import threading
 from .base_agent import BaseAgent
+import export
+import library
+from paper import Paper
 
 class StorageAgent(BaseAgent):
+    # several watch queries can append to the same library at once
+    append_lock = threading.Lock()
+
     def __init__(self, filepath='research_digest.json'):
         super().__init__()
         self.desires = {'save_metadata'}
@@ -28,41 +37,40 @@ class StorageAgent(BaseAgent):
 
         # simple deduplication based on doi or url
         seen = set()
-        unique_papers = []
+        papers = []
         for paper in metadata_list:
-            identifier = paper.get('doi') or paper.get('url')
+            paper = Paper.coerce(paper)
+            identifier = paper.identifier
             if identifier not in seen:
-                unique_papers.append(paper)
+                papers.append(paper)
                 seen.add(identifier)
 
-        harvard_style_references = []
-        for paper in unique_papers:
-            authors = paper.get('authors', [])
-            year = paper.get('year', 'N/A')
-            title = paper.get('title', 'N/A')
-            source = paper.get('source', 'N/A')
-            venue = paper.get('venue', 'N/A')
-            doi = paper.get('doi', 'N/A')
-            url = paper.get('url', 'N/A')
-            abstract = paper.get('abstract', 'N/A')
-
-            harvard_style_references.append({
-                "authors": authors,
-                "year": year,
-                "title": title,
-                "source": source,
-                "venue": venue,
-                "doi": doi,
-                "url": url,
-                "abstract": abstract
-            })
-
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(harvard_style_references, f, indent=4, ensure_ascii=False)
+            # a .jsonl library is appended to one paper per line, so new papers never rewrite the old ones
+            if filepath.endswith('.jsonl'):
+                lines = "".join(paper.to_json() + "\n" for paper in papers)
+                with self.append_lock, open(filepath, 'a', encoding='utf-8') as f:
+                    f.write(lines)
+            # a .lib library is rewritten with the new papers after the ones it already holds. the old records are
+            # streamed from the mapped file and looked up through its index, so they are never all held in memory
+            elif filepath.endswith('.lib'):
+                with self.append_lock:
+                    if os.path.exists(filepath):
+                        with library.Library(filepath) as existing:
+                            new = [paper for paper in papers if not paper.identifier or paper.identifier not in existing]
+                            library.write_library(itertools.chain(existing, new), filepath)
+                    else:
+                        library.write_library(papers, filepath)
+            # bibtex, ris, csv, parquet and arrow files are written by the exporter
+            elif export.format_for(filepath):
+                export.export(papers, filepath)
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump([paper.to_dict() for paper in papers], f, indent=4, ensure_ascii=False)
             self.processed_data_count = len(metadata_list)
             print("save successful.")
             blackboard["storage_complete"] = True
-        except IOError as e:
+        # parquet and arrow files need pyarrow, which is optional, so a missing install fails the save like a full disk
+        except (IOError, ImportError, library.LibraryError) as e:
             print(f"error saving to file {filepath}: {e}")
             blackboard["status"] = "error"
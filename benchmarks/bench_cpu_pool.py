@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cpu_pool
+
+PDFS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'web', name) for name in ('paper_a.pdf', 'paper_b.pdf')]
+
+def load_batch(size):
+    contents = []
+    for path in PDFS:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    return [contents[i % len(contents)] for i in range(size)]
+
+
+def run(batch, workers, max_tasks_per_child):
+    with cpu_pool.ParsePool(max_workers=workers, max_tasks_per_child=max_tasks_per_child) as pool:
+        # one document per worker first, so process start up is not counted as parsing time
+        for future in [pool.submit(cpu_pool.pdf_text_file, batch[0]) for _ in range(workers)]:
+            future.result()
+        start = time.perf_counter()
+        futures = [pool.submit(cpu_pool.pdf_text_file, content) for content in batch]
+        for future in futures:
+            future.result()
+        return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure pdf text extraction throughput for different numbers of worker processes.")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="*", help="worker counts to try, defaults to powers of two up to the core count")
+    parser.add_argument("--max-tasks-per-child", type=int, default=cpu_pool.DEFAULT_MAX_TASKS_PER_CHILD)
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or sorted({1, cores, *(2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores)})
+    batch = load_batch(args.batch)
+
+    start = time.perf_counter()
+    for content in batch[:20]:
+        cpu_pool.pdf_text(content)
+    in_process = 20 / (time.perf_counter() - start)
+    print(f"{args.batch} pdfs, {cores} cores")
+    print(f"{'in process':<14}{in_process:>10.1f} docs/s")
+
+    for count in workers:
+        elapsed = run(batch, count, args.max_tasks_per_child)
+        rate = len(batch) / elapsed
+        print(f"{f'{count} workers':<14}{rate:>10.1f} docs/s{rate / in_process:>8.2f}x")
+
+if __name__ == '__main__':
+    main()
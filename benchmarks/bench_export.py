@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import resource
+
+import export
+from library import Library
+
+FORMATS = ('bibtex', 'ris', 'csv', 'parquet', 'arrow', 'library')
+EXTENSIONS = {fmt: ext for ext, fmt in export.FORMATS.items()}
+WORDS = [f"word{i}" for i in range(5000)]
+
+# the library is generated line by line, so making a million records does not need a million in memory either
+def write_library(path, count, seed=7):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            record = {
+                'title': " ".join(rng.choices(WORDS, k=10)).title(),
+                'authors': [f"Author{rng.randrange(100000)} Name{j}" for j in range(rng.randint(1, 6))],
+                'year': str(rng.randint(1990, 2026)),
+                'source': rng.choice(('arXiv', 'PubMed', 'Web')),
+                'venue': rng.choice((None, 'Journal of Examples', 'Proceedings of Benchmarks')),
+                'doi': f"10.{1000 + i % 9000}/bench.{i}",
+                'url': f"https://example.com/papers/{i}",
+                'abstract': " ".join(rng.choices(WORDS, k=150)),
+                'status': 'complete',
+            }
+            f.write(json.dumps(record) + "\n")
+
+
+# each export runs in its own process, so its peak memory is not hidden by the generator or other formats
+def run_child(library, output, fmt):
+    start = time.perf_counter()
+    count = export.export(export.iter_library(library), output, fmt)
+    seconds = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({'records': count, 'seconds': seconds, 'peak_memory_mb': peak_kb / 1024}))
+
+
+# the point of a .lib file is opening it and looking papers up without reading it all, so that is timed against loading the jsonl
+def time_lookups(library, output, count, lookups=1000):
+    start = time.perf_counter()
+    papers = {paper.doi: paper for paper in export.iter_library(library)}
+    load_seconds = time.perf_counter() - start
+
+    rng = random.Random(1)
+    dois = [f"10.{1000 + i % 9000}/bench.{i}" for i in rng.sample(range(count), min(lookups, count))]
+    start = time.perf_counter()
+    with Library(output) as mapped:
+        open_seconds = time.perf_counter() - start
+        found = sum(mapped.get(doi) is not None for doi in dois)
+    lookup_seconds = time.perf_counter() - start - open_seconds
+    assert found == len(dois) and len(papers) == count
+    print(f"open .lib: {open_seconds * 1000:.2f} ms, {len(dois)} doi lookups in {lookup_seconds * 1000:.1f} ms "
+          f"(loading the jsonl into a dict takes {load_seconds:.1f}s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure export speed and peak memory for a large library.")
+    parser.add_argument("--records", type=int, default=1000000)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--child", nargs=3, metavar=("LIBRARY", "OUTPUT", "FORMAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(*args.child)
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        library = os.path.join(tmpdir, 'library.jsonl')
+        start = time.perf_counter()
+        write_library(library, args.records)
+        print(f"library:  {args.records} records, {os.path.getsize(library) / 1e6:.0f} MB, generated in {time.perf_counter() - start:.1f}s")
+        print(f"{'format':<10}{'seconds':>10}{'MB out':>10}{'peak MB':>10}")
+        for fmt in args.formats:
+            output = os.path.join(tmpdir, f"export{EXTENSIONS[fmt]}")
+            result = subprocess.run([sys.executable, __file__, "--child", library, output, fmt], capture_output=True, text=True)
+            if result.returncode:
+                print(f"{fmt:<10}failed: {result.stderr.strip().splitlines()[-1]}")
+                continue
+            report = json.loads(result.stdout)
+            print(f"{fmt:<10}{report['seconds']:>10.1f}{os.path.getsize(output) / 1e6:>10.0f}{report['peak_memory_mb']:>10.0f}")
+            if fmt == 'library':
+                time_lookups(library, output, args.records)
+            os.remove(output)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import html_backend
+
+PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'web')
+
+# the path extract_metadata used before the pluggable backends, kept here as the point of comparison
+def soup_full_document(content):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(content, 'html.parser')
+    [meta['content'] for meta in soup.find_all('meta', {'name': 'citation_author'})]
+    soup.find('div', class_=['abstract', 'abstract-content'])
+    soup.find('meta', {'name': ['citation_abstract', 'description']})
+    return soup.get_text()
+
+
+def targeted(backend):
+    def run(content):
+        metadata = html_backend.extract_metadata(content, backend)
+        if not (metadata['title'] and metadata['authors'] and metadata['abstract']):
+            html_backend.extract_text(content, backend)
+    return run
+
+
+def time_per_page(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(content)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare html parsing backends on the fixture pages.")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    candidates = [('bs4 full document (old)', soup_full_document)]
+    candidates += [(f"{backend} targeted", targeted(backend)) for backend in html_backend.available_backends()]
+
+    pages = sorted(name for name in os.listdir(PAGES) if name.endswith('.html'))
+    print(f"{'backend':<26}" + "".join(f"{name:>16}" for name in pages))
+    for label, func in candidates:
+        row = []
+        for name in pages:
+            with open(os.path.join(PAGES, name), 'rb') as f:
+                content = f.read()
+            row.append(time_per_page(func, content, args.repeat) * 1000)
+        print(f"{label:<26}" + "".join(f"{ms:>13.2f} ms" for ms in row))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# each target runs in a fresh interpreter so nothing is already imported
+TARGETS = {
+    'gui': "import gui",
+    'gui_window': (
+        "from PyQt6.QtWidgets import QApplication\n"
+        "import gui\n"
+        "app = QApplication([])\n"
+        "window = gui.MainWindow()\n"
+        "window.show()\n"
+        "app.processEvents()"
+    ),
+    'pipeline': "import pipeline",
+    'extraction_agent': "import agents.extraction_agent",
+    'search_agent': "import agents.search_agent",
+}
+
+# python -X importtime writes one line per module with its self and cumulative time in microseconds,
+# nested imports are indented by two spaces per level
+def parse_importtime(stderr):
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def profile(code):
+    env = {**os.environ, 'QT_QPA_PLATFORM': os.environ.get('QT_QPA_PLATFORM', 'offscreen')}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return elapsed, parse_importtime(result.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold start and import time of the application entry points.")
+    parser.add_argument("targets", nargs="*", default=list(TARGETS))
+    parser.add_argument("--top", type=int, default=5, help="show the slowest top level imports of each target")
+    parser.add_argument("--budget", type=float, default=1.0, help="seconds a cold start may take before it is flagged")
+    args = parser.parse_args(argv)
+
+    # modules the interpreter loads on its own are left out of the listing
+    _, startup = profile("pass")
+    startup_modules = {m[0] for m in startup}
+
+    over_budget = []
+    for target in args.targets:
+        elapsed, modules = profile(TARGETS[target])
+        flag = "  OVER BUDGET" if elapsed > args.budget else ""
+        print(f"{target:<18}{elapsed:>8.3f}s{flag}")
+        # only modules imported directly by the target are listed, the rest are included in their cumulative time
+        direct = sorted((m for m in modules if m[1] == 1 and m[0] not in startup_modules), key=lambda m: m[3], reverse=True)
+        for name, _, _, cumulative_us in direct[:args.top]:
+            print(f"    {name:<40}{cumulative_us / 1e6:>8.3f}s")
+        if elapsed > args.budget:
+            over_budget.append(target)
+    return 1 if over_budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
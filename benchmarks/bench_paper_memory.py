@@ -0,0 +1,61 @@
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from paper import Paper
+
+RECORDS = 100_000
+
+# every record gets its own strings so that interning does not hide the per-record cost
+def make_dict(i):
+    return {
+        'title': f"Paper {i}",
+        'authors': [f"Author {i}"],
+        'year': '2023',
+        'source': 'arXiv',
+        'venue': 'N/A',
+        'doi': f"10.1234/{i}",
+        'url': f"http://arxiv.org/pdf/{i}",
+        'abstract': f"Abstract {i}",
+    }
+
+def make_paper(i):
+    return Paper(
+        title=f"Paper {i}",
+        authors=[f"Author {i}"],
+        year='2023',
+        source='arXiv',
+        doi=f"10.1234/{i}",
+        url=f"http://arxiv.org/pdf/{i}",
+        abstract=f"Abstract {i}",
+    ).finish()
+
+def measure(factory, count):
+    tracemalloc.start()
+    records = [factory(i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, current
+
+def main(count=RECORDS):
+    _, dict_bytes = measure(make_dict, count)
+    papers, paper_bytes = measure(make_paper, count)
+
+    start = time.perf_counter()
+    lines = [paper.to_json() for paper in papers]
+    dump_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for line in lines:
+        Paper.from_json(line)
+    load_seconds = time.perf_counter() - start
+
+    print(f"records:              {count}")
+    print(f"dict records:         {dict_bytes / 1e6:.1f} MB ({dict_bytes / count:.0f} B/record)")
+    print(f"Paper records:        {paper_bytes / 1e6:.1f} MB ({paper_bytes / count:.0f} B/record)")
+    print(f"saving:               {100 * (1 - paper_bytes / dict_bytes):.0f}%")
+    print(f"to_json:              {count / dump_seconds:,.0f} records/s")
+    print(f"from_json:            {count / load_seconds:,.0f} records/s")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else RECORDS)
@@ -0,0 +1,194 @@
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import requests
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from agents.search_agent import SearchAgent
+from agents.extraction_agent import ExtractionAgent
+from agents.storage_agent import StorageAgent
+from benchmarks.stub_server import StubServer
+from extraction_backends import GeminiBackend, HTTPBackend, RulesBackend
+from pipeline import StageTimings, run_pipeline
+from yield_tracker import YieldTracker
+
+# timings from one machine say nothing about another, so the baseline is recorded locally and never committed
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+QUERY = "graph neural networks"
+
+# searches go to the stub server instead of arxiv, pubmed and duckduckgo
+class OfflineSearchAgent(SearchAgent):
+    def __init__(self, base_url):
+        super().__init__()
+        self.base_url = base_url
+        self.pubmed_base_url = f"{base_url}/eutils/"
+        self.arxiv_client.query_url_format = f"{base_url}/arxiv/api/query?{{}}"
+        self.arxiv_client.delay_seconds = 0
+
+    def ddg_text(self, search_query, limit, timelimit=None):
+        response = requests.get(f"{self.base_url}/ddg", params={'q': search_query, 'max_results': limit}, timeout=15)
+        response.raise_for_status()
+        return response.json()
+
+
+# the stub server answers in place of gemini from the recorded responses, declared at gemini's price so the
+# router still prefers the rules backend for the pdfs it can read
+def make_agents(base_url, output_path):
+    stub_model = HTTPBackend(f"{base_url}/gemini", name='gemini', cost=GeminiBackend.cost, latency=GeminiBackend.latency)
+    extraction_agent = ExtractionAgent(backends=[RulesBackend(), stub_model])
+    extraction_agent.pubmed_base_url = f"{base_url}/eutils/"
+    extraction_agent.request_delay = 0
+    return OfflineSearchAgent(base_url), extraction_agent, StorageAgent(output_path)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# peak resident memory of this process, which covers the parsed documents as well as the agents
+def peak_memory_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes and macos reports bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+
+def run_benchmark(iterations=3, latency=0.0, route_latency=None):
+    timings = StageTimings()
+    total_papers = 0
+    backends = {}
+    # the yield is recorded without adapting, so every iteration does the same work and runs stay comparable
+    yield_tracker = YieldTracker(path=None, adaptive=False)
+    with tempfile.TemporaryDirectory() as tmpdir, StubServer(latency=latency, route_latency=route_latency) as server:
+        output_path = os.path.join(tmpdir, 'research_digest.json')
+        start = time.perf_counter()
+        for _ in range(iterations):
+            search_agent, extraction_agent, storage_agent = make_agents(server.url, output_path)
+            with timings.time("pipeline"):
+                papers = run_pipeline(QUERY, search_agent=search_agent, extraction_agent=extraction_agent, storage_agent=storage_agent, timings=timings,
+                                      yield_tracker=yield_tracker)
+            total_papers += len(papers)
+            for name, stats in extraction_agent.router.stats.items():
+                totals = backends.setdefault(name, dict.fromkeys(stats, 0))
+                for key, value in stats.items():
+                    totals[key] += value
+        elapsed = time.perf_counter() - start
+
+    return {
+        'iterations': iterations,
+        'latency': latency,
+        'papers': total_papers,
+        'wall_seconds': elapsed,
+        'throughput_papers_per_s': total_papers / elapsed if elapsed else 0.0,
+        'peak_memory_mb': peak_memory_mb(),
+        'stages': {
+            stage: {'count': len(samples), 'p50': percentile(samples, 50), 'p95': percentile(samples, 95)}
+            for stage, samples in sorted(timings.samples.items())
+        },
+        'backends': backends,
+        'yield': yield_tracker.report(),
+    }
+
+
+# a metric regresses when it is worse than the baseline by more than the tolerance. stage timings also have to be
+# worse by at least min_seconds, ten milliseconds either way on a stage that takes ten is thread scheduling noise.
+# the first run is the cold one, so with a different number of runs the medians are not comparable and only p95 is
+def compare_to_baseline(report, baseline, tolerance=0.25, min_seconds=0.02):
+    regressions = []
+
+    def higher_is_worse(name, current, previous, floor=0.0):
+        if current is not None and previous and current > previous + max(previous * tolerance, floor):
+            regressions.append(f"{name}: {current:.4f} vs baseline {previous:.4f}")
+
+    throughput, previous = report.get('throughput_papers_per_s'), baseline.get('throughput_papers_per_s')
+    if throughput is not None and previous and throughput < previous * (1 - tolerance):
+        regressions.append(f"throughput_papers_per_s: {throughput:.2f} vs baseline {previous:.2f}")
+    higher_is_worse('peak_memory_mb', report.get('peak_memory_mb'), baseline.get('peak_memory_mb'))
+    keys = ('p50', 'p95') if report.get('iterations') == baseline.get('iterations') else ('p95',)
+    for stage, stats in report.get('stages', {}).items():
+        previous_stats = baseline.get('stages', {}).get(stage)
+        if previous_stats:
+            for key in keys:
+                higher_is_worse(f"{stage}.{key}", stats[key], previous_stats[key], min_seconds)
+    return regressions
+
+
+def print_report(report):
+    print(f"papers:      {report['papers']} over {report['iterations']} runs (injected latency {report['latency']}s)")
+    print(f"throughput:  {report['throughput_papers_per_s']:.2f} papers/s")
+    if report['peak_memory_mb'] is not None:
+        print(f"peak memory: {report['peak_memory_mb']:.1f} MB")
+    print(f"{'stage':<16}{'count':>7}{'p50 (s)':>12}{'p95 (s)':>12}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<16}{stats['count']:>7}{stats['p50']:>12.4f}{stats['p95']:>12.4f}")
+    print(f"{'backend':<16}{'docs':>7}{'failed':>8}{'seconds':>10}{'cost ($)':>10}")
+    for name, stats in report.get('backends', {}).items():
+        print(f"{name:<16}{stats['documents']:>7}{stats['failures']:>8}{stats['seconds']:>10.2f}{stats['cost']:>10.4f}")
+    print(f"{'source':<16}{'fetched':>8}{'usable':>8}{'yield':>8}{'$/usable':>10}")
+    for source, stats in report.get('yield', {}).items():
+        cost_per_usable = f"{stats['cost_per_usable']:.4f}" if stats['cost_per_usable'] is not None else "-"
+        print(f"{source:<16}{stats['candidates']:>8}{stats['usable']:>8}{stats['yield']:>8.0%}{cost_per_usable:>10}")
+
+
+def parse_route_latency(values):
+    route_latency = {}
+    for value in values or []:
+        route, seconds = value.split('=')
+        route_latency[route] = float(seconds)
+    return route_latency
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the full pipeline against recorded fixtures and report performance.")
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every stub response")
+    parser.add_argument("--route-latency", action="append", metavar="ROUTE=SECONDS", help="per route latency, e.g. gemini=0.5 or web=0.1")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-seconds", type=float, default=0.02, help="stage timings must also be this much slower to count")
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.iterations, args.latency, parse_route_latency(args.route_latency))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}, run with --save-baseline to record one on this machine.")
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        regressions = compare_to_baseline(report, json.load(f), args.tolerance, args.min_seconds)
+    if regressions:
+        print("regressions against baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("no regressions against baseline.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
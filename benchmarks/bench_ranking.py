@@ -0,0 +1,45 @@
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from paper import Paper
+from ranking import PaperRanker
+
+WORDS = [f"term{i}" for i in range(20000)]
+
+def make_papers(count, seed=7):
+    rng = random.Random(seed)
+    papers = []
+    for i in range(count):
+        title = " ".join(rng.choices(WORDS[:2000], k=10))
+        abstract = " ".join(rng.choices(WORDS, k=180))
+        papers.append(Paper(title=title, abstract=abstract, url=f"http://example.com/{i}"))
+    return papers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how long ranking a batch of results takes.")
+    parser.add_argument("--papers", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    papers = make_papers(args.papers)
+    query = " ".join(WORDS[:3])
+    ranker = PaperRanker()
+
+    start = time.perf_counter()
+    ranker.rank(query, papers)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ranker.rank(query, papers)
+    warm = time.perf_counter() - start
+
+    print(f"papers:           {args.papers}")
+    print(f"rank, cold cache: {cold:.3f}s")
+    print(f"rank, warm cache: {warm:.3f}s (vectors for every paper cached)")
+
+if __name__ == '__main__':
+    main()
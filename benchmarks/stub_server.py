@@ -0,0 +1,138 @@
+import json
+import os
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+CONTENT_TYPES = {
+    '.pdf': 'application/pdf',
+    '.html': 'text/html; charset=utf-8',
+}
+
+# pages containing one of these markers are answered as a real model would answer for a non-paper
+NOT_ACADEMIC_MARKERS = ('Ten Tips For Training Graph Models',)
+
+def read_fixture(name, mode='rb'):
+    with open(os.path.join(FIXTURES, name), mode) as f:
+        return f.read()
+
+
+# replays recorded responses for every service the pipeline talks to, so benchmarks never touch the network
+class StubServer:
+    def __init__(self, latency=0.0, route_latency=None, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.route_latency = route_latency or {}
+        self.gemini_calls = 0
+        self.lock = threading.Lock()
+        self.fixtures = {
+            'arxiv': read_fixture('arxiv_query.xml'),
+            'esearch': read_fixture('pubmed_esearch.xml'),
+            'efetch': read_fixture('pubmed_efetch.xml', 'r'),
+            'ddg': json.loads(read_fixture('ddg_results.json')),
+            'gemini': read_fixture('gemini_response.txt', 'r'),
+            'gemini_not_academic': read_fixture('gemini_not_academic.txt', 'r'),
+        }
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def delay_for(self, path):
+        route = path.strip('/').split('/')[0]
+        return self.route_latency.get(route, self.latency)
+
+    def ddg_results(self, limit):
+        results = self.fixtures['ddg'][:limit]
+        return [{**result, 'href': self.url + result['href']} for result in results]
+
+    def esearch_results(self, retmax):
+        ids = re.findall(rb'<Id>\d+</Id>', self.fixtures['esearch'])
+        kept = b"\n".join(ids[:retmax])
+        return re.sub(rb'<IdList>.*</IdList>', b'<IdList>\n' + kept + b'\n</IdList>', self.fixtures['esearch'], flags=re.DOTALL)
+
+    def gemini_response(self, prompt):
+        if any(marker in prompt for marker in NOT_ACADEMIC_MARKERS):
+            return self.fixtures['gemini_not_academic']
+        with self.lock:
+            self.gemini_calls += 1
+            n = self.gemini_calls
+        return self.fixtures['gemini'].replace('{n}', str(n))
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_body(self, body, content_type, status=200):
+                if isinstance(body, str):
+                    body = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = parse_qs(parsed.query)
+                time.sleep(server.delay_for(parsed.path))
+
+                if parsed.path == '/arxiv/api/query':
+                    self.send_body(server.fixtures['arxiv'], 'application/atom+xml')
+                elif parsed.path == '/eutils/esearch.fcgi':
+                    self.send_body(server.esearch_results(int(params.get('retmax', ['20'])[0])), 'text/xml')
+                elif parsed.path == '/eutils/efetch.fcgi':
+                    pmid = params.get('id', ['0'])[0]
+                    self.send_body(server.fixtures['efetch'].replace('{pmid}', pmid), 'text/xml')
+                elif parsed.path == '/ddg':
+                    limit = int(params.get('max_results', ['20'])[0])
+                    self.send_body(json.dumps(server.ddg_results(limit)), 'application/json')
+                elif parsed.path.startswith('/web/'):
+                    name = os.path.basename(parsed.path)
+                    path = os.path.join(FIXTURES, 'web', name)
+                    if not os.path.exists(path):
+                        self.send_body('not found', 'text/plain', status=404)
+                        return
+                    self.send_body(read_fixture(os.path.join('web', name)), CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream'))
+                else:
+                    self.send_body('not found', 'text/plain', status=404)
+
+            def do_POST(self):
+                parsed = urlparse(self.path)
+                time.sleep(server.delay_for(parsed.path))
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if parsed.path == '/gemini':
+                    self.send_body(json.dumps({'text': server.gemini_response(body.get('prompt', ''))}), 'application/json')
+                else:
+                    self.send_body('not found', 'text/plain', status=404)
+
+        return Handler
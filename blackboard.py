@@ -0,0 +1,109 @@
+import threading
+from collections import namedtuple
+from collections.abc import MutableMapping
+
+# added holds the new items when a list entry was extended, and is None when the entry was replaced. a deleted
+# entry is reported with a value of None and deleted set
+Change = namedtuple('Change', ['key', 'value', 'added', 'deleted'], defaults=(False,))
+
+
+# the shared store the agents read and write. it behaves like the plain dict the agents were written against,
+# but every write is atomic, lists grow copy-on-write so readers always see a consistent list, and
+# subscribers are told about the keys they care about instead of polling
+class Blackboard(MutableMapping):
+    def __init__(self, initial=None, **kwargs):
+        self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self._data = {**(initial or {}), **kwargs}
+        # key -> callbacks, callbacks under None hear about every key
+        self._subscribers = {}
+
+    def __getitem__(self, key):
+        with self.lock:
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            callbacks = self._write([Change(key, value, None)])
+        self._notify(callbacks)
+
+    def __delitem__(self, key):
+        with self.lock:
+            callbacks = self._write([Change(key, None, None, deleted=True)])
+        self._notify(callbacks)
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self._data))
+
+    def __len__(self):
+        with self.lock:
+            return len(self._data)
+
+    def __repr__(self):
+        return f"Blackboard({self.snapshot()!r})"
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self._data)
+
+    # several keys are set as one change, no reader or waiter sees only some of them
+    def update(self, other=(), **kwargs):
+        items = dict(other, **kwargs)
+        with self.lock:
+            callbacks = self._write([Change(key, value, None) for key, value in items.items()])
+        self._notify(callbacks)
+
+    def setdefault(self, key, default=None):
+        with self.lock:
+            if key in self._data:
+                return self._data[key]
+            callbacks = self._write([Change(key, default, None)])
+        self._notify(callbacks)
+        return default
+
+    # appends a whole batch to a list entry and notifies once, subscribers get just the new items
+    def extend(self, key, items):
+        items = list(items)
+        if not items:
+            return
+        with self.lock:
+            current = self._data.get(key) or []
+            callbacks = self._write([Change(key, list(current) + items, items)])
+        self._notify(callbacks)
+
+    def subscribe(self, keys, callback):
+        keys = [keys] if keys is None or isinstance(keys, str) else list(keys)
+        with self.lock:
+            for key in keys:
+                self._subscribers[key] = self._subscribers.get(key, ()) + (callback,)
+
+        def unsubscribe():
+            with self.lock:
+                for key in keys:
+                    self._subscribers[key] = tuple(cb for cb in self._subscribers.get(key, ()) if cb is not callback)
+        return unsubscribe
+
+    # blocks until predicate(blackboard) is true, returns False if the timeout ran out first
+    def wait_for(self, predicate, timeout=None):
+        with self.changed:
+            return self.changed.wait_for(lambda: predicate(self), timeout)
+
+    def _write(self, changes):
+        for change in changes:
+            if change.deleted:
+                del self._data[change.key]
+            else:
+                self._data[change.key] = change.value
+        self.changed.notify_all()
+        return [
+            (callback, change)
+            for change in changes
+            for callback in self._subscribers.get(change.key, ()) + self._subscribers.get(None, ())
+        ]
+
+    # callbacks run on the writing thread after the lock is released, so they are free to write back
+    @staticmethod
+    def _notify(callbacks):
+        for callback, change in callbacks:
+            callback(change)
@@ -0,0 +1,80 @@
+import threading
+import time
+
+CANCELLED = 'cancelled'
+DEADLINE = 'deadline'
+
+# raised by CancelToken.check. like asyncio.CancelledError it is not an Exception, so the broad except
+# blocks around fetching and parsing do not mistake a stopped search for a broken page
+class Cancelled(BaseException):
+    pass
+
+
+# shared by everything working on one search. it is cancelled by hand (the stop button, a new search) or once
+# its deadline passes, and the agents check it between steps and cap every request timeout at what is left
+class CancelToken:
+    def __init__(self, deadline=None, parent=None):
+        self.deadline = time.monotonic() + deadline if deadline is not None else None
+        self.reason = None
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.callbacks = []
+        self.timer = None
+        if parent is not None:
+            if parent.deadline is not None and (self.deadline is None or parent.deadline < self.deadline):
+                self.deadline = parent.deadline
+            parent.on_cancel(lambda: self.cancel(parent.reason))
+        if self.deadline is not None:
+            self.timer = threading.Timer(max(self.deadline - time.monotonic(), 0), self.cancel, args=(DEADLINE,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def cancel(self, reason=CANCELLED):
+        with self.lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks, self.callbacks = self.callbacks, []
+        if self.timer is not None:
+            self.timer.cancel()
+        for callback in callbacks:
+            callback()
+
+    # a deadline that passed before the timer thread got to run still counts
+    @property
+    def cancelled(self):
+        if not self.event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(DEADLINE)
+        return self.event.is_set()
+
+    # seconds until the deadline, None when there is no deadline
+    def remaining(self):
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def check(self):
+        if self.cancelled:
+            raise Cancelled(self.reason)
+
+    # the timeout for one request, never longer than the time left before the deadline. a default of None
+    # means the request had no timeout of its own
+    def timeout(self, default):
+        self.check()
+        remaining = self.remaining()
+        if remaining is None or default is None:
+            return default if remaining is None else remaining
+        return min(default, remaining)
+
+    # sleeps like time.sleep but wakes as soon as the token is cancelled, returns True if it was
+    def wait(self, seconds):
+        return self.event.wait(seconds)
+
+    # the callback runs once, on the cancelling thread, or straight away if the token is already cancelled
+    def on_cancel(self, callback):
+        with self.lock:
+            if not self.event.is_set():
+                self.callbacks.append(callback)
+                return
+        callback()
@@ -0,0 +1,145 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import html_backend
+from cancel import Cancelled
+from logging_config import logger
+
+# workers are replaced after this many documents so that a leaky parse cannot grow one forever
+DEFAULT_MAX_TASKS_PER_CHILD = 50
+DEFAULT_MEMORY_LIMIT_MB = 1024
+# without a deadline a wait for a worker still wakes this often to see whether its search was stopped
+CANCEL_POLL_INTERVAL = 0.5
+
+# /dev/shm is memory backed on linux, so spilling a download there costs no disk i/o
+SPILL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def pdf_text(content):
+    import pdfplumber
+
+    source = io.BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+    with pdfplumber.open(source) as pdf:
+        return " ".join(page.extract_text() or '' for page in pdf.pages)
+
+
+def html_metadata(content):
+    return html_backend.extract_metadata(content)
+
+
+def html_text(content):
+    return html_backend.extract_text(content)
+
+
+# worker side entry points, they receive the path of the spilled download instead of its bytes
+def pdf_text_file(path):
+    return pdf_text(path)
+
+
+def html_metadata_file(path):
+    with open(path, 'rb') as f:
+        return html_metadata(f.read())
+
+
+def html_text_file(path):
+    with open(path, 'rb') as f:
+        return html_text(f.read())
+
+
+def _limit_memory(limit_mb):
+    if not limit_mb:
+        return
+    try:
+        import resource
+
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        resource.setrlimit(resource.RLIMIT_AS, (limit_mb * 1024 * 1024, hard))
+    except (ImportError, ValueError, OSError) as e:
+        logger.warning("Could not limit parse worker memory: %s", e)
+
+
+# pdf and html parsing hold the gil, so they run in worker processes and the downloaded bytes are
+# handed over as a temporary file rather than pickled through the pipe
+class ParsePool:
+    def __init__(self, max_workers=None, max_tasks_per_child=DEFAULT_MAX_TASKS_PER_CHILD, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_limit_mb = memory_limit_mb
+        self.lock = threading.Lock()
+        self.executor = self._make_executor()
+
+    # spawn is used because forking a process that already runs qt and network threads is unsafe
+    def _make_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_limit_memory,
+            initargs=(self.memory_limit_mb,),
+            max_tasks_per_child=self.max_tasks_per_child,
+        )
+
+    # a worker that crashed or was killed breaks its executor for good, so the next document gets a new one.
+    # several threads can find the same broken executor, only the first replaces it
+    def _replace(self, broken):
+        with self.lock:
+            if self.executor is not broken:
+                return
+            logger.warning("A parse worker died, starting a new pool of %s workers.", self.max_workers)
+            self.executor = self._make_executor()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _spill(self, content):
+        fd, path = tempfile.mkstemp(prefix='ara-', dir=SPILL_DIR)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        return path
+
+    def submit(self, func, content):
+        path = self._spill(content)
+        future = self.executor.submit(func, path)
+        future.add_done_callback(lambda _: os.unlink(path))
+        return future
+
+    # a cancel token ends the wait at its deadline or as soon as it is cancelled, raising cancel.Cancelled. the
+    # document is dropped if no worker has started on it, otherwise its result is thrown away when it arrives
+    def run(self, func, content, token=None):
+        executor = self.executor
+        path = self._spill(content)
+        try:
+            future = executor.submit(func, path)
+            while True:
+                try:
+                    return future.result(timeout=token.timeout(CANCEL_POLL_INTERVAL) if token else None)
+                except TimeoutError:
+                    continue
+                except Cancelled:
+                    future.cancel()
+                    raise
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise
+        finally:
+            os.unlink(path)
+
+    def pdf_text(self, content, token=None):
+        return self.run(pdf_text_file, content, token)
+
+    def html_metadata(self, content, token=None):
+        return self.run(html_metadata_file, content, token)
+
+    def html_text(self, content, token=None):
+        return self.run(html_text_file, content, token)
@@ -0,0 +1,287 @@
+import argparse
+import base64
+import hashlib
+import heapq
+import itertools
+import json
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from logging_config import configure_logging, logger
+from paper import Paper
+
+STATE_VERSION = 1
+DIRECTIONS = ('references', 'cited_by')
+
+# a fixed size bit array answers "seen before?" for millions of identifiers in a few megabytes,
+# at the price of rarely skipping a paper that was never actually visited
+class BloomFilter:
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    # two halves of one digest give all k positions (double hashing), so each key is hashed once
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key):
+        added = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        self.count += added
+        return added
+
+    def to_dict(self):
+        return {'size': self.size, 'hashes': self.hashes, 'count': self.count, 'bits': base64.b64encode(self.bits).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls.__new__(cls)
+        bloom.size = data['size']
+        bloom.hashes = data['hashes']
+        bloom.count = data['count']
+        bloom.bits = bytearray(base64.b64decode(data['bits']))
+        return bloom
+
+
+# crawl nodes are "pmid:<id>", "doi:<doi>" or "url:<pdf url>", dois are lower cased so they compare equal
+def paper_nodes(paper):
+    nodes = []
+    if paper.url and 'pubmed.ncbi.nlm.nih.gov' in paper.url:
+        nodes.append(f"pmid:{paper.url.strip('/').split('/')[-1]}")
+    if paper.doi:
+        nodes.append(f"doi:{paper.doi.lower()}")
+    if paper.url and not nodes:
+        nodes.append(f"url:{paper.url}")
+    return nodes
+
+
+# snowballs outwards from seed papers along references and citations, the most cited and shallowest
+# papers in the frontier are expanded first and the whole crawl can be stopped and resumed from its state file.
+# rate_limits overrides the requests per second for a source, as it does for a research session
+class CitationCrawler:
+    def __init__(self, search_agent=None, extraction_agent=None, max_depth=2, budget=200, workers=4,
+                 directions=DIRECTIONS, state_path=None, save_every=20, rate_limits=None):
+        if search_agent is None:
+            from agents.search_agent import SearchAgent
+
+            search_agent = SearchAgent()
+        if extraction_agent is None:
+            from agents.extraction_agent import ExtractionAgent
+
+            extraction_agent = ExtractionAgent()
+        from session import make_rate_limiters
+
+        # the workers expand papers at the same time, so both agents share one set of limiters to stay within each api's limit
+        self.search_agent = search_agent
+        self.extraction_agent = extraction_agent
+        search_agent.rate_limiters = extraction_agent.rate_limiters = make_rate_limiters(rate_limits)
+        self.max_depth = max_depth
+        self.budget = budget
+        self.workers = workers
+        self.directions = tuple(directions)
+        self.state_path = state_path
+        self.save_every = save_every
+
+        # heap of (priority, sequence, depth, node), a node may be in here more than once and stale copies are skipped
+        self.frontier = []
+        self.mentions = {}
+        self.visited = BloomFilter(capacity=max(budget * 100, 10000))
+        # nodes that were in flight when the state was saved, the bloom filter cannot forget them so they are let through
+        self.requeued = set()
+        self.expanded = 0
+        self.papers = []
+        self.sequence = itertools.count()
+
+        if state_path and os.path.exists(state_path):
+            self.load()
+
+    # papers cited by many of the papers already crawled come first, deeper papers have to be cited more to compete
+    @staticmethod
+    def priority(mentions, depth):
+        return -mentions / (depth + 1)
+
+    def push(self, node, depth):
+        if depth > self.max_depth or node in self.visited:
+            return
+        mentions = self.mentions.get(node, 0) + 1
+        self.mentions[node] = mentions
+        heapq.heappush(self.frontier, (self.priority(mentions, depth), next(self.sequence), depth, node))
+
+    def is_queued(self, node):
+        return node in self.requeued or node not in self.visited
+
+    def pop(self):
+        while self.frontier:
+            _, _, depth, node = heapq.heappop(self.frontier)
+            if not self.is_queued(node):
+                continue
+            self.requeued.discard(node)
+            self.visited.add(node)
+            self.mentions.pop(node, None)
+            return depth, node
+        return None
+
+    def add_seeds(self, papers):
+        for paper in papers:
+            for node in paper_nodes(Paper.coerce(paper))[:1]:
+                self.push(node, 0)
+
+    # runs on a worker thread, returns the extracted paper and the nodes it links to
+    def expand(self, node):
+        kind, value = node.split(':', 1)
+        if kind == 'doi':
+            # papers that are in pubmed get their citations from elink, the rest only get metadata
+            pmid = self.search_agent.pubmed_id_for_doi(value)
+            if pmid:
+                kind, value = 'pmid', pmid
+
+        neighbours = []
+        if kind == 'pmid':
+            paper = self.extraction_agent.extract_metadata(Paper(url=f"https://pubmed.ncbi.nlm.nih.gov/{value}/", source='PubMed'))
+            links = self.search_agent.pubmed_links(value)
+            neighbours = [f"pmid:{pmid}" for direction in self.directions for pmid in links[direction]]
+        elif kind == 'doi':
+            paper = self.extraction_agent.extract_metadata(Paper(url=f"https://doi.org/{value}", doi=value, source='DOI'))
+        else:
+            references = [] if 'references' in self.directions else None
+            paper = self.extraction_agent.extract_metadata(Paper(url=value, source='Web'), references=references)
+            neighbours = [f"doi:{doi}" for doi in references or []]
+        return paper, neighbours
+
+    def crawl(self, on_paper=None):
+        from pipeline import is_usable
+
+        running = {}
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(running) < self.workers and self.expanded + len(running) < self.budget:
+                    entry = self.pop()
+                    if entry is None:
+                        break
+                    depth, node = entry
+                    running[executor.submit(self.expand, node)] = (depth, node)
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth, node = running.pop(future)
+                    self.expanded += 1
+                    try:
+                        paper, neighbours = future.result()
+                    except Exception as e:
+                        logger.error("Could not expand %s: %s", node, e)
+                        continue
+
+                    # the same paper can be reached by doi and by pmid, both are marked so it is only expanded once
+                    for alias in paper_nodes(paper):
+                        self.visited.add(alias)
+                    if is_usable(paper):
+                        self.papers.append(paper)
+                        if on_paper:
+                            on_paper(paper, depth)
+                    for neighbour in neighbours:
+                        self.push(neighbour, depth + 1)
+
+                completed += len(done)
+                if self.state_path and completed >= self.save_every:
+                    self.save(in_flight=running.values())
+                    completed = 0
+
+        logger.info("Crawl finished after expanding %s papers, %s usable and %s left in the frontier.", self.expanded, len(self.papers), len(self.mentions))
+        if self.state_path:
+            self.save()
+        return self.papers
+
+    # papers that were being expanded when the state is written go back into the frontier, so a killed crawl loses nothing
+    def save(self, in_flight=()):
+        best = {}
+        for priority, _, depth, node in self.frontier:
+            if self.is_queued(node) and (node not in best or (priority, depth) < best[node]):
+                best[node] = (priority, depth)
+        for depth, node in in_flight:
+            best[node] = (self.priority(1, depth), depth)
+
+        state = {
+            'version': STATE_VERSION,
+            'expanded': self.expanded,
+            'frontier': [[node, depth, priority, self.mentions.get(node, 1)] for node, (priority, depth) in best.items()],
+            'visited': self.visited.to_dict(),
+            'requeued': sorted(self.requeued.union(node for _, node in in_flight)),
+            'papers': [paper.to_dict() for paper in self.papers],
+        }
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def load(self):
+        with open(self.state_path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != STATE_VERSION:
+            raise ValueError(f"{self.state_path} was written by an incompatible version of the crawler")
+
+        self.expanded = state['expanded']
+        self.visited = BloomFilter.from_dict(state['visited'])
+        self.papers = [Paper.from_dict(paper) for paper in state['papers']]
+        self.requeued = set(state['requeued'])
+        self.frontier = []
+        self.mentions = {}
+        for node, depth, priority, mentions in state['frontier']:
+            self.mentions[node] = mentions
+            self.frontier.append((priority, next(self.sequence), depth, node))
+        heapq.heapify(self.frontier)
+        logger.info("Resuming crawl from %s with %s papers in the frontier.", self.state_path, len(self.frontier))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Follow references and citations outwards from seed papers.")
+    parser.add_argument("--seed", action="append", default=[], help="pmid:<id>, doi:<doi> or url:<pdf url>, can be repeated")
+    parser.add_argument("--seeds-from", help="a digest saved by the gui or pipeline.py whose papers are used as seeds")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--budget", type=int, default=200, help="stop after expanding this many papers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--direction", choices=('both',) + DIRECTIONS, default='both')
+    parser.add_argument("--state", default="crawl_state.json", help="crawl state is saved here and resumed from if it exists")
+    parser.add_argument("--output", default="crawl_digest.json")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    from agents.storage_agent import StorageAgent
+
+    crawler = CitationCrawler(
+        max_depth=args.depth,
+        budget=args.budget,
+        workers=args.workers,
+        directions=DIRECTIONS if args.direction == 'both' else (args.direction,),
+        state_path=args.state,
+    )
+    for seed in args.seed:
+        crawler.push(seed if ':' in seed else f"pmid:{seed}", 0)
+    if args.seeds_from:
+        with open(args.seeds_from, encoding='utf-8') as f:
+            crawler.add_seeds(Paper.from_dict(paper) for paper in json.load(f))
+
+    papers = crawler.crawl(on_paper=lambda paper, depth: print(f"[depth {depth}] {paper.title or paper.url}"))
+    if papers:
+        StorageAgent(args.output).run({"extracted_data": papers})
+    print(f"saved {len(papers)} papers to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,242 @@
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import zlib
+
+import library
+from paper import Paper
+
+CSV_FIELDS = ('title', 'authors', 'year', 'source', 'venue', 'doi', 'url', 'abstract', 'status')
+
+# rows are handed to arrow this many at a time, which is what bounds the memory of a columnar export
+ARROW_BATCH_SIZE = 10000
+
+FORMATS = {
+    '.bib': 'bibtex',
+    '.ris': 'ris',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.lib': 'library',
+}
+
+def format_for(path):
+    return FORMATS.get(os.path.splitext(path)[1].lower())
+
+
+SEPARATORS = ' \t\r\n,'
+
+# a json array is decoded one element at a time from fixed size chunks, so a large digest is never loaded whole
+def iter_json_array(f, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while not buffer:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            raise ValueError("expected a json array")
+        buffer = chunk.lstrip()
+    if buffer[0] != '[':
+        raise ValueError("expected a json array")
+    position = 1
+    eof = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in SEPARATORS:
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+            # an element that runs to the end of the buffer may have been cut short, so it is decoded again with more text
+            complete = end < len(buffer) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if complete:
+            yield value
+            position = end
+            continue
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+# yields papers one at a time from a .lib or .jsonl library or a .json digest
+def iter_library(path):
+    if path.endswith('.lib'):
+        with library.Library(path) as papers:
+            yield from papers
+        return
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                if line.strip():
+                    yield Paper.from_dict(json.loads(line))
+        else:
+            for record in iter_json_array(f):
+                yield Paper.from_dict(record)
+
+
+# every special character is replaced in one pass, so the backslashes of one replacement are not escaped again by another
+BIBTEX_SPECIAL = re.compile(r'[&%$#_{}\\~^]')
+BIBTEX_REPLACEMENTS = {'\\': r'\textbackslash{}', '~': r'\textasciitilde{}', '^': r'\textasciicircum{}'}
+
+def _bibtex_escape(value):
+    return BIBTEX_SPECIAL.sub(lambda match: BIBTEX_REPLACEMENTS.get(match.group(), '\\' + match.group()), value)
+
+# keys are built from the paper itself plus a short hash of its identifier, so they are unique without
+# remembering every key already written
+def bibtex_key(paper):
+    author = re.sub(r'\W', '', (paper.authors[0].split()[-1] if paper.authors and paper.authors[0].split() else 'anon')).lower()
+    words = re.findall(r'[a-z]{4,}', (paper.title or '').lower())
+    digest = zlib.crc32((paper.identifier or paper.title or '').encode('utf-8')) & 0xffff
+    return f"{author}{paper.year or ''}{words[0] if words else ''}_{digest:04x}"
+
+def bibtex_entry(paper):
+    entry_type = 'article' if paper.venue else 'misc'
+    fields = [
+        ('title', paper.title),
+        ('author', ' and '.join(paper.authors) if paper.authors else None),
+        ('year', paper.year),
+        ('journal' if entry_type == 'article' else 'howpublished', paper.venue),
+        ('doi', paper.doi),
+        ('url', paper.url),
+        ('abstract', paper.abstract),
+    ]
+    lines = [f"@{entry_type}{{{bibtex_key(paper)},"]
+    lines.extend(f"  {name} = {{{_bibtex_escape(value)}}}," for name, value in fields if value)
+    lines.append("}\n")
+    return "\n".join(lines) + "\n"
+
+
+def ris_entry(paper):
+    lines = [f"TY  - {'JOUR' if paper.venue else 'GEN'}"]
+    if paper.title:
+        lines.append(f"TI  - {paper.title}")
+    lines.extend(f"AU  - {author}" for author in paper.authors)
+    for tag, value in (('PY', paper.year), ('JO', paper.venue), ('DO', paper.doi), ('UR', paper.url)):
+        if value:
+            lines.append(f"{tag}  - {value}")
+    if paper.abstract:
+        lines.append(f"AB  - {' '.join(paper.abstract.split())}")
+    lines.append("ER  - \n")
+    return "\n".join(lines) + "\n"
+
+
+def write_bibtex(papers, f):
+    count = 0
+    for paper in papers:
+        f.write(bibtex_entry(paper))
+        count += 1
+    return count
+
+
+def write_ris(papers, f):
+    count = 0
+    for paper in papers:
+        f.write(ris_entry(paper))
+        count += 1
+    return count
+
+
+def write_csv(papers, f):
+    writer = csv.writer(f)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for paper in papers:
+        record = paper.to_dict()
+        record['authors'] = '; '.join(paper.authors)
+        writer.writerow([record[field] for field in CSV_FIELDS])
+        count += 1
+    return count
+
+
+def _arrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("parquet and arrow exports need pyarrow, install it with pip install pyarrow") from None
+    return pyarrow
+
+def arrow_schema():
+    pa = _arrow()
+    return pa.schema([(field, pa.list_(pa.string()) if field == 'authors' else pa.string()) for field in CSV_FIELDS])
+
+def _batches(papers, batch_size):
+    pa = _arrow()
+    schema = arrow_schema()
+    columns = {field: [] for field in CSV_FIELDS}
+    for paper in papers:
+        for field, value in paper.to_dict().items():
+            columns[field].append(value)
+        if len(columns['title']) >= batch_size:
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+            columns = {field: [] for field in CSV_FIELDS}
+    if columns['title']:
+        yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+
+def write_parquet(papers, path, batch_size=ARROW_BATCH_SIZE, compression='zstd'):
+    import pyarrow.parquet as pq
+
+    count = 0
+    with pq.ParquetWriter(path, arrow_schema(), compression=compression) as writer:
+        for batch in _batches(papers, batch_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+def write_arrow(papers, path, batch_size=ARROW_BATCH_SIZE, compression='zstd'):
+    pa = _arrow()
+
+    count = 0
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, arrow_schema(), options=options) as writer:
+        for batch in _batches(papers, batch_size):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    return count
+
+
+TEXT_WRITERS = {
+    'bibtex': write_bibtex,
+    'ris': write_ris,
+    'csv': write_csv,
+}
+
+BINARY_WRITERS = {
+    'parquet': write_parquet,
+    'arrow': write_arrow,
+    'library': library.write_library,
+}
+
+# papers can be any iterable, records are written as they arrive and nothing is collected first
+def export(papers, path, fmt=None):
+    fmt = fmt or format_for(path)
+    if fmt in TEXT_WRITERS:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            return TEXT_WRITERS[fmt](papers, f)
+    if fmt in BINARY_WRITERS:
+        return BINARY_WRITERS[fmt](papers, path)
+    raise ValueError(f"unknown export format for {path}, use one of {', '.join(sorted(FORMATS))}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a saved library to BibTeX, RIS, CSV, Parquet, Arrow or a memory-mapped .lib file.")
+    parser.add_argument("library", help="a .lib or .jsonl library or a .json digest")
+    parser.add_argument("output", help="the format is taken from the extension unless --format is given")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())))
+    args = parser.parse_args(argv)
+
+    count = export(iter_library(args.library), args.output, args.format)
+    print(f"exported {count} papers to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
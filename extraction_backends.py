@@ -0,0 +1,302 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import contextmanager
+
+import requests
+
+from logging_config import logger
+
+# what a backend is given: the text of a fetched pdf or web page and the kind it was sniffed as
+Document = namedtuple('Document', ['url', 'kind', 'text'])
+
+PROMPT = "First, determine if the following text is from an academic paper. If it is, output the title, authors, publication date, abstract, and DOI. The authors should be a list of strings, with each string being the full name of an author, with spaces between first and last names. For example, 'John Smith'. Return the information in a JSON object with the keys 'title', 'authors', 'publication_date', 'abstract', and 'doi'. If it is not an academic paper, return the string 'not an academic paper'.\n\nText:{text}"
+
+DOI_PATTERN = re.compile(r'\b10\.\d{4,9}/[^\s"<>]+')
+
+
+class BackendError(Exception):
+    pass
+
+
+class CostMeter:
+    def __init__(self):
+        self.calls = 0
+        self.cost = 0.0
+
+
+_meters = contextvars.ContextVar('cost_meters', default=())
+
+# adds up what the backends called on this thread inside the block cost, so a caller can tell what one paper cost
+# while other threads share the same router
+@contextmanager
+def metered():
+    meter = CostMeter()
+    token = _meters.set(_meters.get() + (meter,))
+    try:
+        yield meter
+    finally:
+        _meters.reset(token)
+
+
+# the language model backends answer in the same format, None means the model said it is not a paper
+def parse_model_answer(text):
+    if "not an academic paper" in text.lower():
+        return None
+    match = re.search(r'```json\n(.*?)\n```', text, re.DOTALL)
+    try:
+        metadata = json.loads(match.group(1) if match else text)
+        return {
+            'title': metadata.get('title'),
+            'authors': metadata.get('authors') or [],
+            'year': metadata.get('publication_date'),
+            'abstract': metadata.get('abstract'),
+            'doi': metadata.get('doi'),
+        }
+    except (json.JSONDecodeError, AttributeError) as e:
+        logger.error("Could not parse JSON from the model's answer: %s", e)
+        return {'abstract': text}
+
+
+# a backend turns a document into metadata. cost is the estimated dollars per document and latency the usual seconds
+# per document, the router tries the cheapest backend that can handle a document first and the faster one on a tie
+class ExtractionBackend(ABC):
+    name = None
+    cost = 0.0
+    latency = 0.0
+
+    def can_handle(self, document):
+        return True
+
+    # returns a metadata dict, or None if the document is not an academic paper. raises BackendError when
+    # this backend could not tell, so the router moves on to the next one
+    @abstractmethod
+    def extract(self, document, token):
+        pass
+
+
+# reads the title, authors and abstract off the first page of a typeset paper, with no network and no model.
+# it only takes pdfs with an abstract heading directly below a line of author names and the title above it, and gives
+# up on anything else so the router can hand the document to a model instead
+class RulesBackend(ExtractionBackend):
+    name = 'rules'
+    cost = 0.0
+    latency = 0.001
+
+    ABSTRACT_HEADING = re.compile(r'^\s*abstract\s*[.:—-]?\s*$', re.IGNORECASE | re.MULTILINE)
+    SECTION_END = re.compile(r'^\s*(?:1\.?\s+)?(?:introduction|keywords|index terms|references)\b', re.IGNORECASE | re.MULTILINE)
+    YEAR_PATTERN = re.compile(r'\b(?:19|20)\d{2}\b')
+    NAME_WORD = re.compile(r"^[A-Z][a-zA-Z'\-]*\.?$")
+    # running heads, venue lines and submission notes that sit above the title on the first page
+    HEADER_LINE = re.compile(
+        r'\b(?:journal|proceedings|conference|workshop|symposium|transactions|published|submitted|accepted|under review|'
+        r'preprint|arxiv|draft|volume|vol\.|editor|copyright|licen[cs]e|doi)\b|\b(?:19|20)\d{2}\b|©|https?://|@|\d+\s*[-–]\s*\d+',
+        re.IGNORECASE
+    )
+    # words that turn up on the line above an abstract but are never part of a name
+    NOT_NAMES = frozenset({
+        'a', 'an', 'the', 'of', 'for', 'in', 'on', 'at', 'to', 'with', 'by', 'from', 'under', 'review', 'abstract', 'paper',
+        'draft', 'preprint', 'anonymous', 'author', 'authors', 'submission', 'university', 'institute', 'department',
+        'school', 'college', 'laboratory', 'research', 'center', 'centre', 'technical', 'report', 'editor', 'notes',
+    })
+    MAX_TITLE_LINES = 3
+    MAX_ABSTRACT = 2000
+
+    def can_handle(self, document):
+        return document.kind == 'pdf' and bool(self.ABSTRACT_HEADING.search(document.text[:5000]))
+
+    def extract(self, document, token):
+        heading = self.ABSTRACT_HEADING.search(document.text[:5000])
+        if heading is None:
+            raise BackendError("no abstract heading")
+        front = [line.strip() for line in document.text[:heading.start()].splitlines() if line.strip()]
+        if len(front) < 2:
+            raise BackendError("no title and author lines before the abstract")
+        if self.HEADER_LINE.search(front[-1]):
+            raise BackendError(f"the line above the abstract is not an author line: {front[-1]!r}")
+        authors = self.split_authors(front[-1])
+        if not authors:
+            raise BackendError(f"could not read authors from {front[-1]!r}")
+
+        # the title is the run of lines directly above the authors, up to the first running head or venue line
+        title_lines = []
+        for line in reversed(front[:-1]):
+            if self.HEADER_LINE.search(line):
+                break
+            title_lines.insert(0, line)
+        if not title_lines:
+            raise BackendError("no title above the author line")
+        if len(title_lines) > self.MAX_TITLE_LINES:
+            raise BackendError("more lines above the authors than a title has")
+
+        body = document.text[heading.end():]
+        end = self.SECTION_END.search(body)
+        abstract = " ".join(body[:end.start() if end else self.MAX_ABSTRACT].split())
+        # without a section heading to stop at, the abstract is cut back to the last full sentence
+        if not end and '. ' in abstract:
+            abstract = abstract[:abstract.rfind('. ') + 1]
+        if not abstract:
+            raise BackendError("empty abstract")
+
+        doi = DOI_PATTERN.search(document.text[:heading.start()] + body[:len(abstract) + 500])
+        year = self.YEAR_PATTERN.search(" ".join(front))
+        return {
+            'title': " ".join(title_lines),
+            'authors': authors,
+            'year': year.group(0) if year else None,
+            'abstract': abstract,
+            'doi': doi.group(0).rstrip('.,;') if doi else None,
+        }
+
+    # authors are separated by commas or "and", a line of bare names is read as first and last name pairs. every name
+    # has to be two to four capitalised words, none of which is a word that never appears in a name
+    def split_authors(self, line):
+        line = re.sub(r'[\d*†‡§¶]+', ' ', line)
+        if re.search(r',|\band\b', line):
+            names = [" ".join(name.split()) for name in re.split(r',|\band\b', line)]
+        else:
+            words = line.split()
+            if len(words) % 2:
+                return []
+            names = [f"{words[i]} {words[i + 1]}" for i in range(0, len(words), 2)]
+        names = [name for name in names if name]
+        for name in names:
+            words = name.split()
+            if not 2 <= len(words) <= 4 or not all(self.NAME_WORD.match(word) for word in words):
+                return []
+            if any(word.lower().rstrip('.') in self.NOT_NAMES for word in words):
+                return []
+        return names
+
+
+# the hosted gemini model, the only backend that costs money per call. the client takes most of a second to import,
+# so it is only set up when a document needs it
+class GeminiBackend(ExtractionBackend):
+    name = 'gemini'
+    cost = 0.0006
+    latency = 2.0
+    max_retries = 3
+    base_delay = 2
+
+    def __init__(self, model_name='models/gemini-flash-lite-latest'):
+        self.model_name = model_name
+        self._model = None
+        self._env_loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                import google.generativeai as genai
+                from dotenv import load_dotenv
+
+                load_dotenv()
+                genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+                self._model = genai.GenerativeModel(self.model_name)
+            return self._model
+
+    # without an api key the router skips gemini instead of failing the paper, the .env file is only read once
+    def can_handle(self, document):
+        if self._model is None and not self._env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            self._env_loaded = True
+        return self._model is not None or bool(os.environ.get("GEMINI_API_KEY"))
+
+    # the gemini api can be flaky, so calls are retried with exponential backoff. a client that cannot be set up
+    # will not work on a retry either, so that fails straight away
+    def extract(self, document, token):
+        try:
+            model = self.model
+        except Exception as e:
+            raise BackendError(f"could not set up the Gemini client: {e!r}") from e
+        prompt = PROMPT.format(text=document.text)
+        for attempt in range(self.max_retries):
+            try:
+                response = model.generate_content(prompt, request_options={'timeout': token.timeout(60)})
+                break
+            except Exception as e:
+                logger.warning("Gemini API call failed on attempt %s/%s for %s: %s", attempt + 1, self.max_retries, document.url, e)
+                if attempt == self.max_retries - 1:
+                    raise BackendError(f"all {self.max_retries} Gemini API calls failed") from e
+                token.wait(self.base_delay * (2 ** attempt))
+        # the whole response is only turned into text when debug logging is on
+        logger.debug("Gemini API response for %s:\n%s", document.url, response)
+        return parse_model_answer(response.text)
+
+
+# any server that takes {"prompt": ...} and answers {"text": ...}, such as a local model behind a small shim or the
+# benchmark stub server. it runs offline, so it is declared free
+class HTTPBackend(ExtractionBackend):
+    def __init__(self, url, name='local', cost=0.0, latency=1.0, http=None):
+        self.url = url
+        self.name = name
+        self.cost = cost
+        self.latency = latency
+        self.http = http or requests
+
+    def extract(self, document, token):
+        try:
+            response = self.http.post(self.url, json={'prompt': PROMPT.format(text=document.text)}, timeout=token.timeout(60))
+            response.raise_for_status()
+            return parse_model_answer(response.json()['text'])
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            raise BackendError(f"{self.url} failed: {e}") from e
+
+
+# the router orders these by cost, so a local server set in LOCAL_LLM_URL is tried before gemini as it costs nothing
+def default_backends(model_name='models/gemini-flash-lite-latest'):
+    backends = [RulesBackend(), GeminiBackend(model_name)]
+    if os.environ.get("LOCAL_LLM_URL"):
+        backends.append(HTTPBackend(os.environ["LOCAL_LLM_URL"]))
+    return backends
+
+
+# sends each document to the cheapest backend that can handle it, falling back to the next one when a backend fails,
+# and keeps what each backend actually cost and how long it took
+class BackendRouter:
+    def __init__(self, backends):
+        self.backends = sorted(backends, key=lambda backend: (backend.cost, backend.latency))
+        self.lock = threading.Lock()
+        self.stats = {backend.name: {'documents': 0, 'failures': 0, 'seconds': 0.0, 'cost': 0.0} for backend in self.backends}
+
+    def get(self, name):
+        return next((backend for backend in self.backends if backend.name == name), None)
+
+    def _record(self, backend, seconds, failed):
+        with self.lock:
+            stats = self.stats[backend.name]
+            stats['documents'] += 1
+            stats['seconds'] += seconds
+            stats['cost'] += backend.cost
+            if failed:
+                stats['failures'] += 1
+        for meter in _meters.get():
+            meter.calls += 1
+            meter.cost += backend.cost
+
+    # before_call runs ahead of each backend that is tried, the agent uses it to wait for that backend's rate limit
+    def extract(self, document, token, before_call=None):
+        errors = []
+        for backend in self.backends:
+            if not backend.can_handle(document):
+                continue
+            if before_call is not None:
+                before_call(backend)
+            start = time.perf_counter()
+            try:
+                metadata = backend.extract(document, token)
+            except BackendError as e:
+                self._record(backend, time.perf_counter() - start, failed=True)
+                errors.append(f"{backend.name}: {e}")
+                continue
+            self._record(backend, time.perf_counter() - start, failed=False)
+            return backend, metadata
+        raise BackendError("; ".join(errors) or "no backend can handle this document")
@@ -0,0 +1,212 @@
+import sqlite3
+import threading
+import time
+
+from logging_config import SAMPLED, logger
+from paper import Paper, PaperStatus
+
+# seconds to wait before each retry, the last delay is reused once the schedule runs out
+DEFAULT_RETRY_SCHEDULE = (30, 120, 600, 3600)
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL UNIQUE,
+    query TEXT,
+    paper TEXT NOT NULL,
+    result TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS attempts (
+    job_id INTEGER NOT NULL REFERENCES jobs (id),
+    attempt INTEGER NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT
+);
+"""
+
+# a sqlite file is used so that failed extractions survive restarts instead of being dropped
+class ExtractionQueue:
+    def __init__(self, path='extraction_queue.db', retry_schedule=DEFAULT_RETRY_SCHEDULE, max_attempts=5):
+        self.path = path
+        self.retry_schedule = tuple(retry_schedule)
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.executescript(SCHEMA)
+            # jobs left running by a previous process will never finish, so they go back to pending
+            self.conn.execute("UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def enqueue(self, paper, query=None, error=None, delay=0):
+        url = paper.url
+        if not url:
+            return None
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT id, status FROM jobs WHERE url = ?", (url,)).fetchone()
+            if row is not None:
+                # a paper that is already queued keeps its schedule and attempt history, a finished one starts over
+                # from the paper as it was found this time
+                if row['status'] in (DONE, FAILED):
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, attempts = 0, next_attempt_at = ?, last_error = ?, query = ?, paper = ?, result = NULL, updated_at = ? WHERE id = ?",
+                        (PENDING, now + delay, error, query, paper.to_json(), now, row['id'])
+                    )
+                return row['id']
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (url, query, paper, status, next_attempt_at, last_error, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, query, paper.to_json(), PENDING, now + delay, error, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, paper, query, attempts FROM jobs WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1",
+                (PENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, now, row['id']))
+        return {'id': row['id'], 'paper': Paper.from_json(row['paper']), 'query': row['query'], 'attempts': row['attempts']}
+
+    def complete(self, job_id, result, started_at):
+        now = time.time()
+        with self.lock:
+            attempt = self._record_attempt(job_id, started_at, now, DONE, None)
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, result = ?, last_error = NULL, updated_at = ? WHERE id = ?",
+                (DONE, attempt, result.to_json(), now, job_id)
+            )
+
+    def fail(self, job_id, error, started_at):
+        now = time.time()
+        with self.lock:
+            attempt = self._record_attempt(job_id, started_at, now, FAILED, error)
+            if attempt >= self.max_attempts:
+                logger.warning("Giving up on extraction job %s after %s attempts: %s", job_id, attempt, error)
+                status, next_attempt_at = FAILED, now
+            else:
+                status, next_attempt_at = PENDING, now + self.retry_delay(attempt)
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, attempt, next_attempt_at, error, now, job_id)
+            )
+        return status
+
+    def retry_delay(self, attempt):
+        if not self.retry_schedule:
+            return 0
+        return self.retry_schedule[min(attempt, len(self.retry_schedule)) - 1]
+
+    def _record_attempt(self, job_id, started_at, finished_at, outcome, error):
+        row = self.conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        attempt = row['attempts'] + 1
+        self.conn.execute(
+            "INSERT INTO attempts (job_id, attempt, started_at, finished_at, outcome, error) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, attempt, started_at, finished_at, outcome, error)
+        )
+        return attempt
+
+    def job(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['paper'] = Paper.from_json(job['paper'])
+        job['result'] = Paper.from_json(job['result']) if job['result'] else None
+        return job
+
+    def attempts(self, job_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT attempt, started_at, finished_at, outcome, error FROM attempts WHERE job_id = ? ORDER BY attempt",
+                (job_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+# the worker drains the queue in the background so the search can return before every paper is filled in
+class ExtractionWorker(threading.Thread):
+    def __init__(self, queue, extraction_agent, on_complete=None, poll_interval=5):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.extraction_agent = extraction_agent
+        self.on_complete = on_complete
+        self.poll_interval = poll_interval
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    # called after enqueueing so new jobs do not wait for the next poll
+    def wake(self):
+        self.wake_event.set()
+
+    def run(self):
+        logger.info("Extraction queue worker started.")
+        while not self.stop_event.is_set():
+            if not self.process_next():
+                self.wake_event.wait(self.poll_interval)
+                self.wake_event.clear()
+        logger.info("Extraction queue worker stopped.")
+
+    def process_next(self):
+        from pipeline import is_usable
+
+        job = self.queue.claim()
+        if job is None:
+            return False
+
+        started_at = time.time()
+        paper = job['paper']
+        try:
+            result = self.extraction_agent.extract_metadata(paper)
+        except Exception as e:
+            result = paper
+            result.status = PaperStatus.EXTRACTION_ERROR
+            logger.error("Extraction job %s raised: %s", job['id'], e)
+
+        if result.failed:
+            status = self.queue.fail(job['id'], result.status.value, started_at)
+            logger.info("Extraction job %s failed, now %s: %s", job['id'], status, result.url)
+            return True
+
+        # a paper that turned out not to be academic, or a web page without an abstract, will not get better by
+        # retrying it. the job is finished but the paper is dropped, as the pipeline drops it
+        self.queue.complete(job['id'], result, started_at)
+        if not is_usable(result):
+            logger.info("Extraction job %s completed but the paper is not usable: %s", job['id'], result.url)
+            return True
+        logger.info("Extraction job %s completed: %s", job['id'], result.url, extra=SAMPLED)
+        if self.on_complete:
+            self.on_complete(result, job['query'])
+        return True
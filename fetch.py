@@ -0,0 +1,133 @@
+import threading
+from collections import namedtuple
+
+from logging_config import SAMPLED, logger
+
+MB = 1024 * 1024
+
+# the largest body read for each kind of document, anything bigger is abandoned part way
+SIZE_LIMITS = {
+    'pdf': 40 * MB,
+    'html': 5 * MB,
+}
+
+CHUNK_SIZE = 64 * 1024
+
+# declared types that are never a paper, these responses are closed before any of the body is read
+REJECTED_TYPES = ('image/', 'audio/', 'video/', 'font/', 'application/zip', 'application/gzip', 'application/x-tar',
+                  'application/x-7z', 'application/vnd.rar', 'application/x-rar', 'application/vnd.ms-', 'application/vnd.openxmlformats')
+
+# the first bytes of file types that show up in web results but are not papers
+SIGNATURES = (
+    (b'PK\x03\x04', 'zip'),
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x89PNG', 'image'),
+    (b'\xff\xd8\xff', 'image'),
+    (b'GIF8', 'image'),
+    (b'RIFF', 'media'),
+    (b'\x1a\x45\xdf\xa3', 'media'),
+    (b'ID3', 'media'),
+    (b'OggS', 'media'),
+)
+
+Fetched = namedtuple('Fetched', ['kind', 'content', 'content_type'])
+
+
+class NotAPaper(Exception):
+    def __init__(self, url, reason, saved_bytes=0):
+        super().__init__(f"{url}: {reason}")
+        self.reason = reason
+        self.saved_bytes = saved_bytes
+
+
+# the kind is taken from the bytes themselves, since servers often send pdfs as application/octet-stream
+def sniff(head):
+    head = head[:1024]
+    # a pdf header may follow a few bytes of junk, the pdf spec allows it anywhere in the first 1024 bytes
+    if b'%PDF-' in head:
+        return 'pdf'
+    for signature, kind in SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    if head[4:8] == b'ftyp':
+        return 'media'
+    if b'\x00' in head:
+        return 'binary'
+    return 'html'
+
+
+# the length of an application/octet-stream body is held to the largest cap, as it may still turn out to be a pdf
+def _declared_limit(content_type, limits):
+    if 'pdf' in content_type:
+        return limits['pdf']
+    if 'html' in content_type or content_type.startswith('text/'):
+        return limits['html']
+    return max(limits.values())
+
+
+# counts what was downloaded and what was not because the response turned out not to be a paper
+class FetchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.downloaded_bytes = 0
+        self.saved_bytes = 0
+        self.rejected = {}
+
+    def add(self, downloaded=0, saved=0, reason=None):
+        with self.lock:
+            self.downloaded_bytes += downloaded
+            self.saved_bytes += saved
+            if reason:
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def summary(self):
+        with self.lock:
+            rejected = sum(self.rejected.values())
+            return (f"downloaded {self.downloaded_bytes / MB:.1f} MB, skipped {rejected} responses that were not papers "
+                    f"and saved at least {self.saved_bytes / MB:.1f} MB")
+
+
+# the body is streamed and checked as it arrives: the declared type and length first, then the first chunk's magic
+# bytes, then the running size against the cap for its kind. a response that fails any check is closed straight away
+def fetch_document(http, url, headers=None, timeout=15, token=None, limits=SIZE_LIMITS, stats=None):
+    response = http.get(url, headers=headers, timeout=timeout, stream=True)
+    received = 0
+    try:
+        response.raise_for_status()
+        content_type = response.headers.get('content-type', '').lower()
+        length = response.headers.get('content-length')
+        length = int(length) if length and length.isdigit() else None
+
+        def reject(reason):
+            saved = length - received if length is not None else 0
+            if stats is not None:
+                stats.add(received, saved, reason)
+            logger.info("Skipped %s after %s bytes: %s", url, received, reason, extra=SAMPLED)
+            return NotAPaper(url, reason, saved)
+
+        if content_type.startswith(REJECTED_TYPES):
+            raise reject(f"content type {content_type.split(';')[0]}")
+        if length is not None and length > _declared_limit(content_type, limits):
+            raise reject(f"{length} bytes is over the size limit")
+
+        chunks = []
+        kind = None
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if token is not None:
+                token.check()
+            if not chunk:
+                continue
+            received += len(chunk)
+            if kind is None:
+                kind = sniff(chunk)
+                if kind not in limits:
+                    raise reject(f"{kind} content")
+            chunks.append(chunk)
+            if received > limits[kind]:
+                raise reject(f"more than {limits[kind]} bytes of {kind}")
+    finally:
+        response.close()
+
+    if stats is not None:
+        stats.add(received)
+    return Fetched(kind or 'html', b''.join(chunks), content_type)
@@ -1,6 +1,7 @@
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import itertools
 import time
 import threading
 import webbrowser
@@ -10,7 +11,7 @@ from PyQt6.QtWidgets import (
     QCheckBox, QTextBrowser, QTabWidget
 )
 from PyQt6.QtCore import QObject, QThread, pyqtSignal, QTimer, QSettings
-from PyQt6.QtWidgets import QDialog, QFormLayout, QDialogButtonBox
+from PyQt6.QtWidgets import QDialog, QFormLayout, QDialogButtonBox, QFileDialog
 
 # a qdialog is used for the advanced settings to make it a blocking window
 class AdvancedSettingsDialog(QDialog):
@@ -24,11 +25,13 @@ class AdvancedSettingsDialog(QDialog):
 
         self.pubmed_limit_input = QLineEdit("20")
         self.ddg_limit_input = QLineEdit("20")
+        self.deadline_input = QLineEdit("0")
 
         self.layout.addRow("arXiv Limit:", self.arxiv_limit_input)
 
         self.layout.addRow("PubMed Limit:", self.pubmed_limit_input)
         self.layout.addRow("DuckDuckGo Limit:", self.ddg_limit_input)
+        self.layout.addRow("Deadline (seconds, 0 for none):", self.deadline_input)
 
         self.buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Save | QDialogButtonBox.StandardButton.Cancel)
         self.buttons.accepted.connect(self.accept)
@@ -41,14 +44,18 @@ class AdvancedSettingsDialog(QDialog):
             "arxiv": self.arxiv_limit_input.text(),
             "pubmed": self.pubmed_limit_input.text(),
             "ddg": self.ddg_limit_input.text(),
+            "deadline": self.deadline_input.text(),
         }
 
 
-from agents.search_agent import SearchAgent
-from agents.extraction_agent import ExtractionAgent
-from agents.storage_agent import StorageAgent
+from cancel import CANCELLED, CancelToken
+from extraction_queue import ExtractionQueue, ExtractionWorker
+from paper import Paper
 
-from logging_config import logger
+from logging_config import SAMPLED, configure_logging, logger
+
+# how many papers of an opened library are listed at a time
+LIBRARY_PAGE = 200
 
 # this worker runs in a separate thread to prevent the gui from freezing during searches
 class AgentWorker(QObject):
@@ -62,9 +69,14 @@ class AgentWorker(QObject):
     general_web_papers_found = pyqtSignal(list)
     general_web_search_finished = pyqtSignal()
 
-    def __init__(self, query, search_arxiv, search_pubmed, search_general, arxiv_limit, pubmed_limit, ddg_limit):
+    papers_deferred = pyqtSignal(int)
+
+    def __init__(self, queries, search_arxiv, search_pubmed, search_general, arxiv_limit, pubmed_limit, ddg_limit, session, extraction_queue=None, token=None):
         super().__init__()
-        self.query = query
+        self.queries = queries
+        self.session = session
+        self.token = token or CancelToken()
+        self.extraction_queue = extraction_queue
         self.search_arxiv = search_arxiv
         self.search_pubmed = search_pubmed
         self.search_general = search_general
@@ -74,99 +86,80 @@ class AgentWorker(QObject):
 
     def run(self):
         logger.info("AgentWorker running...")
-        blackboard = {
-            "query": self.query,
-            "papers": None,
-            "extracted_data": [],
-            "status": "running",
-            "search_arxiv": self.search_arxiv,
-            "search_pubmed": self.search_pubmed,
-            "search_web": self.search_general,
-            "arxiv_limit": self.arxiv_limit,
-            "pubmed_limit": self.pubmed_limit,
-            "ddg_limit": self.ddg_limit
+        found_signals = {
+            'arxiv': self.arxiv_papers_found,
+            'pubmed': self.pubmed_papers_found,
+            'web': self.general_web_papers_found,
         }
-        search_agent = SearchAgent()
-        extraction_agent = ExtractionAgent()
-        pubmed_event = threading.Event()
-        arxiv_event = threading.Event()
-        web_event = threading.Event()
-
-
-
-        def pubmed_callback(papers):
-            logger.info("PubMed search finished.")
-            total = len(papers)
-            self.status_changed.emit(f"PubMed search returned {total} results. Now extracting details...")
-
-            for i, paper in enumerate(papers):
-                extraction_blackboard = {"papers": [paper]}
-                extraction_agent.run(extraction_blackboard)
-
-                self.pubmed_papers_found.emit([paper])
-                self.status_changed.emit(f"Extracting PubMed paper {i+1} of {total}...")
-
-            self.status_changed.emit("PubMed extraction complete.")
-            self.pubmed_search_finished.emit()
-            pubmed_event.set()
-
-        def arxiv_callback(papers):
-            logger.info("arXiv search finished.")
-            self.status_changed.emit(f"arXiv search complete. Found {len(papers)} papers.")
-            self.arxiv_papers_found.emit(papers)
-            self.arxiv_search_finished.emit()
-            arxiv_event.set()
-
-        def web_callback(papers):
-            logger.info("Web search finished.")
-            total = len(papers)
-            self.status_changed.emit(f"Web search returned {total} results. Now extracting details...")
-
-            for i, paper in enumerate(papers):
-                extraction_blackboard = {"papers": [paper]}
-                extraction_agent.run(extraction_blackboard)
-
-                abstract = paper.get('abstract')
-                if abstract and abstract not in ['N/A', 'Fetch/Parse Error', 'API Error', 'Extraction Error', 'Fetch Error']:
-                    self.general_web_papers_found.emit([paper])
-
-                self.status_changed.emit(f"Extracting web paper {i+1} of {total}...")
-
-            self.status_changed.emit("Web extraction complete.")
-            self.general_web_search_finished.emit()
-            web_event.set()
+        finished_signals = {
+            'arxiv': self.arxiv_search_finished,
+            'pubmed': self.pubmed_search_finished,
+            'web': self.general_web_search_finished,
+        }
+        labels = {'arxiv': 'arXiv', 'pubmed': 'PubMed', 'web': 'Web'}
+        found = {source: 0 for source in labels}
+        lock = threading.Lock()
+
+        def on_paper(paper, query, source):
+            with lock:
+                found[source] += 1
+                count = found[source]
+            found_signals[source].emit([paper])
+            self.status_changed.emit(f"Found {count} {labels[source]} papers...")
+
+        # papers that fail extraction are handed to the background queue instead of being lost
+        def on_failed(paper, query):
+            if self.extraction_queue is not None:
+                self.extraction_queue.enqueue(paper, query=query, error=paper.status.value)
+                self.papers_deferred.emit(1)
+
+        def on_source_done(source):
+            logger.info("%s search finished.", labels[source])
+            self.status_changed.emit(f"{labels[source]} search complete.")
+            finished_signals[source].emit()
+
+        def run_session():
+            count = len(self.queries)
+            self.status_changed.emit(f"Searching {count} {'query' if count == 1 else 'queries'}...")
+            self.session.run(
+                self.queries,
+                search_arxiv=self.search_arxiv,
+                search_pubmed=self.search_pubmed,
+                search_web=self.search_general,
+                arxiv_limit=self.arxiv_limit,
+                pubmed_limit=self.pubmed_limit,
+                ddg_limit=self.ddg_limit,
+                on_paper=on_paper,
+                on_failed=on_failed,
+                on_source_done=on_source_done,
+                token=self.token,
+            )
+            if not self.token.cancelled:
+                self.status_changed.emit("All searches complete.")
+            elif self.token.reason == CANCELLED:
+                self.status_changed.emit("Search stopped, showing the papers found so far.")
+            else:
+                self.status_changed.emit("Deadline reached, showing the papers found so far.")
+            self.finished.emit()
 
         logger.info("Starting search sources...")
-        search_agent.search_sources(blackboard, pubmed_callback=pubmed_callback, pubmed_event=pubmed_event, arxiv_callback=arxiv_callback, arxiv_event=arxiv_event, web_callback=web_callback, web_event=web_event)
-
-        def wait_for_all():
-            logger.info("Waiting for all search threads to complete...")
-            if self.search_arxiv:
-                logger.info("Waiting for arXiv thread...")
-                arxiv_event.wait()
-
-            if self.search_pubmed:
-                logger.info("Waiting for PubMed thread...")
-                pubmed_event.wait()
-            if self.search_general:
-                logger.info("Waiting for web thread...")
-                web_event.wait()
-            self.status_changed.emit("All searches complete.")
-            self.finished.emit()
+        session_thread = threading.Thread(target=run_session)
+        session_thread.start()
 
-        wait_thread = threading.Thread(target=wait_for_all)
-        wait_thread.start()
+# the queue worker runs on a plain thread, so results are passed back to the gui through a signal
+class QueueNotifier(QObject):
+    paper_ready = pyqtSignal(object, str)
 
 # a custom widget is used for each paper to create a more complex layout than a simple list item
 class PaperItemWidget(QWidget):
-    def __init__(self, paper_data):
+    def __init__(self, paper_data, similar_to=None):
         super().__init__()
         self.paper_data = paper_data
         layout = QVBoxLayout()
-        title = paper_data.get('title', 'No Title')
-        source = paper_data.get('source', 'N/A')
-        authors = paper_data.get('authors', [])
-        abstract = paper_data.get('abstract', 'N/A')
+        title = paper_data.title or 'No Title'
+        source = paper_data.source or 'N/A'
+        authors = paper_data.authors
+        abstract = paper_data.abstract or 'N/A'
 
         self.checkbox = QCheckBox(title)
         self.checkbox.setChecked(False)
@@ -184,10 +177,12 @@ class PaperItemWidget(QWidget):
         layout.addWidget(self.open_link_button)
         layout.addWidget(source_label)
         layout.addWidget(authors_label)
+        if similar_to is not None:
+            layout.addWidget(QLabel(f"<i>Similar to: {similar_to.title or similar_to.url}</i>"))
         self.setLayout(layout)
 
     def open_link(self):
-        webbrowser.open(self.paper_data.get('url'))
+        webbrowser.open(self.paper_data.url)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -201,8 +196,30 @@ class MainWindow(QMainWindow):
         self.arxiv_limit = self.settings.value("arxiv_limit", 20, type=int)
         self.pubmed_limit = self.settings.value("pubmed_limit", 20, type=int)
         self.ddg_limit = self.settings.value("ddg_limit", 20, type=int)
+        self.deadline = self.settings.value("deadline", 0, type=int)
 
         self.unique_papers = set()
+        self.current_query = None
+        self.current_queries = []
+        # one session, and so one set of agents and connections, is kept for every search in the window
+        self.session = None
+        # pdfs and pages are parsed in worker processes so parsing does not hold up the window or the other downloads
+        self.parse_pool = None
+        # the ranker is created on the first ranking and keeps its vector cache for later searches
+        self.ranker = None
+        # cancelled by the stop button, by the next search or when the window closes
+        self.cancel_token = None
+        # the thread and worker of every search that has not finished yet, including ones a newer search replaced
+        self.searches = []
+        # the rest of an opened library, listed as the results are scrolled
+        self.library_papers = None
+        self.library_name = None
+
+        # the extraction queue is only opened once a search needs it
+        self.extraction_queue = None
+        self.queue_worker = None
+        self.queue_notifier = QueueNotifier()
+        self.queue_notifier.paper_ready.connect(self.add_deferred_paper)
 
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -210,10 +227,13 @@ class MainWindow(QMainWindow):
 
         search_layout = QHBoxLayout()
         self.query_input = QLineEdit()
-        self.query_input.setPlaceholderText("Enter your research query...")
+        self.query_input.setPlaceholderText("Enter your research query, separate several queries with ;")
         self.search_button = QPushButton("Search")
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
         search_layout.addWidget(self.query_input)
         search_layout.addWidget(self.search_button)
+        search_layout.addWidget(self.stop_button)
         main_layout.addLayout(search_layout)
 
         options_layout = QHBoxLayout()
@@ -251,35 +271,47 @@ class MainWindow(QMainWindow):
         # a qlistwidget is used to display the results as it is simple and efficient
         self.results_list = QListWidget()
         main_layout.addWidget(self.results_list)
+        self.results_list.verticalScrollBar().valueChanged.connect(self.load_more_library)
 
+        library_layout = QHBoxLayout()
+        self.open_library_button = QPushButton("Open Library")
         self.save_button = QPushButton("Save Selected to JSON")
-        main_layout.addWidget(self.save_button)
+        library_layout.addWidget(self.open_library_button)
+        library_layout.addWidget(self.save_button)
+        main_layout.addLayout(library_layout)
 
         self.statusBar = self.statusBar()
 
         self.search_button.clicked.connect(self.start_search)
+        self.stop_button.clicked.connect(self.stop_search)
         self.query_input.returnPressed.connect(self.start_search)
         self.save_button.clicked.connect(self.save_selected)
+        self.open_library_button.clicked.connect(self.open_library)
 
     def open_advanced_settings(self):
         dialog = AdvancedSettingsDialog(self)
         dialog.arxiv_limit_input.setText(str(self.arxiv_limit))
         dialog.pubmed_limit_input.setText(str(self.pubmed_limit))
         dialog.ddg_limit_input.setText(str(self.ddg_limit))
+        dialog.deadline_input.setText(str(self.deadline))
 
         if dialog.exec():
             limits = dialog.get_limits()
             self.arxiv_limit = int(limits["arxiv"])
             self.pubmed_limit = int(limits["pubmed"])
             self.ddg_limit = int(limits["ddg"])
+            self.deadline = int(limits["deadline"] or 0)
 
             self.settings.setValue("arxiv_limit", self.arxiv_limit)
             self.settings.setValue("pubmed_limit", self.pubmed_limit)
             self.settings.setValue("ddg_limit", self.ddg_limit)
+            self.settings.setValue("deadline", self.deadline)
 
     def start_search(self):
         query = self.query_input.text()
-        if not query: return
+        # several related queries can be searched together by separating them with semicolons
+        queries = [part.strip() for part in query.split(';') if part.strip()]
+        if not queries: return
 
         search_arxiv = self.arxiv_checkbox.isChecked()
         search_pubmed = self.pubmed_checkbox.isChecked()
@@ -289,10 +321,20 @@ class MainWindow(QMainWindow):
         pubmed_limit = self.pubmed_limit
         ddg_limit = self.ddg_limit
 
+        # a search still running from before would only spend bandwidth and quota on results nobody sees
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.cancel_token = CancelToken(self.deadline or None)
+
         self.search_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.close_library()
         self.results_list.clear()
         self.unique_papers.clear()
+        self.current_query = " ".join(queries)
+        self.current_queries = queries
         self.statusBar.showMessage("Starting search...")
+        self.start_queue_worker()
 
         if search_arxiv:
             self.arxiv_loading_label.show()
@@ -303,25 +345,93 @@ class MainWindow(QMainWindow):
 
         # each search is run in a separate thread to avoid blocking the gui
         self.thread = QThread()
-        self.worker = AgentWorker(query, search_arxiv, search_pubmed, search_general, arxiv_limit, pubmed_limit, ddg_limit)
+        self.worker = AgentWorker(queries, search_arxiv, search_pubmed, search_general, arxiv_limit, pubmed_limit, ddg_limit, self.get_session(), self.extraction_queue, self.cancel_token)
         self.worker.moveToThread(self.thread)
 
+        # a search replaced by a newer one runs on until it notices its token. its thread and worker are kept until
+        # then, and what it still reports is dropped so it cannot touch the results or buttons of the newer search
+        self.searches.append((self.thread, self.worker))
+        token = self.cancel_token
+
+        def current(slot):
+            def guarded(*args):
+                if token is self.cancel_token:
+                    slot(*args)
+            return guarded
+
+        thread, worker = self.thread, self.worker
         self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(current(self.rank_results))
         self.worker.finished.connect(self.thread.quit)
         self.worker.finished.connect(self.worker.deleteLater)
         self.thread.finished.connect(self.thread.deleteLater)
-        self.worker.arxiv_papers_found.connect(self.add_arxiv_papers)
-        self.worker.pubmed_papers_found.connect(self.add_pubmed_papers)
-        self.worker.general_web_papers_found.connect(self.add_general_web_papers)
-        self.worker.status_changed.connect(self.handle_status_change)
-        self.thread.finished.connect(lambda: self.search_button.setEnabled(True))
-
-        self.worker.arxiv_search_finished.connect(self.handle_arxiv_finished)
-        self.worker.pubmed_search_finished.connect(self.handle_pubmed_finished)
-        self.worker.general_web_search_finished.connect(self.handle_general_web_finished)
+        self.thread.finished.connect(lambda: self.searches.remove((thread, worker)))
+        self.worker.arxiv_papers_found.connect(current(self.add_arxiv_papers))
+        self.worker.pubmed_papers_found.connect(current(self.add_pubmed_papers))
+        self.worker.general_web_papers_found.connect(current(self.add_general_web_papers))
+        self.worker.status_changed.connect(current(self.handle_status_change))
+        self.worker.papers_deferred.connect(lambda count: self.queue_worker.wake())
+        self.thread.finished.connect(current(lambda: self.search_button.setEnabled(True)))
+        self.thread.finished.connect(current(lambda: self.stop_button.setEnabled(False)))
+
+        self.worker.arxiv_search_finished.connect(current(self.handle_arxiv_finished))
+        self.worker.pubmed_search_finished.connect(current(self.handle_pubmed_finished))
+        self.worker.general_web_search_finished.connect(current(self.handle_general_web_finished))
 
         self.thread.start()
 
+    # the worker finishes straight away with the papers found so far, queued requests are dropped and the results of
+    # any still in flight are ignored
+    def stop_search(self):
+        if self.cancel_token is not None and not self.cancel_token.cancelled:
+            self.cancel_token.cancel()
+            self.statusBar.showMessage("Stopping search...")
+        self.stop_button.setEnabled(False)
+
+    # the agents are only imported once the first search starts, so the window appears before they load
+    def get_session(self):
+        if self.session is None:
+            from agents.extraction_agent import ExtractionAgent
+            from cpu_pool import ParsePool
+            from session import ResearchSession
+            from yield_tracker import YieldTracker
+
+            self.parse_pool = ParsePool()
+            # how often each source's results turn out usable is kept across runs and trims the limits of the poor ones
+            self.session = ResearchSession(extraction_agent=ExtractionAgent(parse_pool=self.parse_pool), yield_tracker=YieldTracker())
+        return self.session
+
+    def start_queue_worker(self):
+        if self.queue_worker is not None:
+            return
+
+        self.extraction_queue = ExtractionQueue()
+        self.queue_worker = ExtractionWorker(
+            self.extraction_queue,
+            self.get_session().extraction_agent,
+            on_complete=lambda paper, query: self.queue_notifier.paper_ready.emit(paper, query or "")
+        )
+        self.queue_worker.start()
+
+    def add_deferred_paper(self, paper, query):
+        # jobs left over from earlier searches are still completed, but only shown for the current queries
+        if query not in self.current_queries:
+            return
+        self.add_paper_item(paper)
+        self.statusBar.showMessage(f"Filled in deferred paper: {paper.title or paper.url}")
+
+    def closeEvent(self, event):
+        self.close_library()
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        if self.queue_worker is not None:
+            self.queue_worker.stop()
+        if self.session is not None:
+            self.session.close()
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=False)
+        super().closeEvent(event)
+
     def update_spinner(self):
         self.char_index = (self.char_index + 1) % len(self.animation_chars)
         char = self.animation_chars[self.char_index]
@@ -356,9 +466,38 @@ class MainWindow(QMainWindow):
         else:
             self.statusBar.showMessage(status)
 
+    # once every source has reported, the list is rebuilt in ranked order and ticked papers stay ticked
+    def rank_results(self):
+        if not self.current_query or self.results_list.count() < 2:
+            return
+        if self.ranker is None:
+            from ranking import PaperRanker
+
+            self.ranker = PaperRanker()
+
+        widgets = [self.results_list.itemWidget(self.results_list.item(i)) for i in range(self.results_list.count())]
+        checked = {id(widget.paper_data) for widget in widgets if widget.checkbox.isChecked()}
+        ranked = self.ranker.rank(self.current_query, [widget.paper_data for widget in widgets])
+
+        self.results_list.clear()
+        for result in ranked:
+            similar_to = ranked[result.similar_to].paper if result.similar_to is not None else None
+            widget = self.add_list_widget(result.paper, similar_to)
+            widget.checkbox.setChecked(id(result.paper) in checked)
+        self.statusBar.showMessage(f"Ranked {len(ranked)} papers by relevance.")
+
+    def add_list_widget(self, paper_data, similar_to=None):
+        item = QListWidgetItem(self.results_list)
+        widget = PaperItemWidget(paper_data, similar_to)
+        item.setSizeHint(widget.sizeHint())
+        self.results_list.addItem(item)
+        self.results_list.setItemWidget(item, widget)
+        return widget
+
     def add_paper_item(self, paper_data):
-        title = paper_data.get('title', 'No Title')
-        authors = tuple(paper_data.get('authors', []))
+        paper_data = Paper.coerce(paper_data)
+        title = paper_data.title or 'No Title'
+        authors = tuple(paper_data.authors)
         paper_tuple = (title, authors)
 
         if paper_tuple in self.unique_papers:
@@ -366,12 +505,8 @@ class MainWindow(QMainWindow):
 
         self.unique_papers.add(paper_tuple)
 
-        logger.info(f"Adding paper to GUI: {paper_data.get('title')} - {paper_data.get('url')}")
-        item = QListWidgetItem(self.results_list)
-        widget = PaperItemWidget(paper_data)
-        item.setSizeHint(widget.sizeHint())
-        self.results_list.addItem(item)
-        self.results_list.setItemWidget(item, widget)
+        logger.info("Adding paper to GUI: %s - %s", paper_data.title, paper_data.url, extra=SAMPLED)
+        self.add_list_widget(paper_data)
 
     def add_arxiv_papers(self, papers):
         if not papers:
@@ -393,6 +528,51 @@ class MainWindow(QMainWindow):
         for paper in papers:
             self.add_paper_item(paper)
 
+    def open_library(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Open Library", "", "Libraries (*.lib *.jsonl *.json)")
+        if path:
+            self.load_library(path)
+
+    # a library is listed a page at a time as the list is scrolled to its end. a .lib file is memory mapped, so only
+    # the records of the pages shown are read, however large the library is
+    def load_library(self, path):
+        from export import iter_library
+
+        self.close_library()
+        self.results_list.clear()
+        self.unique_papers.clear()
+        self.library_name = os.path.basename(path)
+        self.library_papers = iter_library(path)
+        self.load_library_page()
+
+    def load_library_page(self):
+        from library import LibraryError
+
+        try:
+            page = list(itertools.islice(self.library_papers, LIBRARY_PAGE))
+        except (OSError, ValueError, LibraryError) as e:
+            logger.error("Could not open library %s: %s", self.library_name, e)
+            self.statusBar.showMessage(f"Could not open {self.library_name}: {e}")
+            self.close_library()
+            return
+        for paper in page:
+            self.add_paper_item(paper)
+        if len(page) < LIBRARY_PAGE:
+            self.close_library()
+            self.statusBar.showMessage(f"Loaded {self.results_list.count()} papers from {self.library_name}.")
+        else:
+            self.statusBar.showMessage(f"Loaded {self.results_list.count()} papers from {self.library_name}, scroll down for more.")
+
+    def load_more_library(self, value):
+        if self.library_papers is not None and value == self.results_list.verticalScrollBar().maximum():
+            self.load_library_page()
+
+    # closes the file of a library that was not listed to the end
+    def close_library(self):
+        if self.library_papers is not None:
+            self.library_papers.close()
+            self.library_papers = None
+
     def save_selected(self):
         selected_papers = []
         for i in range(self.results_list.count()):
@@ -405,12 +585,15 @@ class MainWindow(QMainWindow):
             self.statusBar.showMessage("No papers selected to save.")
             return
 
+        from agents.storage_agent import StorageAgent
+
         storage_agent = StorageAgent()
         blackboard = {"extracted_data": selected_papers}
         storage_agent.run(blackboard)
         self.statusBar.showMessage(f"Successfully saved {len(selected_papers)} papers.")
 
 if __name__ == '__main__':
+    configure_logging()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
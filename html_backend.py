@@ -0,0 +1,168 @@
+import re
+
+from logging_config import logger
+
+# the first of these that can be imported is used, beautifulsoup is the pure python fallback
+PREFERRED_BACKENDS = ('selectolax', 'lxml', 'bs4')
+
+ABSTRACT_CLASSES = ('abstract', 'abstract-content')
+AUTHOR_CLASSES = ('author', 'authors')
+
+HEAD_END = re.compile(rb'</head\s*>', re.IGNORECASE)
+
+def _decode(content):
+    return content if isinstance(content, bytes) else content.encode('utf-8')
+
+# meta tags live in <head>, so for those we stop reading at </head> instead of parsing the whole page
+def head_only(content):
+    content = _decode(content)
+    match = HEAD_END.search(content)
+    return content[:match.end()] if match else content
+
+
+class SelectolaxDocument:
+    def __init__(self, content):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self.tree = LexborHTMLParser(content)
+
+    def meta(self):
+        values = {}
+        for node in self.tree.css('meta[name]'):
+            content = node.attributes.get('content')
+            if content:
+                values.setdefault(node.attributes['name'].lower(), []).append(content)
+        return values
+
+    def texts(self, tag, classes):
+        selector = ', '.join(f"{tag}.{cls}" for cls in classes)
+        return [node.text(separator=' ') for node in self.tree.css(selector)]
+
+    def text(self):
+        self.tree.strip_tags(['script', 'style', 'noscript'])
+        root = self.tree.body or self.tree.root
+        return root.text(separator=' ') if root is not None else ''
+
+
+class LxmlDocument:
+    def __init__(self, content):
+        import lxml.html
+
+        self.tree = lxml.html.document_fromstring(content)
+
+    def meta(self):
+        values = {}
+        for node in self.tree.iter('meta'):
+            name, content = node.get('name'), node.get('content')
+            if name and content:
+                values.setdefault(name.lower(), []).append(content)
+        return values
+
+    def texts(self, tag, classes):
+        found = []
+        for node in self.tree.iter(tag):
+            if set((node.get('class') or '').split()) & set(classes):
+                found.append(node.text_content())
+        return found
+
+    def text(self):
+        for node in list(self.tree.iter('script', 'style', 'noscript')):
+            node.drop_tree()
+        return ' '.join(self.tree.itertext())
+
+
+class SoupDocument:
+    def __init__(self, content):
+        from bs4 import BeautifulSoup
+
+        self.soup = BeautifulSoup(content, 'html.parser')
+
+    def meta(self):
+        values = {}
+        for node in self.soup.find_all('meta', attrs={'name': True, 'content': True}):
+            values.setdefault(node['name'].lower(), []).append(node['content'])
+        return values
+
+    def texts(self, tag, classes):
+        return [node.text for node in self.soup.find_all(tag, class_=list(classes))]
+
+    def text(self):
+        for node in self.soup(['script', 'style', 'noscript']):
+            node.decompose()
+        return self.soup.get_text()
+
+
+DOCUMENTS = {
+    'selectolax': SelectolaxDocument,
+    'lxml': LxmlDocument,
+    'bs4': SoupDocument,
+}
+
+MODULES = {
+    'selectolax': 'selectolax.lexbor',
+    'lxml': 'lxml.html',
+    'bs4': 'bs4',
+}
+
+_default_backend = None
+
+def available_backends():
+    import importlib.util
+
+    found = []
+    for name in PREFERRED_BACKENDS:
+        try:
+            if importlib.util.find_spec(MODULES[name]) is not None:
+                found.append(name)
+        except ModuleNotFoundError:
+            pass
+    return found
+
+
+def default_backend():
+    global _default_backend
+    if _default_backend is None:
+        backends = available_backends()
+        if not backends:
+            raise ImportError("no html parser is installed, install selectolax, lxml or beautifulsoup4")
+        _default_backend = backends[0]
+        logger.info("Using %s for HTML parsing.", _default_backend)
+    return _default_backend
+
+
+def parse(content, backend=None):
+    return DOCUMENTS[backend or default_backend()](_decode(content))
+
+
+def _year(value):
+    match = re.search(r'\d{4}', value or '')
+    return match.group(0) if match else None
+
+
+# pulls the citation meta tags from <head> first and only parses the body when something is still missing
+def extract_metadata(content, backend=None):
+    backend = backend or default_backend()
+    meta = parse(head_only(content), backend).meta()
+
+    metadata = {
+        'title': (meta.get('citation_title') or [None])[0],
+        'authors': meta.get('citation_author', []),
+        'abstract': (meta.get('citation_abstract') or [None])[0],
+        'doi': (meta.get('citation_doi') or [None])[0],
+        'year': _year((meta.get('citation_publication_date') or meta.get('citation_date') or [None])[0]),
+    }
+
+    if not metadata['abstract'] or not metadata['authors']:
+        document = parse(content, backend)
+        if not metadata['authors']:
+            metadata['authors'] = [text.strip() for text in document.texts('a', AUTHOR_CLASSES) if text.strip()]
+        if not metadata['abstract']:
+            abstracts = document.texts('div', ABSTRACT_CLASSES)
+            metadata['abstract'] = abstracts[0].strip() if abstracts and abstracts[0].strip() else None
+        if not metadata['abstract'] and meta.get('description'):
+            metadata['abstract'] = meta['description'][0]
+    return metadata
+
+
+def extract_text(content, backend=None):
+    return parse(content, backend).text()
@@ -0,0 +1,199 @@
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from bisect import bisect_left
+
+from paper import Paper, PaperStatus
+
+# a .lib file is laid out as a header, fixed size records, the author lists, a sorted key index and a string table.
+# strings live in the table and are referred to by offset and length, so a record can be read by seeking to
+# i * RECORD.size without touching the rest of the file
+MAGIC = b'PAPERLIB'
+VERSION = 1
+
+# magic, version, record count, author count, index count, then the offsets of the four sections
+HEADER = struct.Struct('<8sHxxIIIQQQQ')
+STRING_REF = struct.Struct('<II')
+# title, year, source, venue, doi, url and abstract as string refs, then the first author, the author count and the status
+STRING_FIELDS = ('title', 'year', 'source', 'venue', 'doi', 'url', 'abstract')
+RECORD = struct.Struct('<' + 'II' * len(STRING_FIELDS) + 'IIB3x')
+# a key string ref and the record it points at, sorted by the key bytes
+INDEX_ENTRY = struct.Struct('<III')
+
+NULL = 0xFFFFFFFF
+STATUSES = list(PaperStatus)
+
+
+class LibraryError(Exception):
+    pass
+
+
+# fields that repeat across papers are stored once, the rest are appended as they come so the table can be spooled to disk
+SHARED_FIELDS = ('year', 'source', 'venue')
+
+
+class _StringTable:
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+        self.refs = {}
+
+    def add(self, value, shared=False):
+        if value is None:
+            return NULL, 0
+        value = str(value)
+        ref = self.refs.get(value) if shared else None
+        if ref is None:
+            encoded = value.encode('utf-8')
+            if self.size + len(encoded) >= NULL:
+                raise LibraryError("the string table is limited to 4 GB")
+            ref = (self.size, len(encoded))
+            self.f.write(encoded)
+            self.size += len(encoded)
+            if shared:
+                self.refs[value] = ref
+        return ref
+
+
+# papers can be any iterable. the sections are spooled to temporary files as the papers arrive and only the index keys
+# are held in memory. the file is written next to the old one and moved into place, so a reader that has the old
+# library mapped keeps a consistent copy and the next one to open it sees the new one
+def write_library(papers, path):
+    with tempfile.TemporaryFile() as records, tempfile.TemporaryFile() as authors, tempfile.TemporaryFile() as string_file:
+        strings = _StringTable(string_file)
+        keys = {}
+        count = 0
+        author_count = 0
+        for paper in papers:
+            paper = Paper.coerce(paper)
+            refs = {name: strings.add(getattr(paper, name), shared=name in SHARED_FIELDS) for name in STRING_FIELDS}
+            for author in paper.authors:
+                authors.write(STRING_REF.pack(*strings.add(author, shared=True)))
+            records.write(RECORD.pack(*(value for name in STRING_FIELDS for value in refs[name]),
+                                      author_count, len(paper.authors), STATUSES.index(paper.status)))
+            author_count += len(paper.authors)
+            # the first paper with a given doi or url wins, as it does when the storage agent deduplicates
+            for name in ('doi', 'url'):
+                key = getattr(paper, name)
+                if key and key not in keys:
+                    keys[key] = (refs[name], count)
+            count += 1
+
+        index = bytearray()
+        for key in sorted(keys, key=lambda key: key.encode('utf-8')):
+            ref, record = keys[key]
+            index += INDEX_ENTRY.pack(*ref, record)
+
+        records_offset = HEADER.size
+        authors_offset = records_offset + records.tell()
+        index_offset = authors_offset + authors.tell()
+        strings_offset = index_offset + len(index)
+        header = HEADER.pack(MAGIC, VERSION, count, author_count, len(keys), records_offset, authors_offset, index_offset, strings_offset)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                for section in (records, authors):
+                    section.seek(0)
+                    shutil.copyfileobj(section, f)
+                f.write(index)
+                string_file.seek(0)
+                shutil.copyfileobj(string_file, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return count
+
+
+# a read only view of a .lib file. opening it only maps the file and reads the header, records are decoded when they
+# are asked for, and the pages are shared with every other process that has the same file open
+class Library:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise LibraryError(f"{path} is not a paper library")
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.author_count, self.index_count, self.records_offset, self.authors_offset, \
+            self.index_offset, self.strings_offset = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            self.mm.close()
+            raise LibraryError(f"{path} is not a paper library")
+        if version != VERSION:
+            self.mm.close()
+            raise LibraryError(f"{path} is version {version} of the library format, this reads version {VERSION}")
+        # a truncated or damaged file is refused here rather than failing on the first record that points past its end
+        if not (self.records_offset + self.count * RECORD.size <= self.authors_offset
+                and self.authors_offset + self.author_count * STRING_REF.size <= self.index_offset
+                and self.index_offset + self.index_count * INDEX_ENTRY.size <= self.strings_offset <= len(self.mm)
+                and self.records_offset >= HEADER.size):
+            self.mm.close()
+            raise LibraryError(f"{path} is truncated or damaged")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.mm.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def _string(self, offset, length):
+        if offset == NULL:
+            return None
+        start = self.strings_offset + offset
+        if start + length > len(self.mm):
+            raise LibraryError(f"a string in {self.path} runs past the end of the file")
+        return self.mm[start:start + length].decode('utf-8')
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("library index out of range")
+        try:
+            values = RECORD.unpack_from(self.mm, self.records_offset + i * RECORD.size)
+            fields = {name: self._string(values[2 * n], values[2 * n + 1]) for n, name in enumerate(STRING_FIELDS)}
+            first_author, author_count, status = values[-3:]
+            if first_author + author_count > self.author_count:
+                raise LibraryError(f"record {i} of {self.path} points past the author list")
+            authors = [self._string(*STRING_REF.unpack_from(self.mm, self.authors_offset + (first_author + n) * STRING_REF.size))
+                       for n in range(author_count)]
+            return Paper(authors=authors, status=STATUSES[status], **fields)
+        except (struct.error, UnicodeDecodeError, IndexError) as e:
+            raise LibraryError(f"record {i} of {self.path} is damaged: {e}") from e
+
+    def _key(self, n):
+        offset, length, _ = INDEX_ENTRY.unpack_from(self.mm, self.index_offset + n * INDEX_ENTRY.size)
+        start = self.strings_offset + offset
+        if start + length > len(self.mm):
+            raise LibraryError(f"a key in {self.path} runs past the end of the file")
+        return self.mm[start:start + length]
+
+    # binary search over the sorted index, only the keys it compares against are read
+    def find(self, key):
+        encoded = key.encode('utf-8')
+        n = bisect_left(range(self.index_count), encoded, key=self._key)
+        if n < self.index_count and self._key(n) == encoded:
+            return INDEX_ENTRY.unpack_from(self.mm, self.index_offset + n * INDEX_ENTRY.size)[2]
+        return None
+
+    # looks a paper up by its doi or url
+    def get(self, key, default=None):
+        i = self.find(key)
+        return default if i is None else self[i]
+
+    def __contains__(self, key):
+        return self.find(key) is not None
@@ -1,18 +1,126 @@
+import atexit
+import contextvars
+import json
 import logging
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-# a central logging configuration is used to ensure consistent logging across all modules
+LOG_PATH = os.environ.get('LOG_PATH', 'app.log')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# app.log is rotated at this size and the last few files are kept
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 3
+# per item messages marked as sampled are written once for every this many
+SAMPLE_EVERY = int(os.environ.get('LOG_SAMPLE_EVERY', '20'))
+
+# fields from log_context and from extra= that are copied into the json records
+CONTEXT_FIELDS = ('query', 'paper_id')
+
+# pass as extra= on messages logged once per paper or per result
+SAMPLED = {'sampled': True}
+
+_context = contextvars.ContextVar('log_context', default={})
+
+# tags every record logged inside the block, e.g. with the query a session task works on. each thread has its own
+# context, so a task sets it on the thread that runs it
+@contextmanager
+def log_context(**fields):
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        for field, value in _context.get().items():
+            if not hasattr(record, field):
+                setattr(record, field, value)
+        return True
+
+
+# records logged with extra={'sampled': True} are let through once per SAMPLE_EVERY for each message template,
+# the first one always gets through and the next one to pass says how many were dropped in between
+class SamplingFilter(logging.Filter):
+    def __init__(self, every=SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False) or self.every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        if count % self.every:
+            return False
+        record.suppressed = self.every - 1 if count else 0
+        return True
+
+
+# the queue never leaves the process, so records are passed on unformatted and the message is only built on the listener thread
+class LazyQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+# one json object per line, so the log can be filtered by query or paper with standard tools
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if getattr(record, 'suppressed', 0):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+# a central logging configuration is used to ensure consistent logging across all modules. importing this module only
+# creates the logger, the gui and command line entry points call configure_logging to attach the handlers. parse
+# workers import the agents' modules too but never configure anything, so they only print warnings to stderr
+# instead of each rotating the same app.log
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
+logger.setLevel(LOG_LEVEL)
+logger.addFilter(ContextFilter())
+logger.addFilter(SamplingFilter())
+
+_listener = None
+_configure_lock = threading.Lock()
 
-file_handler = logging.FileHandler('app.log')
-file_handler.setLevel(logging.INFO)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
+# the logging calls only put the record on a queue, a listener thread formats it and does the file and console
+# writes. calling this again does nothing
+def configure_logging(path=LOG_PATH):
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        file_handler = RotatingFileHandler(path, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter())
 
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(LazyQueueHandler(log_queue))
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        # records still on the queue are written before the interpreter exits
+        atexit.register(_listener.stop)
@@ -0,0 +1,123 @@
+import json
+from dataclasses import dataclass, field
+from enum import Enum
+
+class PaperStatus(str, Enum):
+    PENDING = 'pending'
+    COMPLETE = 'complete'
+    INCOMPLETE = 'incomplete'
+    NOT_ACADEMIC = 'not_academic'
+    FETCH_ERROR = 'fetch_error'
+    PARSE_ERROR = 'parse_error'
+    API_ERROR = 'api_error'
+    EXTRACTION_ERROR = 'extraction_error'
+    # the search was stopped or ran out of time before this paper was extracted
+    CANCELLED = 'cancelled'
+
+# these statuses mean extraction did not finish, so the paper is worth retrying later
+RETRYABLE_STATUSES = frozenset({
+    PaperStatus.FETCH_ERROR,
+    PaperStatus.PARSE_ERROR,
+    PaperStatus.API_ERROR,
+    PaperStatus.EXTRACTION_ERROR,
+    PaperStatus.CANCELLED,
+})
+
+# older digests and queue entries used placeholder strings instead of a status
+LEGACY_SENTINELS = {
+    'Extraction Failed': PaperStatus.API_ERROR,
+    'API Error': PaperStatus.API_ERROR,
+    'Fetch Error': PaperStatus.FETCH_ERROR,
+    'Fetch/Parse Error': PaperStatus.PARSE_ERROR,
+    'Extraction Error': PaperStatus.EXTRACTION_ERROR,
+}
+
+def _clean(value):
+    return None if value in (None, '', 'N/A') else value
+
+# slots keep each record small, which matters once the library holds hundreds of thousands of papers
+@dataclass(slots=True)
+class Paper:
+    title: str | None = None
+    authors: list = field(default_factory=list)
+    year: str | None = None
+    source: str | None = None
+    venue: str | None = None
+    doi: str | None = None
+    url: str | None = None
+    abstract: str | None = None
+    status: PaperStatus = PaperStatus.PENDING
+
+    @property
+    def identifier(self):
+        return self.doi or self.url
+
+    @property
+    def has_metadata(self):
+        return bool(self.abstract) and bool(self.authors)
+
+    @property
+    def failed(self):
+        return self.status in RETRYABLE_STATUSES
+
+    # called once extraction has run without errors
+    def finish(self):
+        self.status = PaperStatus.COMPLETE if self.abstract else PaperStatus.INCOMPLETE
+        return self
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'authors': self.authors,
+            'year': self.year,
+            'source': self.source,
+            'venue': self.venue,
+            'doi': self.doi,
+            'url': self.url,
+            'abstract': self.abstract,
+            'status': self.status.value,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_dict(cls, data):
+        abstract = data.get('abstract')
+        title = data.get('title')
+        status = data.get('status')
+        # old failed extractions wrote the sentinel into the title as well as, or instead of, the abstract
+        sentinel = next((value for value in (abstract, title) if value in LEGACY_SENTINELS), None)
+        if status is not None:
+            status = PaperStatus(status)
+        elif sentinel is not None:
+            status = LEGACY_SENTINELS[sentinel]
+        else:
+            status = PaperStatus.COMPLETE if _clean(abstract) else PaperStatus.PENDING
+        if abstract in LEGACY_SENTINELS:
+            abstract = None
+        if title in LEGACY_SENTINELS:
+            title = None
+
+        authors = [author for author in data.get('authors') or [] if author != 'N/A']
+        year = _clean(data.get('year'))
+        return cls(
+            title=_clean(title),
+            authors=authors,
+            year=str(year) if year is not None else None,
+            source=_clean(data.get('source')),
+            venue=_clean(data.get('venue')),
+            doi=_clean(data.get('doi')),
+            url=_clean(data.get('url')),
+            abstract=_clean(abstract),
+            status=status,
+        )
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    # lets entry points accept both records and the plain dicts used by older callers
+    @classmethod
+    def coerce(cls, paper):
+        return paper if isinstance(paper, cls) else cls.from_dict(paper)
@@ -0,0 +1,234 @@
+import argparse
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from agents.search_agent import SearchAgent
+from agents.extraction_agent import ExtractionAgent
+from agents.storage_agent import StorageAgent
+from agents.ranking_agent import RankingAgent
+from blackboard import Blackboard
+from cancel import CancelToken
+from fetch import FetchStats
+from cpu_pool import ParsePool
+from extraction_backends import metered
+from logging_config import configure_logging, log_context, logger
+from paper import PaperStatus
+from yield_tracker import YieldTracker
+
+# collects how long each stage took so that runs can be compared with each other
+class StageTimings:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+
+# the gui shows pubmed and arxiv papers as long as extraction worked, but web hits also need an abstract
+def is_usable(paper):
+    if paper.failed or paper.status == PaperStatus.NOT_ACADEMIC:
+        return False
+    return paper.source != 'Web' or bool(paper.abstract)
+
+
+# the yield tracker counts papers under the name of the search they came from
+SOURCE_KEYS = {'arXiv': 'arxiv', 'PubMed': 'pubmed', 'Web': 'web'}
+
+
+# this runs the same search, extraction, ranking and storage steps as the gui, without qt, for scripts and benchmarks.
+# when the cancel token fires the papers extracted so far are still ranked and saved, and token.reason
+# tells the caller why the results are incomplete. a yield tracker adapts the limits and stops extracting a source
+# early in the same way as in a session
+def run_pipeline(query, search_arxiv=True, search_pubmed=True, search_web=True, arxiv_limit=20, pubmed_limit=20, ddg_limit=20,
+                 search_agent=None, extraction_agent=None, storage_agent=None, timings=None, ranking_agent=None,
+                 since=None, high_water_marks=None, seen_urls=None, token=None, yield_tracker=None):
+    search_agent = search_agent or SearchAgent()
+    extraction_agent = extraction_agent or ExtractionAgent()
+    storage_agent = storage_agent or StorageAgent()
+    ranking_agent = ranking_agent or RankingAgent()
+    timings = timings or StageTimings()
+    token = token or CancelToken()
+    source_runs = {}
+    if yield_tracker:
+        arxiv_limit = yield_tracker.limit('arxiv', arxiv_limit)
+        pubmed_limit = yield_tracker.limit('pubmed', pubmed_limit)
+        ddg_limit = yield_tracker.limit('web', ddg_limit)
+        source_runs = {source: yield_tracker.start(source) for source in SOURCE_KEYS.values()}
+
+    blackboard = Blackboard({
+        "query": query,
+        "papers": None,
+        "extracted_data": [],
+        "status": "running",
+        "search_arxiv": search_arxiv,
+        "search_pubmed": search_pubmed,
+        "search_web": search_web,
+        "arxiv_limit": arxiv_limit,
+        "pubmed_limit": pubmed_limit,
+        "ddg_limit": ddg_limit,
+        "since": since or {},
+        "high_water_marks": high_water_marks if high_water_marks is not None else {},
+        "cancel_token": token,
+        "fetch_stats": FetchStats(),
+        "timings": timings,
+    })
+    events = {}
+    # sources with papers that failed extraction, their high-water marks are not moved on
+    unfinished = set()
+    # identifiers of the papers extracted so far, a pubmed record only has its doi after extraction and may turn out
+    # to be a paper another source already returned
+    claimed = set()
+    start = time.perf_counter()
+
+    # each batch of search results is extracted on the thread that posted it, as soon as it lands on the blackboard
+    def extract_new(change):
+        extracted = []
+        usable = []
+        skipped = []
+        with log_context(query=query):
+            for paper in change.added or ():
+                source_run = source_runs.get(SOURCE_KEYS.get(paper.source))
+                if source_run is not None and source_run.skip():
+                    skipped.append(paper)
+                    continue
+                with timings.time("extraction"), metered() as meter:
+                    paper = extraction_agent.extract_metadata(paper, token, blackboard["fetch_stats"])
+                extracted.append(paper)
+                duplicate = False
+                if not paper.failed and paper.identifier:
+                    with blackboard.lock:
+                        duplicate = paper.identifier in claimed
+                        claimed.add(paper.identifier)
+                if is_usable(paper) and not duplicate:
+                    usable.append(paper)
+                if source_run is not None and paper.status != PaperStatus.CANCELLED and not token.cancelled:
+                    source_run.record_paper(paper, is_usable(paper), duplicate, meter.cost)
+        # failed extractions are left out so the next run tries them again, and their source keeps its old
+        # high-water mark so the next search still returns them. papers skipped by early stopping count as handled
+        failed = [paper for paper in extracted if paper.failed]
+        with blackboard.lock:
+            if seen_urls is not None:
+                seen_urls.update(paper.url for paper in extracted + skipped if paper.url and not paper.failed)
+            unfinished.update(SOURCE_KEYS.get(paper.source, paper.source) for paper in failed)
+        blackboard.extend("extracted_data", usable)
+
+    blackboard.subscribe("papers", extract_new)
+
+    # papers handled by an earlier run of a watch query are not extracted again
+    def add_papers(found):
+        blackboard.extend("papers", [paper for paper in found if not (seen_urls and paper.url in seen_urls)])
+
+    kwargs = {}
+    for source, enabled in (("arxiv", search_arxiv), ("pubmed", search_pubmed), ("web", search_web)):
+        if enabled:
+            events[source] = threading.Event()
+            kwargs[f"{source}_callback"] = add_papers
+            kwargs[f"{source}_event"] = events[source]
+
+    search_agent.search_sources(blackboard, **kwargs)
+    # cancelling releases the wait straight away instead of waiting for the searches to notice
+    token.on_cancel(lambda: [event.set() for event in events.values()])
+    for event in events.values():
+        event.wait()
+    blackboard["status"] = token.reason or "complete"
+    # a stopped run may not have extracted everything its searches returned, so none of its marks are moved on
+    marks = blackboard["high_water_marks"]
+    with blackboard.lock:
+        for source in (list(marks) if token.cancelled else unfinished):
+            if source in blackboard["since"]:
+                marks[source] = blackboard["since"][source]
+            else:
+                marks.pop(source, None)
+
+    papers = blackboard["extracted_data"]
+    if papers:
+        with timings.time("ranking"):
+            ranking_agent.run(blackboard)
+        papers = blackboard["extracted_data"]
+        with timings.time("storage"):
+            storage_agent.run(blackboard)
+
+    logger.info("Pipeline finished for '%s' (%s) with %s papers in %.2fs.", query, blackboard['status'], len(papers), time.perf_counter() - start)
+    logger.info("Fetches for '%s': %s.", query, blackboard['fetch_stats'].summary())
+    if yield_tracker:
+        logger.info("Source yield so far: %s.", yield_tracker.summary())
+        yield_tracker.save()
+    return papers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search, extract and save papers without the gui.")
+    parser.add_argument("query", nargs="+", help="more than one query is searched as one session and deduplicated")
+    parser.add_argument("--no-arxiv", action="store_true")
+    parser.add_argument("--no-pubmed", action="store_true")
+    parser.add_argument("--no-web", action="store_true")
+    parser.add_argument("--arxiv-limit", type=int, default=20)
+    parser.add_argument("--pubmed-limit", type=int, default=20)
+    parser.add_argument("--ddg-limit", type=int, default=20)
+    parser.add_argument("--output", default="research_digest.json")
+    parser.add_argument("--workers", type=int, default=0, help="parse pdf and html documents in this many worker processes")
+    parser.add_argument("--deadline", type=float, help="stop after this many seconds and save the papers found so far")
+    parser.add_argument("--no-adapt", action="store_true", help="use the limits as given, the yield of each source is still recorded")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    token = CancelToken(args.deadline)
+    yield_tracker = YieldTracker(adaptive=not args.no_adapt)
+
+    parse_pool = ParsePool(max_workers=args.workers) if args.workers else None
+    extraction_agent = ExtractionAgent(parse_pool=parse_pool)
+    storage_agent = StorageAgent(args.output)
+    ranking_agent = RankingAgent()
+    if len(args.query) == 1:
+        papers = run_pipeline(
+            args.query[0],
+            search_arxiv=not args.no_arxiv,
+            search_pubmed=not args.no_pubmed,
+            search_web=not args.no_web,
+            arxiv_limit=args.arxiv_limit,
+            pubmed_limit=args.pubmed_limit,
+            ddg_limit=args.ddg_limit,
+            extraction_agent=extraction_agent,
+            storage_agent=storage_agent,
+            ranking_agent=ranking_agent,
+            token=token,
+            yield_tracker=yield_tracker,
+        )
+    else:
+        from session import ResearchSession
+
+        with ResearchSession(extraction_agent=extraction_agent, yield_tracker=yield_tracker) as session:
+            papers = session.run(
+                args.query,
+                search_arxiv=not args.no_arxiv,
+                search_pubmed=not args.no_pubmed,
+                search_web=not args.no_web,
+                arxiv_limit=args.arxiv_limit,
+                pubmed_limit=args.pubmed_limit,
+                ddg_limit=args.ddg_limit,
+                token=token,
+            )
+        if papers:
+            blackboard = {"query": " ".join(args.query), "extracted_data": papers}
+            ranking_agent.run(blackboard)
+            storage_agent.run(blackboard)
+    if parse_pool:
+        parse_pool.shutdown()
+    print(f"saved {len(papers)} papers to {args.output}" + (" (deadline reached, results are incomplete)" if token.cancelled else ""))
+    print(f"source yield: {yield_tracker.summary()}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import string
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+# ends each title and abstract when a batch of papers is joined into one text. normalising turns it into a space,
+# so it can never come from the text itself
+FIELD_END = '\x00'
+WHITESPACE = ''.join(chr(code) for code in range(0x3001) if chr(code).isspace())
+
+# punctuation and every kind of whitespace become a plain space, so tokens can be found in the utf-8 bytes of the text
+PUNCTUATION = str.maketrans({char: ' ' for char in string.punctuation + WHITESPACE + FIELD_END})
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with we our "
+    "these those using use based can not also than into their such been between".split()
+)
+
+def normalise(text):
+    return (text or '').lower().translate(PUNCTUATION)
+
+def tokenise(text):
+    return normalise(text).split()
+
+# every pair of neighbouring bytes has a fixed random value, and a token hashes to the sum of the values of its pairs
+# including the spaces on either side. the sums come out of one cumulative sum over the whole text, so a batch of
+# papers is hashed without making a python string for each of its tokens
+PAIR_HASHES = np.random.default_rng(20240601).integers(0, 2 ** 32, size=1 << 16, dtype=np.uint32)
+
+# returns the hash of each token in a normalised text and whether the token is a FIELD_END
+def token_hashes(text):
+    data = np.frombuffer(f" {text} ".encode('utf-8'), dtype=np.uint8)
+    space = data == 32
+    # spaces start and end the text, so the changes between space and token alternate between starts and ends
+    changes = np.flatnonzero(space[1:] != space[:-1])
+    pairs = PAIR_HASHES[(data[:-1].astype(np.uint16) << 8) | data[1:]]
+    sums = np.zeros(len(data), dtype=np.uint32)
+    np.cumsum(pairs, dtype=np.uint32, out=sums[1:])
+    return sums[changes[1::2] + 1] - sums[changes[0::2]], data[changes[0::2] + 1] == 0
+
+STOPWORD_HASHES = np.unique(token_hashes(' '.join(STOPWORDS))[0])
+
+# titles are short but say the most about a paper, so their terms count more than abstract terms
+TITLE_WEIGHT = 3
+# papers missing from the cache are hashed this many at a time, which keeps the per byte arrays small
+FEATURE_BATCH = 2000
+
+# similar_to is the position of a higher ranked paper covering the same topic, or None
+Ranked = namedtuple('Ranked', ['paper', 'score', 'similar_to'])
+
+
+# papers are turned into hashed tf-idf vectors so that ranking is a single matrix product,
+# no vocabulary has to be built and nothing leaves the machine
+class PaperRanker:
+    def __init__(self, dims=1024, group_threshold=0.8, group_limit=2000, max_papers=50000):
+        self.dims = dims
+        self.group_threshold = group_threshold
+        self.group_limit = group_limit
+        # per paper term counts, keyed on the text as well so a paper filled in later is recomputed. the least recently
+        # ranked papers are dropped once there are more than max_papers
+        self.cache = OrderedDict()
+        self.max_papers = max_papers
+        # a ranker is shared by the queries a watch refreshes at once, the cache is only changed by one of them at a time
+        self.lock = threading.Lock()
+
+    # the slot of each token in a normalised text, stopwords map to -1 and field ends to -2 and both are dropped
+    # when the matrix is built
+    def slot_array(self, text):
+        hashes, field_ends = token_hashes(text)
+        slots = (hashes % self.dims).astype(np.int32)
+        found = np.minimum(np.searchsorted(STOPWORD_HASHES, hashes), len(STOPWORD_HASHES) - 1)
+        slots[STOPWORD_HASHES[found] == hashes] = -1
+        slots[field_ends] = -2
+        return slots
+
+    # papers missing from the cache are hashed together so the numpy work happens once per batch,
+    # each paper keeps its distinct slots with their sublinear term frequency
+    def add_features(self, papers):
+        text = ''.join(f"{normalise(paper.title)} {FIELD_END} {normalise(paper.abstract)} {FIELD_END} " for paper in papers)
+        slots = self.slot_array(text)
+
+        # every paper has a title and an abstract field, so the field ends before a token give its paper and whether
+        # it is in the title
+        field_ends = np.cumsum(slots == -2)
+        rows = field_ends >> 1
+        title = (field_ends & 1) == 0
+        keep = slots >= 0
+        keys = rows * self.dims + slots
+        # title keys are repeated so they are counted TITLE_WEIGHT times, then each run of equal sorted keys is one
+        # slot of one paper. a plain sort is several times faster than np.unique with its inverse
+        keys = np.sort(np.concatenate([keys[keep]] + [keys[keep & title]] * (TITLE_WEIGHT - 1)))
+        first = np.empty(len(keys), dtype=bool)
+        first[:1] = True
+        np.not_equal(keys[1:], keys[:-1], out=first[1:])
+        starts = np.flatnonzero(first)
+        values = 1 + np.log(np.diff(starts, append=len(keys)).astype(np.float32))
+        unique_rows, unique_slots = np.divmod(keys[starts], self.dims)
+        unique_slots = unique_slots.astype(np.int32)
+        bounds = np.searchsorted(unique_rows, np.arange(len(papers) + 1)).tolist()
+        return [(unique_slots[start:end], values[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+    def vectors(self, papers):
+        keys = [(paper.identifier, paper.title, paper.abstract) for paper in papers]
+        features = []
+        missing = {}
+        for n, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.setdefault(key, []).append(n)
+            else:
+                self.cache.move_to_end(key)
+            features.append(cached)
+        if missing:
+            batches = list(missing.values())
+            added = []
+            for start in range(0, len(batches), FEATURE_BATCH):
+                added += self.add_features([papers[positions[0]] for positions in batches[start:start + FEATURE_BATCH]])
+            for (key, positions), paper_features in zip(missing.items(), added):
+                self.cache[key] = paper_features
+                for n in positions:
+                    features[n] = paper_features
+            while len(self.cache) > self.max_papers:
+                self.cache.popitem(last=False)
+
+        matrix = np.zeros((len(papers), self.dims), dtype=np.float32)
+        lengths = np.fromiter((len(slots) for slots, _ in features), dtype=np.int64, count=len(features))
+        if lengths.sum():
+            rows = np.repeat(np.arange(len(papers)), lengths)
+            matrix[rows, np.concatenate([slots for slots, _ in features])] = np.concatenate([values for _, values in features])
+        return matrix
+
+    def rank(self, query, papers):
+        if not papers:
+            return []
+        with self.lock:
+            matrix = self.vectors(papers)
+            query_slots = self.slot_array(normalise(query))
+        document_frequency = np.count_nonzero(matrix, axis=0)
+        idf = np.log((1 + len(papers)) / (1 + document_frequency)).astype(np.float32) + 1
+        matrix *= idf
+        _normalise(matrix)
+
+        query_vector = np.bincount(query_slots[query_slots >= 0], minlength=self.dims).astype(np.float32)
+        present = query_vector > 0
+        np.log(query_vector, out=query_vector, where=present)
+        query_vector[present] += 1
+        query_vector *= idf
+        norm = np.linalg.norm(query_vector)
+        scores = matrix @ (query_vector / norm) if norm else np.zeros(len(papers), dtype=np.float32)
+
+        order = np.argsort(-scores, kind='stable')
+        similar_to = self.group(matrix[order[:self.group_limit]])
+        return [
+            Ranked(papers[index], float(scores[index]), similar_to.get(position))
+            for position, index in enumerate(order)
+        ]
+
+    # pairs of papers above the threshold are joined, and every paper points at the best ranked one in its group
+    def group(self, matrix, block=512):
+        count = len(matrix)
+        parent = list(range(count))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for start in range(0, count, block):
+            # only pairs where the second paper is ranked lower are looked at, so each block is compared with the rest
+            similarities = matrix[start:start + block] @ matrix[start:].T
+            rows, cols = np.nonzero(np.triu(similarities, k=1) >= self.group_threshold)
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                first, second = find(start + row), find(start + col)
+                if first != second:
+                    parent[max(first, second)] = min(first, second)
+
+        return {i: find(i) for i in range(count) if find(i) != i}
+
+
+def _normalise(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
@@ -0,0 +1,240 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cancel import CancelToken
+from extraction_backends import metered
+from fetch import FetchStats
+from logging_config import log_context, logger
+from paper import PaperStatus
+
+# requests per second each service tolerates without an api key, a source missing here is not limited
+DEFAULT_RATE_LIMITS = {
+    'arxiv': 1 / 3,
+    'pubmed': 3,
+    'ddg': 1,
+    'web': 5,
+    'gemini': 4,
+}
+
+# how many requests for one source may be waiting or running at once
+DEFAULT_CONCURRENCY = {
+    'arxiv': 1,
+    'pubmed': 3,
+    'web': 8,
+}
+
+SEARCH_METHODS = {
+    'arxiv': 'search_arxiv_thread',
+    'pubmed': 'search_pubmed_thread',
+    'web': 'search_web_thread',
+}
+
+# hands out evenly spaced slots (the generic cell rate algorithm), an idle limiter lets up to burst requests through at once
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def acquire(self, token=None):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        wait = slot - (self.burst - 1) * self.interval - now
+        if wait > 0:
+            if token is not None:
+                token.wait(wait)
+            else:
+                time.sleep(wait)
+
+
+# one limiter per source, shared by every agent and thread that talks to that source
+def make_rate_limiters(rate_limits=None):
+    rates = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+    return {source: RateLimiter(rate) for source, rate in rates.items() if rate}
+
+
+# runs several related queries with one set of agents, one connection pool and one set of rate limiters.
+# every source has its own small thread pool, so requests from all queries are interleaved to keep each
+# api busy up to its limit, and a paper found by more than one query or source is only extracted once
+class ResearchSession:
+    # a yield_tracker.YieldTracker, when given, cuts the limits of sources whose results are rarely usable and stops
+    # extracting a source's results for a query once the recent ones stopped being usable
+    def __init__(self, search_agent=None, extraction_agent=None, rate_limits=None, concurrency=None, pool_size=16, yield_tracker=None):
+        if search_agent is None:
+            from agents.search_agent import SearchAgent
+
+            search_agent = SearchAgent()
+        if extraction_agent is None:
+            from agents.extraction_agent import ExtractionAgent
+
+            extraction_agent = ExtractionAgent()
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+
+        self.rate_limiters = make_rate_limiters(rate_limits)
+        self.concurrency = {**DEFAULT_CONCURRENCY, **(concurrency or {})}
+
+        self.search_agent = search_agent
+        self.extraction_agent = extraction_agent
+        self.yield_tracker = yield_tracker
+        for agent in (search_agent, extraction_agent):
+            agent.http = self.http
+            agent.rate_limiters = self.rate_limiters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.http.close()
+
+    def run(self, queries, search_arxiv=True, search_pubmed=True, search_web=True, arxiv_limit=20, pubmed_limit=20, ddg_limit=20,
+            on_paper=None, on_failed=None, on_source_done=None, timings=None, token=None):
+        from pipeline import is_usable
+
+        limits = {'arxiv': arxiv_limit, 'pubmed': pubmed_limit, 'web': ddg_limit}
+        sources = [source for source, enabled in (('arxiv', search_arxiv), ('pubmed', search_pubmed), ('web', search_web)) if enabled]
+        if not queries or not sources:
+            return []
+        tracker = self.yield_tracker
+        if tracker:
+            for source in sources:
+                limit = tracker.limit(source, limits[source])
+                if limit != limits[source]:
+                    logger.info("Asking %s for %s results instead of %s, only %.0f%% of its results have been usable.",
+                                source, limit, limits[source], 100 * tracker.expected_yield(source))
+                limits[source] = limit
+        # once the token is cancelled queued tasks are dropped and run returns what was found so far, without
+        # waiting for requests still in flight, their timeouts already end at the deadline
+        token = token or CancelToken()
+
+        papers = []
+        fetch_stats = {query: FetchStats() for query in queries}
+        # identifiers of every paper handed to extraction in this run, across all queries and sources
+        seen = set()
+        pending = dict.fromkeys(sources, 0)
+        # sources on_source_done was called for, so a task finishing after a cancel does not report its source twice
+        finished = set()
+        condition = threading.Condition()
+        executors = {
+            source: ThreadPoolExecutor(max_workers=self.concurrency.get(source, 1), thread_name_prefix=f"session-{source}")
+            for source in sources
+        }
+
+        def claim(identifier):
+            with condition:
+                if identifier in seen:
+                    return False
+                seen.add(identifier)
+                return True
+
+        def submit(source, func, query, *args):
+            with condition:
+                pending[source] += 1
+            executors[source].submit(run_task, source, func, query, *args)
+
+        # a source is done once its last task finishes, its searches only finish after queueing their extractions.
+        # everything the task logs is tagged with its query
+        def run_task(source, func, query, *args):
+            try:
+                if not token.cancelled:
+                    with log_context(query=query):
+                        func(source, query, *args)
+            except Exception as e:
+                logger.error("Session task for %s failed: %s", source, e)
+            finally:
+                with condition:
+                    pending[source] -= 1
+                    done = pending[source] == 0
+                    condition.notify_all()
+                if done:
+                    source_done(source)
+
+        def source_done(source):
+            with condition:
+                if source in finished:
+                    return
+                finished.add(source)
+            if on_source_done:
+                on_source_done(source)
+
+        def search(source, query):
+            start = time.perf_counter()
+            found = []
+            getattr(self.search_agent, SEARCH_METHODS[source])(query, limits[source], found.extend, token=token)
+            if timings:
+                timings.record(f"search.{source}", time.perf_counter() - start)
+            new = [paper for paper in found if claim(paper.identifier)]
+            logger.info("%s search for '%s' returned %s papers, %s not seen before.", source, query, len(found), len(new))
+            # the results are queued in the order the search ranked them, which is what early stopping relies on
+            source_run = tracker.start(source) if tracker else None
+            for paper in new:
+                submit(source, extract, query, paper, source_run)
+
+        def extract(source, query, paper, source_run=None):
+            if source_run is not None and source_run.skip():
+                return
+            identifier = paper.identifier
+            start = time.perf_counter()
+            with metered() as meter:
+                paper = self.extraction_agent.extract_metadata(paper, token, fetch_stats[query])
+            if timings:
+                timings.record("extraction", time.perf_counter() - start)
+            # the search was stopped, so the paper is neither shown nor queued for a retry
+            if paper.status == PaperStatus.CANCELLED or token.cancelled:
+                return
+            # a pubmed record only has its doi after extraction, and may turn out to be a paper arxiv already returned
+            duplicate = not paper.failed and paper.identifier != identifier and not claim(paper.identifier)
+            usable = not duplicate and is_usable(paper)
+            if source_run is not None:
+                source_run.record_paper(paper, usable, duplicate, meter.cost)
+            if paper.failed:
+                if on_failed:
+                    on_failed(paper, query)
+                return
+            if usable:
+                with condition:
+                    if token.cancelled:
+                        return
+                    papers.append(paper)
+                if on_paper:
+                    on_paper(paper, query, source)
+
+        for source in sources:
+            for query in queries:
+                submit(source, search, query)
+
+        def wake():
+            with condition:
+                condition.notify_all()
+        token.on_cancel(wake)
+
+        with condition:
+            condition.wait_for(lambda: token.cancelled or not any(pending.values()))
+        for executor in executors.values():
+            executor.shutdown(wait=not token.cancelled, cancel_futures=True)
+        # the queued tasks that were dropped never finish, so the sources still waiting on them are reported done here
+        if token.cancelled:
+            for source in sources:
+                source_done(source)
+        if token.cancelled:
+            logger.info("Session stopped early (%s) with %s papers.", token.reason, len(papers))
+        for query, stats in fetch_stats.items():
+            logger.info("Fetches for '%s': %s.", query, stats.summary())
+        if tracker:
+            logger.info("Source yield so far: %s.", tracker.summary())
+            tracker.save()
+        with condition:
+            return list(papers)
@@ -0,0 +1,55 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_pipeline import compare_to_baseline, make_agents, percentile
+from benchmarks.stub_server import StubServer
+from pipeline import StageTimings, run_pipeline
+
+class TestBenchPipeline(unittest.TestCase):
+
+    def test_pipeline_against_stub_server(self):
+        # this test runs the search, extraction and storage agents end to end against the recorded fixtures
+        with tempfile.TemporaryDirectory() as tmpdir, StubServer() as server:
+            output_path = os.path.join(tmpdir, 'digest.json')
+            search_agent, extraction_agent, storage_agent = make_agents(server.url, output_path)
+            timings = StageTimings()
+            papers = run_pipeline("graph neural networks", search_web=False, arxiv_limit=5, pubmed_limit=5,
+                                  search_agent=search_agent, extraction_agent=extraction_agent, storage_agent=storage_agent, timings=timings)
+
+            with open(output_path, encoding='utf-8') as f:
+                saved = json.load(f)
+
+        self.assertEqual(len(papers), 10)
+        self.assertEqual(len(saved), 10)
+        self.assertEqual(len(timings.samples['extraction']), 10)
+        self.assertIn('storage', timings.samples)
+        self.assertEqual(len(timings.samples['search.pubmed']), 1)
+
+    def test_compare_to_baseline(self):
+        baseline = {'throughput_papers_per_s': 10.0, 'peak_memory_mb': 100.0, 'stages': {'extraction': {'p50': 0.1, 'p95': 0.2}}}
+        report = {'throughput_papers_per_s': 9.0, 'peak_memory_mb': 200.0, 'stages': {'extraction': {'p50': 0.1, 'p95': 0.5}}}
+        regressions = compare_to_baseline(report, baseline, tolerance=0.10)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith('peak_memory_mb'))
+        self.assertTrue(regressions[1].startswith('extraction.p95'))
+
+        # a few milliseconds on a short stage is below the floor even though it is far over the tolerance
+        report = {'iterations': 3, 'stages': {'search.pubmed': {'p50': 0.025, 'p95': 0.040}}}
+        baseline = {'iterations': 3, 'stages': {'search.pubmed': {'p50': 0.010, 'p95': 0.011}}}
+        self.assertEqual([regression.split(':')[0] for regression in compare_to_baseline(report, baseline)], ['search.pubmed.p95'])
+
+        # a single cold run is only held to the baseline's p95
+        report = {'iterations': 1, 'stages': {'ranking': {'p50': 0.060, 'p95': 0.060}}}
+        baseline = {'iterations': 3, 'stages': {'ranking': {'p50': 0.005, 'p95': 0.065}}}
+        self.assertEqual(compare_to_baseline(report, baseline), [])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+
+if __name__ == '__main__':
+    unittest.main()
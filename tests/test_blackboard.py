@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from blackboard import Blackboard
+from paper import Paper, PaperStatus
+from agents.extraction_agent import ExtractionAgent
+
+class TestBlackboard(unittest.TestCase):
+
+    def test_behaves_like_a_dict(self):
+        blackboard = Blackboard({"query": "graphs"}, papers=None)
+        blackboard["status"] = "running"
+        self.assertEqual(blackboard["query"], "graphs")
+        self.assertIsNone(blackboard.get("papers"))
+        self.assertEqual(blackboard.setdefault("high_water_marks", {}), {})
+        self.assertEqual(set(blackboard), {"query", "papers", "status", "high_water_marks"})
+        del blackboard["status"]
+        self.assertNotIn("status", blackboard)
+
+    def test_extend_notifies_subscribers_with_only_the_new_items(self):
+        blackboard = Blackboard(papers=None)
+        changes = []
+        unsubscribe = blackboard.subscribe("papers", changes.append)
+        blackboard.extend("papers", [1, 2])
+        blackboard.extend("papers", [])
+        blackboard.extend("papers", [3])
+        blackboard["query"] = "unwatched"
+        unsubscribe()
+        blackboard.extend("papers", [4])
+
+        self.assertEqual([change.added for change in changes], [[1, 2], [3]])
+        self.assertEqual(blackboard["papers"], [1, 2, 3, 4])
+
+    def test_deleting_a_key_notifies_its_subscribers(self):
+        blackboard = Blackboard(papers=[1], query="graphs")
+        changes = []
+        blackboard.subscribe("papers", changes.append)
+        del blackboard["papers"]
+        with self.assertRaises(KeyError):
+            del blackboard["papers"]
+        del blackboard["query"]
+        self.assertEqual(changes, [("papers", None, None, True)])
+        self.assertEqual(len(blackboard), 0)
+
+    def test_extend_does_not_change_a_list_a_reader_already_has(self):
+        blackboard = Blackboard(papers=[1])
+        papers = blackboard["papers"]
+        blackboard.extend("papers", [2])
+        self.assertEqual(papers, [1])
+
+    def test_update_sets_all_keys_before_anyone_is_notified(self):
+        blackboard = Blackboard()
+        seen = []
+        blackboard.subscribe(None, lambda change: seen.append((blackboard.get("ranked"), blackboard.get("extracted_data"))))
+        blackboard.update(ranked=["r"], extracted_data=["p"])
+        self.assertEqual(seen, [(["r"], ["p"]), (["r"], ["p"])])
+
+    def test_subscribers_can_write_back(self):
+        blackboard = Blackboard()
+        blackboard.subscribe("papers", lambda change: blackboard.extend("extracted_data", change.added))
+        blackboard.extend("papers", ["a"])
+        self.assertEqual(blackboard["extracted_data"], ["a"])
+
+    def test_wait_for_wakes_on_a_write_from_another_thread(self):
+        blackboard = Blackboard()
+        timer = threading.Timer(0.05, blackboard.update, kwargs={"status": "done"})
+        timer.start()
+        self.assertTrue(blackboard.wait_for(lambda board: board.get("status") == "done", timeout=5))
+        self.assertFalse(blackboard.wait_for(lambda board: "missing" in board, timeout=0.01))
+        timer.join()
+
+    def test_concurrent_extends_lose_nothing(self):
+        blackboard = Blackboard()
+        def add(start):
+            for i in range(start, start + 500):
+                blackboard.extend("papers", [i])
+        threads = [threading.Thread(target=add, args=(n * 500,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(blackboard["papers"]), list(range(4000)))
+
+    def test_attached_extraction_agent_extracts_each_batch_once(self):
+        agent = ExtractionAgent()
+        batches = []
+        def extract_metadata(paper):
+            batches.append(paper.url)
+            if "broken" in paper.url:
+                paper.status = PaperStatus.FETCH_ERROR
+            elif "shop" in paper.url:
+                paper.status = PaperStatus.NOT_ACADEMIC
+            else:
+                paper.status = PaperStatus.COMPLETE
+            return paper
+        agent.extract_metadata = extract_metadata
+
+        blackboard = Blackboard(papers=None)
+        agent.attach(blackboard)
+        blackboard.extend("papers", [Paper(url="http://example.com/a"), Paper(url="http://example.com/broken")])
+        blackboard.extend("papers", [Paper(url="http://example.com/shop"), Paper(url="http://example.com/b")])
+
+        self.assertEqual(batches, ["http://example.com/a", "http://example.com/broken", "http://example.com/shop", "http://example.com/b"])
+        self.assertEqual([paper.url for paper in blackboard["extracted_data"]], ["http://example.com/a", "http://example.com/b"])
+
+    def test_extraction_agent_still_runs_on_a_plain_dict(self):
+        agent = ExtractionAgent()
+        agent.extract_metadata = lambda paper: paper.finish()
+        blackboard = {"papers": [{"title": "A paper", "authors": ["A. Author"], "year": "2024", "abstract": "Text.", "url": "http://example.com/a"}]}
+        agent.run(blackboard)
+        self.assertEqual(blackboard["extracted_data"][0].title, "A paper")
+
+if __name__ == '__main__':
+    unittest.main()
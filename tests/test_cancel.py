@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_pipeline import make_agents
+from benchmarks.stub_server import StubServer
+from cancel import CANCELLED, DEADLINE, CancelToken, Cancelled
+from paper import Paper, PaperStatus
+from agents.extraction_agent import ExtractionAgent
+from session import ResearchSession
+
+FAST_LIMITS = {'arxiv': 1000, 'pubmed': 1000, 'ddg': 1000, 'web': 1000, 'gemini': 1000}
+
+class TestCancelToken(unittest.TestCase):
+
+    def test_cancel_runs_callbacks_once(self):
+        token = CancelToken()
+        calls = []
+        token.on_cancel(lambda: calls.append(1))
+        token.cancel()
+        token.cancel(DEADLINE)
+        token.on_cancel(lambda: calls.append(2))
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(token.reason, CANCELLED)
+        with self.assertRaises(Cancelled):
+            token.check()
+
+    def test_deadline_cancels_the_token(self):
+        token = CancelToken(0.05)
+        self.assertFalse(token.cancelled)
+        self.assertLessEqual(token.timeout(15), 0.05)
+        self.assertTrue(token.wait(5))
+        self.assertEqual(token.reason, DEADLINE)
+
+    def test_without_a_deadline_timeouts_are_unchanged(self):
+        token = CancelToken()
+        self.assertIsNone(token.remaining())
+        self.assertEqual(token.timeout(15), 15)
+        self.assertIsNone(token.timeout(None))
+
+    def test_child_follows_its_parent(self):
+        parent = CancelToken(60)
+        child = CancelToken(120, parent=parent)
+        self.assertLessEqual(child.remaining(), 60)
+        parent.cancel()
+        self.assertTrue(child.cancelled)
+        self.assertEqual(child.reason, CANCELLED)
+
+    def test_cancelled_extraction_is_marked_and_not_fetched(self):
+        agent = ExtractionAgent()
+        agent.http = None
+        token = CancelToken()
+        token.cancel()
+        paper = agent.extract_metadata(Paper(url="https://pubmed.ncbi.nlm.nih.gov/1/", source='PubMed'), token)
+        self.assertEqual(paper.status, PaperStatus.CANCELLED)
+        self.assertTrue(paper.failed)
+
+        complete = Paper(title="Done", authors=["A. Author"], abstract="Text.", url="http://example.com/done")
+        self.assertEqual(agent.extract_metadata(complete, token).status, PaperStatus.COMPLETE)
+
+    def test_session_returns_partial_results_at_the_deadline(self):
+        # pubmed answers far too slowly, so only the arxiv papers are ready when the deadline passes
+        with tempfile.TemporaryDirectory() as tmpdir, StubServer(route_latency={'eutils': 3}) as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, os.path.join(tmpdir, 'digest.json'))
+            token = CancelToken(1)
+            start = time.monotonic()
+            with ResearchSession(search_agent, extraction_agent, rate_limits=FAST_LIMITS) as session:
+                papers = session.run(["graph neural networks"], search_web=False, arxiv_limit=5, pubmed_limit=5, token=token)
+                elapsed = time.monotonic() - start
+
+        self.assertLess(elapsed, 2.5)
+        self.assertEqual(token.reason, DEADLINE)
+        self.assertEqual({paper.source for paper in papers}, {'arXiv'})
+
+if __name__ == '__main__':
+    unittest.main()
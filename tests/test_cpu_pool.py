@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import cpu_pool
+from cancel import CancelToken, Cancelled
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures', 'web')
+
+# worker side stand ins for a parse that crashes its process and one that hangs
+def crash(path):
+    os._exit(1)
+
+def hang(path):
+    time.sleep(3)
+
+class TestParsePool(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = cpu_pool.ParsePool(max_workers=1, max_tasks_per_child=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_pdf_text_matches_in_process(self):
+        # this test ensures that parsing in a worker gives the same text as parsing in the calling thread
+        with open(os.path.join(FIXTURES, 'paper_a.pdf'), 'rb') as f:
+            content = f.read()
+        text = self.pool.pdf_text(content)
+        self.assertTrue(text.startswith('Spectral Graph Convolutions Revisited'))
+        self.assertEqual(text, cpu_pool.pdf_text(content))
+
+    def test_workers_are_recycled_and_files_removed(self):
+        page = b"<html><head><meta name='citation_title' content='Paper 1'></head><body></body></html>"
+        for _ in range(5):
+            self.assertEqual(self.pool.html_metadata(page)['title'], 'Paper 1')
+        leftovers = [name for name in os.listdir(cpu_pool.SPILL_DIR or '/tmp') if name.startswith('ara-')]
+        self.assertEqual(leftovers, [])
+
+    def test_a_dead_worker_only_fails_its_own_document(self):
+        pool = cpu_pool.ParsePool(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        with self.assertRaises(BrokenProcessPool):
+            pool.run(crash, b'')
+        page = b"<html><head><meta name='citation_title' content='After the crash'></head></html>"
+        self.assertEqual(pool.html_metadata(page)['title'], 'After the crash')
+
+    def test_waits_end_with_the_token(self):
+        pool = cpu_pool.ParsePool(max_workers=1)
+        self.addCleanup(pool.shutdown, wait=False)
+        for token in (CancelToken(0.2), CancelToken()):
+            threading.Timer(0.2, token.cancel).start()
+            start = time.monotonic()
+            with self.assertRaises(Cancelled):
+                pool.run(hang, b'', token)
+            self.assertLess(time.monotonic() - start, 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
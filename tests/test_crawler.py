@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import tempfile
+import requests
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.extraction_agent import ExtractionAgent
+from benchmarks.stub_server import StubServer
+from crawler import BloomFilter, CitationCrawler, paper_nodes
+from extraction_backends import RulesBackend
+from paper import Paper
+
+# pmid -> (references, cited by)
+GRAPH = {
+    '1': (['2', '3'], ['4']),
+    '2': (['3', '5'], ['1']),
+    '3': ([], ['1', '2']),
+    '4': (['1'], []),
+    '5': (['6'], ['2']),
+    '6': ([], ['5']),
+}
+
+def make_agents(graph=GRAPH):
+    search_agent = MagicMock()
+    search_agent.pubmed_links.side_effect = lambda pmid: {'references': graph[pmid][0], 'cited_by': graph[pmid][1]}
+    search_agent.pubmed_id_for_doi.side_effect = lambda doi: '3' if doi == '10.1/three' else None
+
+    extraction_agent = MagicMock()
+    def extract(paper):
+        pmid = paper.url.strip('/').split('/')[-1]
+        paper.title = f"Paper {pmid}"
+        paper.authors = ['A Author']
+        paper.abstract = 'An abstract.'
+        return paper.finish()
+    extraction_agent.extract_metadata.side_effect = extract
+    return search_agent, extraction_agent
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmpdir.name, 'crawl.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        self.assertTrue(bloom.add('pmid:1'))
+        self.assertFalse(bloom.add('pmid:1'))
+        self.assertIn('pmid:1', bloom)
+        false_positives = sum(f"pmid:{i}" in bloom for i in range(2, 1002))
+        self.assertLess(false_positives, 30)
+
+        restored = BloomFilter.from_dict(bloom.to_dict())
+        self.assertIn('pmid:1', restored)
+        self.assertEqual(restored.count, 1)
+
+    def test_paper_nodes(self):
+        self.assertEqual(paper_nodes(Paper(url='https://pubmed.ncbi.nlm.nih.gov/42/', doi='10.1/ABC')), ['pmid:42', 'doi:10.1/abc'])
+        self.assertEqual(paper_nodes(Paper(url='http://example.com/a.pdf')), ['url:http://example.com/a.pdf'])
+
+    def test_crawl_is_bounded_by_depth_and_visits_each_paper_once(self):
+        search_agent, extraction_agent = make_agents()
+        crawler = CitationCrawler(search_agent, extraction_agent, max_depth=1, budget=100, workers=2)
+        crawler.push('pmid:1', 0)
+        papers = crawler.crawl()
+
+        self.assertEqual(sorted(paper.title for paper in papers), ['Paper 1', 'Paper 2', 'Paper 3', 'Paper 4'])
+        self.assertEqual(extraction_agent.extract_metadata.call_count, 4)
+
+    def test_crawl_stops_at_budget_and_resumes_from_state(self):
+        search_agent, extraction_agent = make_agents()
+        crawler = CitationCrawler(search_agent, extraction_agent, max_depth=5, budget=3, workers=1, state_path=self.state_path)
+        crawler.push('pmid:1', 0)
+        first = crawler.crawl()
+        self.assertEqual(len(first), 3)
+
+        resumed = CitationCrawler(search_agent, extraction_agent, max_depth=5, budget=10, workers=1, state_path=self.state_path)
+        resumed.push('pmid:1', 0)
+        papers = resumed.crawl()
+
+        self.assertEqual(sorted(paper.title for paper in papers), [f"Paper {i}" for i in range(1, 7)])
+        self.assertEqual(extraction_agent.extract_metadata.call_count, 6)
+
+    def test_papers_in_flight_are_requeued_when_state_is_saved(self):
+        search_agent, extraction_agent = make_agents()
+        crawler = CitationCrawler(search_agent, extraction_agent, state_path=self.state_path)
+        crawler.push('pmid:1', 0)
+        depth, node = crawler.pop()
+        crawler.save(in_flight=[(depth, node)])
+
+        resumed = CitationCrawler(search_agent, extraction_agent, state_path=self.state_path)
+        self.assertEqual(resumed.pop(), (0, 'pmid:1'))
+
+    def test_dois_are_resolved_to_pubmed_and_most_cited_papers_go_first(self):
+        search_agent, extraction_agent = make_agents()
+        crawler = CitationCrawler(search_agent, extraction_agent)
+        crawler.push('pmid:5', 1)
+        crawler.push('pmid:2', 1)
+        crawler.push('pmid:2', 1)
+        self.assertEqual(crawler.pop(), (1, 'pmid:2'))
+
+        paper, neighbours = crawler.expand('doi:10.1/three')
+        self.assertEqual(paper.title, 'Paper 3')
+        self.assertEqual(neighbours, ['pmid:1', 'pmid:2'])
+
+    def test_pdf_references_come_from_the_download_used_for_metadata(self):
+        search_agent, _ = make_agents()
+        extraction_agent = ExtractionAgent(backends=[RulesBackend()])
+        extraction_agent.http = MagicMock(wraps=requests)
+        crawler = CitationCrawler(search_agent, extraction_agent)
+        self.assertIs(search_agent.rate_limiters, extraction_agent.rate_limiters)
+        self.assertIn('pubmed', search_agent.rate_limiters)
+
+        with StubServer() as server:
+            paper, neighbours = crawler.expand(f"url:{server.url}/web/paper_a.pdf")
+
+        self.assertEqual(paper.title, 'Spectral Graph Convolutions Revisited')
+        self.assertEqual(len(neighbours), 29)
+        self.assertEqual(neighbours[0], 'doi:10.1001/ref.1')
+        self.assertEqual(extraction_agent.http.get.call_count, 1)
+
+if __name__ == '__main__':
+    unittest.main()
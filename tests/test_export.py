@@ -0,0 +1,111 @@
+import unittest
+import sys
+import os
+import io
+import csv
+import json
+import importlib.util
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import export
+from agents.storage_agent import StorageAgent
+from paper import Paper, PaperStatus
+
+PAPERS = [
+    Paper(title="Graph Networks & {Friends}", authors=["Ada Lovelace", "Alan Turing"], year="2021", source="arXiv",
+          venue="Journal of Graphs", doi="10.1000/graph.1", url="https://example.com/1", abstract="Line one.\nLine two.",
+          status=PaperStatus.COMPLETE),
+    Paper(title="A web page", url="https://example.com/2", source="Web", status=PaperStatus.INCOMPLETE),
+]
+
+class TestExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir.name, name)
+
+    def test_iter_json_array_reads_in_small_chunks(self):
+        records = [paper.to_dict() for paper in PAPERS] * 20
+        text = json.dumps(records, indent=4)
+        for chunk_size in (1, 7, 4096):
+            self.assertEqual(list(export.iter_json_array(io.StringIO(text), chunk_size)), records)
+        self.assertEqual(list(export.iter_json_array(io.StringIO(" [ ] "))), [])
+        with self.assertRaises(ValueError):
+            list(export.iter_json_array(io.StringIO('{"title": "not a list"}')))
+
+    def test_iter_library_reads_jsonl_and_json(self):
+        with open(self.path('library.jsonl'), 'w', encoding='utf-8') as f:
+            f.write("".join(paper.to_json() + "\n" for paper in PAPERS))
+        with open(self.path('digest.json'), 'w', encoding='utf-8') as f:
+            json.dump([paper.to_dict() for paper in PAPERS], f, indent=4)
+
+        self.assertEqual(list(export.iter_library(self.path('library.jsonl'))), PAPERS)
+        self.assertEqual(list(export.iter_library(self.path('digest.json'))), PAPERS)
+
+    def test_bibtex(self):
+        output = io.StringIO()
+        self.assertEqual(export.write_bibtex(iter(PAPERS), output), 2)
+        text = output.getvalue()
+        self.assertIn("@article{lovelace2021graph_", text)
+        self.assertIn("title = {Graph Networks \\& \\{Friends\\}},", text)
+        self.assertIn("author = {Ada Lovelace and Alan Turing},", text)
+        self.assertIn("journal = {Journal of Graphs},", text)
+        self.assertIn("@misc{anonpage_", text)
+        self.assertNotEqual(export.bibtex_key(PAPERS[0]), export.bibtex_key(Paper(title=PAPERS[0].title, authors=PAPERS[0].authors, year="2021", doi="10.1000/other")))
+
+        # backslashes are escaped without touching the backslashes the other escapes add
+        entry = export.bibtex_entry(Paper(title="O(n^2) paths in C:\\graphs ~ 50% faster"))
+        self.assertIn("title = {O(n\\textasciicircum{}2) paths in C:\\textbackslash{}graphs \\textasciitilde{} 50\\% faster},", entry)
+
+    def test_ris(self):
+        output = io.StringIO()
+        export.write_ris(iter(PAPERS), output)
+        entries = output.getvalue().strip().split("ER  - ")
+        self.assertIn("TY  - JOUR", entries[0])
+        self.assertEqual(entries[0].count("AU  - "), 2)
+        self.assertIn("AB  - Line one. Line two.", entries[0])
+        self.assertIn("TY  - GEN", entries[1])
+
+    def test_csv(self):
+        output = io.StringIO()
+        export.write_csv(iter(PAPERS), output)
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['authors'], "Ada Lovelace; Alan Turing")
+        self.assertEqual(rows[0]['abstract'], "Line one.\nLine two.")
+        self.assertEqual(rows[1]['status'], 'incomplete')
+
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_parquet_and_arrow_round_trip(self):
+        import pyarrow.parquet as pq
+        import pyarrow as pa
+
+        papers = PAPERS * 5
+        self.assertEqual(export.export(iter(papers), self.path('out.parquet')), 10)
+        table = pq.read_table(self.path('out.parquet'))
+        self.assertEqual(table.num_rows, 10)
+        self.assertEqual(table.column('authors')[0].as_py(), ["Ada Lovelace", "Alan Turing"])
+
+        export.write_arrow(iter(papers), self.path('out.arrow'), batch_size=3)
+        with pa.OSFile(self.path('out.arrow'), 'rb') as source:
+            reader = pa.ipc.open_file(source)
+            self.assertEqual(reader.num_record_batches, 4)
+            self.assertEqual(reader.read_all().column('title')[1].as_py(), "A web page")
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export.export(iter(PAPERS), self.path('out.xyz'))
+
+    def test_storage_agent_exports_by_extension(self):
+        agent = StorageAgent(self.path('digest.bib'))
+        agent.run({"extracted_data": PAPERS + [PAPERS[0]]})
+        with open(self.path('digest.bib'), encoding='utf-8') as f:
+            self.assertEqual(f.read().count("@"), 2)
+
+if __name__ == '__main__':
+    unittest.main()
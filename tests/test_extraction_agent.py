@@ -3,18 +3,20 @@ from unittest.mock import patch, MagicMock
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from agents.extraction_agent import ExtractionAgent
+from agents.extraction_agent import ExtractionAgent, reference_dois
+from paper import Paper, PaperStatus
 
 class TestExtractionAgent(unittest.TestCase):
 
+    @patch.dict(os.environ, {'GEMINI_API_KEY': 'test-key'})
     @patch('agents.extraction_agent.requests.get')
-    @patch('agents.extraction_agent.genai.GenerativeModel')
+    @patch('google.generativeai.GenerativeModel')
     def test_extract_metadata_from_web(self, mock_genai, mock_requests_get):
         # this test ensures that the extraction agent can correctly parse a mock html response
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {'content-type': 'text/html'}
-        mock_response.content = "<html><head><title>Test Title</title></head><body><p>Test abstract</p></body></html>"
+        mock_response.iter_content.return_value = [b"<html><head><title>Test Title</title></head><body><p>Test abstract</p></body></html>"]
         mock_requests_get.return_value = mock_response
 
         mock_genai_instance = MagicMock()
@@ -32,14 +34,28 @@ class TestExtractionAgent(unittest.TestCase):
         mock_genai_instance.generate_content.return_value = mock_genai_response
 
         agent = ExtractionAgent()
-        paper_info = {'source': 'Web', 'url': 'http://example.com'}
+        paper_info = Paper(source='Web', url='http://example.com')
         extracted_paper = agent.extract_metadata(paper_info)
 
-        self.assertEqual(extracted_paper['title'], 'Test Title')
-        self.assertEqual(extracted_paper['authors'], ['Author 1', 'Author 2'])
-        self.assertEqual(extracted_paper['year'], '2023')
-        self.assertEqual(extracted_paper['abstract'], 'Test abstract')
-        self.assertEqual(extracted_paper['doi'], '10.1234/12345')
+        self.assertEqual(extracted_paper.title, 'Test Title')
+        self.assertEqual(extracted_paper.authors, ['Author 1', 'Author 2'])
+        self.assertEqual(extracted_paper.year, '2023')
+        self.assertEqual(extracted_paper.abstract, 'Test abstract')
+        self.assertEqual(extracted_paper.doi, '10.1234/12345')
+        self.assertEqual(extracted_paper.status, PaperStatus.COMPLETE)
+
+    @patch.dict(os.environ, {}, clear=True)
+    def test_model_is_created_lazily(self):
+        # this test ensures that the agent can be built without an api key, the gemini client is only set up on first use
+        agent = ExtractionAgent()
+        gemini = agent.router.get('gemini')
+        self.assertIsNone(gemini._model)
+        with self.assertRaises(KeyError):
+            gemini.model
+
+    def test_reference_dois_are_read_from_the_references_section(self):
+        text = "Our paper, doi 10.9999/own.1, builds on earlier work. References [1] Smith, doi:10.1000/ABC.2 . [2] Jones (10.1000/abc.2), 10.2000/xyz-3."
+        self.assertEqual(reference_dois(text), ['10.1000/abc.2', '10.2000/xyz-3'])
 
 if __name__ == '__main__':
     unittest.main()
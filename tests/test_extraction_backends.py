@@ -0,0 +1,122 @@
+import unittest
+import sys
+import os
+from unittest.mock import patch
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import cpu_pool
+from benchmarks.stub_server import FIXTURES, StubServer
+from cancel import CancelToken
+from extraction_backends import (BackendError, BackendRouter, Document, ExtractionBackend, GeminiBackend, HTTPBackend,
+                                 RulesBackend, parse_model_answer)
+
+class FakeBackend(ExtractionBackend):
+    def __init__(self, name, cost, result=None, error=None, handles=True):
+        self.name = name
+        self.cost = cost
+        self.result = result
+        self.error = error
+        self.handles = handles
+        self.calls = 0
+
+    def can_handle(self, document):
+        return self.handles
+
+    def extract(self, document, token):
+        self.calls += 1
+        if self.error:
+            raise BackendError(self.error)
+        return self.result
+
+DOCUMENT = Document('http://example.com/paper', 'html', 'Some text')
+
+class TestExtractionBackends(unittest.TestCase):
+
+    def test_rules_backend_reads_a_typeset_pdf(self):
+        with open(os.path.join(FIXTURES, 'web', 'paper_a.pdf'), 'rb') as f:
+            text = cpu_pool.pdf_text(f.read())
+        document = Document('http://example.com/paper_a.pdf', 'pdf', text)
+        backend = RulesBackend()
+        self.assertTrue(backend.can_handle(document))
+        metadata = backend.extract(document, CancelToken())
+        self.assertEqual(metadata['title'], 'Spectral Graph Convolutions Revisited')
+        self.assertEqual(metadata['authors'], ['Alice Garcia', 'Ines Haddad', 'Liam Silva'])
+        self.assertTrue(metadata['abstract'].startswith('Passing transformer molecular'))
+        self.assertTrue(metadata['abstract'].endswith('.'))
+
+    def test_rules_backend_gives_up_on_text_it_cannot_parse(self):
+        backend = RulesBackend()
+        self.assertEqual(backend.split_authors("Jane Doe, John Q. Smith and Ada Lovelace"), ["Jane Doe", "John Q. Smith", "Ada Lovelace"])
+        self.assertEqual(backend.split_authors("University of somewhere"), [])
+        self.assertFalse(backend.can_handle(Document('http://example.com', 'html', 'Title\nAuthor Name\nAbstract\nText.')))
+        with self.assertRaises(BackendError):
+            backend.extract(Document('http://example.com/a.pdf', 'pdf', 'Abstract\nNo title above it.'), CancelToken())
+
+    def test_rules_backend_on_real_first_page_layouts(self):
+        backend = RulesBackend()
+        body = "\nAbstract\nWe study message passing. It works well on molecules.\n1 Introduction\nGraphs are everywhere."
+
+        def extract(front):
+            return backend.extract(Document('http://example.com/paper.pdf', 'pdf', front + body), CancelToken())
+
+        iclr = extract("Published as a conference paper at ICLR 2021\nGraph Attention Revisited\nJane Doe, John Smith")
+        self.assertEqual((iclr['title'], iclr['authors'], iclr['year']), ('Graph Attention Revisited', ['Jane Doe', 'John Smith'], '2021'))
+        self.assertEqual(iclr['abstract'], "We study message passing. It works well on molecules.")
+
+        jmlr = extract("Journal of Machine Learning Research 21 (2020) 1-48 Submitted 4/19; Published 6/20\n"
+                       "Deep Graph Learning\nAlice Garcia and Ines Haddad")
+        self.assertEqual(jmlr['title'], 'Deep Graph Learning')
+
+        arxiv = extract("arXiv:2101.00001v2 [cs.LG] 3 Feb 2021\nMessage Passing for\nMolecular Graphs\nJane Doe Ada Lovelace")
+        self.assertEqual(arxiv['title'], 'Message Passing for Molecular Graphs')
+
+        # layouts where the line above the abstract is not the authors go to the next backend
+        for front in ("A Study Of Things\nUnder Review",
+                      "Deep Graph Learning\nAlice Garcia alice@example.com\nEditor: Jane Roe",
+                      "Graph Attention Revisited\nJane Doe, John Smith\nUniversity of Somewhere",
+                      "Journal of Machine Learning Research 21 (2020) 1-48\nJane Doe, John Smith"):
+            with self.assertRaises(BackendError, msg=front):
+                extract(front)
+
+    def test_router_prefers_the_cheapest_backend_and_falls_back(self):
+        cheap = FakeBackend('cheap', 0.0, error="could not parse")
+        skipped = FakeBackend('skipped', 0.0, handles=False)
+        paid = FakeBackend('paid', 0.01, result={'title': 'From the paid backend'})
+        router = BackendRouter([paid, skipped, cheap])
+
+        backend, metadata = router.extract(DOCUMENT, CancelToken())
+
+        self.assertIs(backend, paid)
+        self.assertEqual(metadata, {'title': 'From the paid backend'})
+        self.assertEqual((cheap.calls, skipped.calls), (1, 0))
+        self.assertEqual(router.stats['cheap']['failures'], 1)
+        self.assertEqual(router.stats['paid']['cost'], 0.01)
+
+    def test_router_fails_when_no_backend_can_handle_the_document(self):
+        with patch.dict(os.environ, {}, clear=True), patch('dotenv.load_dotenv'):
+            router = BackendRouter([RulesBackend(), GeminiBackend()])
+            with self.assertRaises(BackendError):
+                router.extract(DOCUMENT, CancelToken())
+
+    def test_gemini_setup_failures_are_not_retried(self):
+        backend = GeminiBackend()
+        token = CancelToken()
+        with patch.dict(os.environ, {}, clear=True), patch('dotenv.load_dotenv'), patch.object(token, 'wait') as wait:
+            with self.assertRaises(BackendError):
+                backend.extract(DOCUMENT, token)
+        wait.assert_not_called()
+
+    def test_http_backend_talks_to_a_local_server(self):
+        with StubServer() as server:
+            backend = HTTPBackend(f"{server.url}/gemini")
+            metadata = backend.extract(DOCUMENT, CancelToken())
+            self.assertEqual(metadata['authors'], ['Elena Silva', 'Deepak Hassan'])
+            self.assertIsNone(backend.extract(Document('http://example.com/blog', 'html', 'Ten Tips For Training Graph Models'), CancelToken()))
+            with self.assertRaises(BackendError):
+                HTTPBackend(f"{server.url}/missing").extract(DOCUMENT, CancelToken())
+
+    def test_unparseable_answer_is_kept_as_the_abstract(self):
+        self.assertEqual(parse_model_answer("just some prose"), {'abstract': "just some prose"})
+        self.assertIsNone(parse_model_answer("Not an academic paper."))
+
+if __name__ == '__main__':
+    unittest.main()
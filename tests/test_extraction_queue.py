@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from extraction_queue import ExtractionQueue, ExtractionWorker, PENDING, DONE, FAILED
+from paper import Paper, PaperStatus
+
+class TestExtractionQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = ExtractionQueue(os.path.join(self.tmpdir.name, 'queue.db'), retry_schedule=(10, 60), max_attempts=3)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmpdir.cleanup()
+
+    def test_retry_schedule_and_attempt_history(self):
+        # this test ensures that failed jobs are rescheduled and eventually given up on
+        job_id = self.queue.enqueue(Paper(url='http://example.com/a.pdf', source='Web'), query='q')
+
+        job = self.queue.claim()
+        self.queue.fail(job['id'], 'API Error', started_at=0)
+        self.assertIsNone(self.queue.claim())
+        self.assertEqual(self.queue.job(job_id)['status'], PENDING)
+
+        job = self.queue.claim(now=self.queue.job(job_id)['next_attempt_at'])
+        self.queue.fail(job['id'], 'Fetch Error', started_at=0)
+        job = self.queue.claim(now=self.queue.job(job_id)['next_attempt_at'])
+        self.assertEqual(self.queue.fail(job['id'], 'Fetch Error', started_at=0), FAILED)
+
+        attempts = self.queue.attempts(job_id)
+        self.assertEqual([a['attempt'] for a in attempts], [1, 2, 3])
+        self.assertEqual(attempts[0]['error'], 'API Error')
+        self.assertEqual(self.queue.counts(), {FAILED: 1})
+
+    def test_enqueue_is_deduplicated_by_url(self):
+        first = self.queue.enqueue(Paper(url='http://example.com/a.pdf'))
+        second = self.queue.enqueue(Paper(url='http://example.com/a.pdf'))
+        self.assertEqual(first, second)
+        self.assertEqual(self.queue.counts(), {PENDING: 1})
+
+        # a finished job that is queued again starts from the paper found this time
+        job = self.queue.claim()
+        self.queue.fail(job['id'], 'Fetch Error', started_at=0)
+        self.queue.fail(job['id'], 'Fetch Error', started_at=0)
+        self.queue.fail(job['id'], 'Fetch Error', started_at=0)
+        self.queue.enqueue(Paper(url='http://example.com/a.pdf', title='Found again'))
+        job = self.queue.job(first)
+        self.assertEqual((job['status'], job['attempts'], job['paper'].title), (PENDING, 0, 'Found again'))
+
+    def test_worker_completes_job(self):
+        agent = MagicMock()
+        agent.extract_metadata.return_value = Paper(url='http://example.com/a.pdf', title='Paper', abstract='Text', status=PaperStatus.COMPLETE)
+        completed = []
+        worker = ExtractionWorker(self.queue, agent, on_complete=lambda paper, query: completed.append((paper, query)))
+
+        job_id = self.queue.enqueue(Paper(url='http://example.com/a.pdf'), query='q')
+        self.assertTrue(worker.process_next())
+        self.assertFalse(worker.process_next())
+
+        self.assertEqual(completed[0][0].title, 'Paper')
+        self.assertEqual(completed[0][1], 'q')
+        self.assertEqual(self.queue.job(job_id)['status'], DONE)
+
+    def test_worker_drops_papers_that_are_not_usable(self):
+        agent = MagicMock()
+        completed = []
+        worker = ExtractionWorker(self.queue, agent, on_complete=lambda paper, query: completed.append(paper))
+        for result in (Paper(url='http://example.com/a', title='Shop', status=PaperStatus.NOT_ACADEMIC),
+                       Paper(url='http://example.com/b', title='Blog', source='Web', status=PaperStatus.INCOMPLETE)):
+            agent.extract_metadata.return_value = result
+            job_id = self.queue.enqueue(Paper(url=result.url, source='Web'), query='q')
+            self.assertTrue(worker.process_next())
+            self.assertEqual(self.queue.job(job_id)['status'], DONE)
+        self.assertEqual(completed, [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import MagicMock
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from fetch import CHUNK_SIZE, FetchStats, NotAPaper, fetch_document, sniff
+from paper import Paper, PaperStatus
+from agents.extraction_agent import ExtractionAgent
+
+def mock_http(headers, chunks):
+    read = []
+    def iter_content(chunk_size):
+        for chunk in chunks:
+            read.append(chunk)
+            yield chunk
+    response = MagicMock()
+    response.headers = headers
+    response.iter_content.side_effect = iter_content
+    http = MagicMock()
+    http.get.return_value = response
+    return http, response, read
+
+def endless(chunk):
+    while True:
+        yield chunk
+
+class TestFetch(unittest.TestCase):
+
+    def test_sniff(self):
+        self.assertEqual(sniff(b'\n\n%PDF-1.7\n...'), 'pdf')
+        self.assertEqual(sniff(b'PK\x03\x04rest'), 'zip')
+        self.assertEqual(sniff(b'\x00\x00\x00\x18ftypmp42'), 'media')
+        self.assertEqual(sniff(b'<!DOCTYPE html><html>'), 'html')
+        self.assertEqual(sniff(b'\x01\x02\x00\x03'), 'binary')
+
+    def test_declared_video_is_closed_before_reading(self):
+        http, response, read = mock_http({'content-type': 'video/mp4', 'content-length': str(300 * 1024 * 1024)}, endless(b'x' * CHUNK_SIZE))
+        stats = FetchStats()
+        with self.assertRaises(NotAPaper) as raised:
+            fetch_document(http, 'http://example.com/talk.mp4', stats=stats)
+        self.assertEqual(read, [])
+        self.assertEqual(raised.exception.saved_bytes, 300 * 1024 * 1024)
+        self.assertEqual(stats.saved_bytes, 300 * 1024 * 1024)
+        response.close.assert_called_once()
+        self.assertTrue(http.get.call_args.kwargs['stream'])
+
+    def test_pdf_sent_as_octet_stream_is_sniffed(self):
+        http, _, _ = mock_http({'content-type': 'application/octet-stream'}, [b'%PDF-1.4 body', b' more'])
+        document = fetch_document(http, 'http://example.com/download?id=1')
+        self.assertEqual(document.kind, 'pdf')
+        self.assertEqual(document.content, b'%PDF-1.4 body more')
+
+    def test_archive_is_abandoned_after_the_first_chunk(self):
+        http, _, read = mock_http({'content-type': 'application/octet-stream', 'content-length': '1000000'}, endless(b'PK\x03\x04' + b'x' * 1000))
+        stats = FetchStats()
+        with self.assertRaises(NotAPaper):
+            fetch_document(http, 'http://example.com/data.bin', stats=stats)
+        self.assertEqual(len(read), 1)
+        self.assertEqual(stats.saved_bytes, 1000000 - 1004)
+        self.assertEqual(stats.rejected, {'zip content': 1})
+
+    def test_oversized_page_without_a_length_is_cut_off(self):
+        http, _, read = mock_http({'content-type': 'text/html'}, endless(b'<p>' + b'x' * 997))
+        with self.assertRaises(NotAPaper):
+            fetch_document(http, 'http://example.com/huge', limits={'pdf': 10000, 'html': 5000})
+        self.assertEqual(len(read), 6)
+
+    def test_web_result_that_is_not_a_paper_is_not_retried(self):
+        agent = ExtractionAgent()
+        agent.http, _, _ = mock_http({'content-type': 'video/mp4'}, [])
+        paper = agent.extract_metadata(Paper(url='http://example.com/talk.mp4', source='Web'))
+        self.assertEqual(paper.status, PaperStatus.NOT_ACADEMIC)
+        self.assertFalse(paper.failed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -31,9 +31,117 @@ class TestGUI(unittest.TestCase):
 
         self.assertEqual(window.results_list.count(), 2)
 
+    def test_results_are_ranked_and_selection_is_kept(self):
+        window = MainWindow()
+        window.current_query = "protein folding"
+        window.add_paper_item({'title': 'Cooking pasta', 'authors': ['Author 1'], 'url': 'http://example.com/1'})
+        window.add_paper_item({'title': 'Protein folding', 'authors': ['Author 2'], 'url': 'http://example.com/2'})
+        window.results_list.itemWidget(window.results_list.item(0)).checkbox.setChecked(True)
+
+        window.rank_results()
+
+        first = window.results_list.itemWidget(window.results_list.item(0))
+        second = window.results_list.itemWidget(window.results_list.item(1))
+        self.assertEqual(first.paper_data.title, 'Protein folding')
+        self.assertFalse(first.checkbox.isChecked())
+        self.assertTrue(second.checkbox.isChecked())
+
+    def test_stop_cancels_the_running_search(self):
+        from cancel import CANCELLED, CancelToken
+
+        window = MainWindow()
+        window.cancel_token = CancelToken()
+        window.stop_button.setEnabled(True)
+
+        window.stop_search()
+
+        self.assertTrue(window.cancel_token.cancelled)
+        self.assertEqual(window.cancel_token.reason, CANCELLED)
+        self.assertFalse(window.stop_button.isEnabled())
+
+    def test_a_superseded_search_does_not_touch_the_next_one(self):
+        import threading
+        import time
+        from PyQt6.QtCore import QCoreApplication
+        from paper import Paper
+
+        release = threading.Event()
+
+        class FakeSession:
+            extraction_agent = None
+
+            def run(self, queries, on_paper, on_source_done, token, **kwargs):
+                if queries == ['first']:
+                    # the first search only reports once the second one has replaced it
+                    token.wait(5)
+                    on_paper(Paper(title='Late paper', url='http://example.com/late'), 'first', 'web')
+                else:
+                    on_paper(Paper(title='Second paper', url='http://example.com/second'), 'second', 'web')
+                    release.wait(5)
+                on_source_done('web')
+
+        def process_events_until(condition):
+            deadline = time.monotonic() + 5
+            while not condition() and time.monotonic() < deadline:
+                QCoreApplication.processEvents()
+                time.sleep(0.01)
+
+        window = MainWindow()
+        window.session = FakeSession()
+        with patch.object(window, 'start_queue_worker'):
+            window.query_input.setText('first')
+            window.start_search()
+            window.query_input.setText('second')
+            window.start_search()
+        try:
+            process_events_until(lambda: len(window.searches) == 1)
+            self.assertEqual(len(window.searches), 1)
+            titles = [window.results_list.itemWidget(window.results_list.item(i)).paper_data.title for i in range(window.results_list.count())]
+            self.assertEqual(titles, ['Second paper'])
+            self.assertFalse(window.search_button.isEnabled())
+            self.assertTrue(window.stop_button.isEnabled())
+        finally:
+            release.set()
+        process_events_until(lambda: not window.searches)
+        self.assertTrue(window.search_button.isEnabled())
+        self.assertFalse(window.stop_button.isEnabled())
+
     @classmethod
     def tearDownClass(cls):
         cls.app.quit()
 
+    def test_a_saved_library_can_be_reloaded(self):
+        import tempfile
+        from library import write_library
+
+        window = MainWindow()
+        window.add_paper_item({'title': 'From the last search', 'authors': ['Author 1']})
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'library.lib')
+            write_library([{'title': 'Paper 1', 'authors': ['Author 1']}, {'title': 'Paper 2', 'authors': ['Author 2']}], path)
+            window.load_library(path)
+
+        titles = [window.results_list.itemWidget(window.results_list.item(i)).paper_data.title for i in range(window.results_list.count())]
+        self.assertEqual(titles, ['Paper 1', 'Paper 2'])
+        self.assertIsNone(window.library_papers)
+
+    def test_a_large_library_is_listed_a_page_at_a_time(self):
+        import tempfile
+        from gui import LIBRARY_PAGE
+        from library import write_library
+
+        window = MainWindow()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'library.lib')
+            write_library(({'title': f'Paper {i}', 'url': f'http://example.com/{i}'} for i in range(2 * LIBRARY_PAGE + 10)), path)
+            window.load_library(path)
+            self.assertEqual(window.results_list.count(), LIBRARY_PAGE)
+
+            scroll_bar = window.results_list.verticalScrollBar()
+            window.load_more_library(scroll_bar.maximum())
+            window.load_more_library(scroll_bar.maximum())
+            self.assertEqual(window.results_list.count(), 2 * LIBRARY_PAGE + 10)
+            self.assertIsNone(window.library_papers)
+
 if __name__ == '__main__':
     unittest.main()
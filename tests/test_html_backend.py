@@ -0,0 +1,47 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import html_backend
+
+PAGE = b"""<html><head>
+<meta name="citation_title" content="Paper 1">
+<meta name="Citation_Author" content="Author 1">
+<meta name="citation_author" content="Author 2">
+<meta name="citation_publication_date" content="2021/03/04">
+<meta name="description" content="Short description">
+<script>var x = "not text";</script>
+</head><body>
+<a class="author" href="#">Body Author</a>
+<div class="abstract-content"> Full abstract text. </div>
+</body></html>"""
+
+class TestHtmlBackend(unittest.TestCase):
+
+    def test_backends_agree(self):
+        # this test ensures that every installed parser extracts the same fields
+        for backend in html_backend.available_backends():
+            with self.subTest(backend=backend):
+                metadata = html_backend.extract_metadata(PAGE, backend)
+                self.assertEqual(metadata['title'], 'Paper 1')
+                self.assertEqual(metadata['authors'], ['Author 1', 'Author 2'])
+                self.assertEqual(metadata['abstract'], 'Full abstract text.')
+                self.assertEqual(metadata['year'], '2021')
+                text = html_backend.extract_text(PAGE, backend)
+                self.assertIn('Full abstract text.', text)
+                self.assertNotIn('not text', text)
+
+    def test_body_fallbacks(self):
+        page = b"<html><head><meta name='description' content='Short description'></head><body><a class='authors'>Body Author</a></body></html>"
+        for backend in html_backend.available_backends():
+            with self.subTest(backend=backend):
+                metadata = html_backend.extract_metadata(page, backend)
+                self.assertEqual(metadata['authors'], ['Body Author'])
+                self.assertEqual(metadata['abstract'], 'Short description')
+
+    def test_head_only_stops_at_head(self):
+        self.assertTrue(html_backend.head_only(PAGE).endswith(b'</head>'))
+        self.assertEqual(html_backend.head_only(b'<p>no head</p>'), b'<p>no head</p>')
+
+if __name__ == '__main__':
+    unittest.main()
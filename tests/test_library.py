@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import export
+from agents.storage_agent import StorageAgent
+from library import Library, LibraryError, write_library
+from paper import Paper, PaperStatus
+
+PAPERS = [
+    Paper(title="Graph Networks", authors=["Ada Lovelace", "Alan Turing"], year="2021", source="arXiv", venue="Journal of Graphs",
+          doi="10.1000/graph.1", url="https://example.com/1", abstract="Über graphs.", status=PaperStatus.COMPLETE),
+    Paper(title="A web page", url="https://example.com/2", source="Web", status=PaperStatus.INCOMPLETE),
+    Paper(title="Same author again", authors=["Ada Lovelace"], source="arXiv", doi="10.1000/graph.3", status=PaperStatus.API_ERROR),
+]
+
+class TestLibrary(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'library.lib')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip_and_lookup(self):
+        self.assertEqual(write_library(iter(PAPERS), self.path), 3)
+        with Library(self.path) as library:
+            self.assertEqual(len(library), 3)
+            self.assertEqual(list(library), PAPERS)
+            self.assertEqual(library[-1], PAPERS[2])
+            self.assertEqual(library.get("10.1000/graph.3"), PAPERS[2])
+            self.assertEqual(library.get("https://example.com/2"), PAPERS[1])
+            self.assertEqual(library.find("https://example.com/1"), 0)
+            self.assertIsNone(library.get("10.1000/missing"))
+            self.assertNotIn("10.1000/graph", library)
+            with self.assertRaises(IndexError):
+                library[3]
+
+    def test_readers_keep_their_copy_when_the_library_is_replaced(self):
+        write_library(PAPERS[:1], self.path)
+        with Library(self.path) as old:
+            write_library(PAPERS, self.path)
+            with Library(self.path) as new:
+                self.assertEqual((len(old), len(new)), (1, 3))
+                self.assertEqual(old[0], PAPERS[0])
+
+    def test_other_files_are_rejected(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('[{"title": "a json digest with the wrong extension"}]')
+        with self.assertRaises(LibraryError):
+            Library(self.path)
+
+    def test_truncated_and_damaged_files_are_rejected(self):
+        write_library(PAPERS, self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        with open(self.path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(LibraryError):
+            Library(self.path)
+
+        # the sections still fit, but the strings the last record points at have been cut off
+        with open(self.path, 'wb') as f:
+            f.write(data[:-5])
+        with Library(self.path) as library:
+            self.assertEqual(library[0], PAPERS[0])
+            with self.assertRaises(LibraryError):
+                list(library)
+
+    def test_storage_agent_adds_new_papers_to_a_library(self):
+        StorageAgent(self.path).run({"extracted_data": PAPERS[:2]})
+        StorageAgent(self.path).run({"extracted_data": [PAPERS[1], PAPERS[2]]})
+        self.assertEqual(list(export.iter_library(self.path)), PAPERS)
+
+if __name__ == '__main__':
+    unittest.main()
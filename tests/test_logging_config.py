@@ -0,0 +1,84 @@
+import unittest
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from logging_config import SAMPLED, ContextFilter, JsonFormatter, SamplingFilter, log_context
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def make_logger(name, *filters):
+    test_logger = logging.getLogger(name)
+    test_logger.propagate = False
+    test_logger.setLevel(logging.INFO)
+    test_logger.handlers = []
+    handler = ListHandler()
+    test_logger.addHandler(handler)
+    for log_filter in filters:
+        test_logger.addFilter(log_filter)
+    return test_logger, handler.records
+
+class TestLoggingConfig(unittest.TestCase):
+
+    def test_sampled_messages_are_thinned_per_template(self):
+        test_logger, records = make_logger('test_sampling', SamplingFilter(every=5))
+        for i in range(12):
+            test_logger.info("Fetching URL: %s", i, extra=SAMPLED)
+        test_logger.info("Search finished.")
+
+        self.assertEqual([record.getMessage() for record in records],
+                         ["Fetching URL: 0", "Fetching URL: 5", "Fetching URL: 10", "Search finished."])
+        self.assertEqual(records[1].suppressed, 4)
+
+    def test_json_records_carry_the_context(self):
+        test_logger, records = make_logger('test_context', ContextFilter())
+        with log_context(query="graph neural networks"):
+            with log_context(paper_id="10.1000/abc"):
+                test_logger.warning("Could not fetch %s", "http://example.com")
+            test_logger.info("Query done.")
+        test_logger.info("Outside.")
+
+        entries = [json.loads(JsonFormatter().format(record)) for record in records]
+        self.assertEqual(entries[0]['message'], "Could not fetch http://example.com")
+        self.assertEqual((entries[0]['query'], entries[0]['paper_id'], entries[0]['level']), ("graph neural networks", "10.1000/abc", "WARNING"))
+        self.assertNotIn('paper_id', entries[1])
+        self.assertNotIn('query', entries[2])
+
+    def test_messages_below_the_level_are_never_formatted(self):
+        class Expensive:
+            def __str__(self):
+                raise AssertionError("formatted a message that was not logged")
+
+        test_logger, records = make_logger('test_lazy')
+        test_logger.debug("Gemini API response: %s", Expensive())
+        self.assertEqual(records, [])
+
+    def test_only_the_entry_points_attach_handlers(self):
+        # a parse worker imports these modules without configuring logging, so it never opens app.log
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'app.log')
+            script = (
+                "import cpu_pool, logging_config\n"
+                "print(len(logging_config.logger.handlers))\n"
+                f"logging_config.configure_logging({path!r})\n"
+                f"logging_config.configure_logging({path!r})\n"
+                "print(len(logging_config.logger.handlers))\n"
+                "logging_config.logger.info('configured')\n"
+            )
+            result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True)
+            self.assertEqual(result.stdout.split(), ["0", "1"])
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(json.loads(f.readline())['message'], 'configured')
+
+if __name__ == '__main__':
+    unittest.main()
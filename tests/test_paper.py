@@ -0,0 +1,36 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from paper import Paper, PaperStatus
+
+class TestPaper(unittest.TestCase):
+
+    def test_json_round_trip(self):
+        paper = Paper(title='Paper 1', authors=['Author 1'], year='2023', doi='10.1/x', abstract='Text').finish()
+        restored = Paper.from_json(paper.to_json())
+        self.assertEqual(restored, paper)
+        self.assertEqual(restored.status, PaperStatus.COMPLETE)
+
+    def test_legacy_sentinels_are_converted(self):
+        # this test ensures that dicts written before the status enum are still read correctly
+        paper = Paper.from_dict({'title': 'N/A', 'authors': ['N/A'], 'abstract': 'Fetch/Parse Error', 'year': 2021})
+        self.assertIsNone(paper.title)
+        self.assertEqual(paper.authors, [])
+        self.assertIsNone(paper.abstract)
+        self.assertEqual(paper.year, '2021')
+        self.assertEqual(paper.status, PaperStatus.PARSE_ERROR)
+        self.assertTrue(paper.failed)
+
+        paper = Paper.from_dict({'title': 'Extraction Failed', 'authors': [], 'url': 'http://example.com/1'})
+        self.assertIsNone(paper.title)
+        self.assertEqual(paper.status, PaperStatus.API_ERROR)
+        self.assertTrue(paper.failed)
+
+    def test_slots(self):
+        paper = Paper()
+        with self.assertRaises(AttributeError):
+            paper.unknown = 1
+
+if __name__ == '__main__':
+    unittest.main()
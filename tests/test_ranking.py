@@ -0,0 +1,91 @@
+import unittest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from paper import Paper
+from ranking import PaperRanker, normalise, tokenise
+from agents.ranking_agent import RankingAgent
+
+def make_paper(title, abstract, url):
+    return Paper(title=title, abstract=abstract, url=url)
+
+PAPERS = [
+    make_paper("Cooking pasta at home", "A guide to sauces, boiling water and fresh basil.", "http://example.com/pasta"),
+    make_paper("Graph neural networks for protein folding", "We predict protein structure with graph neural networks.", "http://example.com/gnn"),
+    make_paper("Protein folding with graph neural networks", "Graph neural networks predict protein structure.", "http://example.com/gnn-2"),
+    make_paper("Transformers for protein design", "Language models generate new protein sequences.", "http://example.com/design"),
+]
+
+class TestRanking(unittest.TestCase):
+
+    def test_tokenise_drops_punctuation_and_case(self):
+        self.assertEqual(tokenise("Graph-Neural, Networks!"), ["graph", "neural", "networks"])
+        self.assertEqual(tokenise(None), [])
+
+    def test_relevant_papers_are_ranked_first(self):
+        ranked = PaperRanker().rank("graph neural networks protein", PAPERS)
+        self.assertEqual(len(ranked), len(PAPERS))
+        self.assertIn(ranked[0].paper.url, ("http://example.com/gnn", "http://example.com/gnn-2"))
+        self.assertEqual(ranked[-1].paper.url, "http://example.com/pasta")
+        scores = [result.score for result in ranked]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_near_duplicates_are_grouped_under_the_better_ranked_paper(self):
+        ranked = PaperRanker(group_threshold=0.6).rank("graph neural networks protein", PAPERS)
+        self.assertIsNone(ranked[0].similar_to)
+        self.assertEqual(ranked[1].similar_to, 0)
+        self.assertIsNone(ranked[-1].similar_to)
+
+    def test_vectors_are_cached_until_the_paper_changes(self):
+        ranker = PaperRanker()
+        ranker.rank("protein", PAPERS)
+        self.assertEqual(len(ranker.cache), len(PAPERS))
+
+        ranker.rank("protein", PAPERS)
+        self.assertEqual(len(ranker.cache), len(PAPERS))
+
+        changed = make_paper(PAPERS[0].title, "Now with an abstract about proteins.", PAPERS[0].url)
+        ranker.rank("protein", [changed] + PAPERS[1:])
+        self.assertEqual(len(ranker.cache), len(PAPERS) + 1)
+
+    def test_tokens_hash_the_same_wherever_they_are(self):
+        ranker = PaperRanker()
+        slots = ranker.slot_array(normalise("The graph, GRAPH!\tgraphs\u00a0the"))
+        self.assertEqual(slots[0], -1)
+        self.assertEqual(slots[1], slots[2])
+        self.assertNotEqual(slots[2], slots[3])
+        self.assertEqual((len(slots), slots[4]), (5, -1))
+        self.assertEqual(len(ranker.slot_array("")), 0)
+
+    def test_cache_keeps_the_most_recently_ranked_papers(self):
+        ranker = PaperRanker(max_papers=3)
+        ranker.rank("protein", PAPERS)
+        self.assertEqual(len(ranker.cache), 3)
+        ranker.rank("protein", PAPERS[:1])
+        self.assertEqual([key[0] for key in ranker.cache], [paper.identifier for paper in PAPERS[2:] + PAPERS[:1]])
+
+    def test_papers_without_text_and_empty_input(self):
+        ranker = PaperRanker()
+        self.assertEqual(ranker.rank("protein", []), [])
+        ranked = ranker.rank("protein", [Paper(url="http://example.com/empty"), PAPERS[3]])
+        self.assertEqual(ranked[0].paper.url, "http://example.com/design")
+        self.assertEqual(ranked[1].score, 0.0)
+
+    def test_ranking_agent_reorders_extracted_data(self):
+        blackboard = {"query": "graph neural networks", "extracted_data": list(PAPERS)}
+        agent = RankingAgent()
+        agent.run(blackboard)
+        self.assertEqual(len(blackboard["ranked"]), len(PAPERS))
+        self.assertEqual(blackboard["extracted_data"][0].url, "http://example.com/gnn")
+
+        # nothing new was extracted, so the agent does not rank again
+        agent.formulate_intentions(blackboard)
+        self.assertEqual(agent.intentions, [])
+
+        # the same agent ranks another query's papers even when there are as many of them
+        other = {"query": "protein design", "extracted_data": list(reversed(PAPERS))}
+        agent.run(other)
+        self.assertEqual(other["extracted_data"][0].url, "http://example.com/design")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -25,5 +25,16 @@ class TestSearchAgent(unittest.TestCase):
         agent.formulate_intentions(blackboard)
         self.assertEqual(len(agent.intentions), 0)
 
+    @patch('agents.search_agent.requests.get')
+    def test_pubmed_links(self, mock_get):
+        mock_get.return_value.content = b"""<eLinkResult><LinkSet>
+            <LinkSetDb><LinkName>pubmed_pubmed</LinkName><Link><Id>9</Id></Link></LinkSetDb>
+            <LinkSetDb><LinkName>pubmed_pubmed_refs</LinkName><Link><Id>2</Id></Link><Link><Id>3</Id></Link></LinkSetDb>
+            <LinkSetDb><LinkName>pubmed_pubmed_citedin</LinkName><Link><Id>4</Id></Link></LinkSetDb>
+        </LinkSet></eLinkResult>"""
+        links = SearchAgent().pubmed_links('1')
+        self.assertEqual(links, {'references': ['2', '3'], 'cited_by': ['4']})
+        self.assertIn('elink.fcgi?dbfrom=pubmed&db=pubmed&cmd=neighbor&id=1', mock_get.call_args[0][0])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_pipeline import make_agents
+from benchmarks.stub_server import StubServer
+from pipeline import StageTimings
+from session import RateLimiter, ResearchSession
+
+# the stub server needs no rate limiting, so the limits are raised to keep the test fast
+FAST_LIMITS = {'arxiv': 1000, 'pubmed': 1000, 'ddg': 1000, 'web': 1000, 'gemini': 1000}
+
+class TestSession(unittest.TestCase):
+
+    def test_rate_limiter_spaces_requests(self):
+        limiter = RateLimiter(rate=20)
+        start = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.14)
+
+    def test_rate_limiter_burst(self):
+        limiter = RateLimiter(rate=1, burst=3)
+        time.sleep(0.01)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_related_queries_are_deduplicated_before_extraction(self):
+        # both queries return the same recorded results, so every paper is extracted once
+        with tempfile.TemporaryDirectory() as tmpdir, StubServer() as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, os.path.join(tmpdir, 'digest.json'))
+            timings = StageTimings()
+            done = []
+            found = []
+            with ResearchSession(search_agent, extraction_agent, rate_limits=FAST_LIMITS) as session:
+                self.assertIs(search_agent.http, extraction_agent.http)
+                papers = session.run(
+                    ["graph neural networks", "message passing networks"], search_web=False, arxiv_limit=5, pubmed_limit=5,
+                    on_paper=lambda paper, query, source: found.append(source), on_source_done=done.append, timings=timings
+                )
+
+        self.assertEqual(len(papers), 10)
+        self.assertEqual(len({paper.identifier for paper in papers}), 10)
+        self.assertEqual(len(timings.samples['extraction']), 10)
+        self.assertEqual(len(timings.samples['search.pubmed']), 2)
+        self.assertEqual(sorted(done), ['arxiv', 'pubmed'])
+        self.assertEqual(found.count('pubmed'), 5)
+
+    def test_every_source_is_reported_done_after_a_cancel(self):
+        from cancel import CancelToken
+
+        with tempfile.TemporaryDirectory() as tmpdir, StubServer(latency=0.3) as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, os.path.join(tmpdir, 'digest.json'))
+            done = []
+            with ResearchSession(search_agent, extraction_agent, rate_limits=FAST_LIMITS) as session:
+                session.run(["graph neural networks"], search_web=False, arxiv_limit=5, pubmed_limit=5,
+                            on_source_done=done.append, token=CancelToken(0.5))
+                time.sleep(0.5)
+
+        self.assertEqual(sorted(done), ['arxiv', 'pubmed'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -34,5 +34,13 @@ class TestStorageAgent(unittest.TestCase):
         self.assertEqual(written_data[2]['title'], 'Paper 3')
         self.assertEqual(written_data[3]['title'], 'Paper 4')
 
+    def test_parquet_without_pyarrow_is_reported_not_raised(self):
+        agent = StorageAgent('research_digest.parquet')
+        blackboard = {"extracted_data": [{'doi': '1', 'title': 'Paper 1'}]}
+        with patch.dict(sys.modules, {'pyarrow': None}), patch('builtins.print'):
+            agent.run(blackboard)
+        self.assertEqual(blackboard["status"], "error")
+        self.assertNotIn("storage_complete", blackboard)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import sys
+import os
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from agents.search_agent import ddg_timelimit
+from benchmarks.bench_pipeline import make_agents
+from benchmarks.stub_server import StubServer
+from watch import WatchStore, refresh_all
+
+# the stub server needs no rate limiting, so the limits are raised to keep the test fast
+FAST_LIMITS = {'arxiv': 1000, 'pubmed': 1000, 'ddg': 1000, 'web': 1000, 'gemini': 1000}
+
+class TestWatch(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = WatchStore(os.path.join(self.tmpdir.name, 'watch.db'))
+        self.library = os.path.join(self.tmpdir.name, 'library.jsonl')
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def library_lines(self):
+        with open(self.library, encoding='utf-8') as f:
+            return f.readlines()
+
+    def test_add_is_idempotent_and_remove(self):
+        first = self.store.add("graph neural networks", arxiv_limit=5)
+        second = self.store.add("graph neural networks", arxiv_limit=10)
+        self.assertEqual(first, second)
+        self.assertEqual(self.store.get("graph neural networks")['arxiv_limit'], 10)
+        self.assertTrue(self.store.remove("graph neural networks"))
+        self.assertEqual(self.store.queries(), [])
+
+    def test_second_run_only_appends_new_papers(self):
+        # this test runs a watch query twice against the recorded fixtures, the second run has nothing new to add
+        self.store.add("graph neural networks", search_web=False, arxiv_limit=5, pubmed_limit=5)
+        with StubServer() as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, self.library)
+            counts = refresh_all(self.store, self.library, search_agent=search_agent, extraction_agent=extraction_agent, rate_limits=FAST_LIMITS)
+            self.assertEqual(counts, {"graph neural networks": 10})
+            self.assertEqual(len(self.library_lines()), 10)
+
+            watch = self.store.get("graph neural networks")
+            self.assertIn('arxiv', watch['high_water_marks'])
+            self.assertIn('pubmed', watch['high_water_marks'])
+            self.assertEqual(len(self.store.seen_urls(watch['id'])), 10)
+
+            counts = refresh_all(self.store, self.library, search_agent=search_agent, extraction_agent=extraction_agent, rate_limits=FAST_LIMITS)
+            self.assertEqual(counts, {"graph neural networks": 0})
+            self.assertEqual(len(self.library_lines()), 10)
+
+    def test_failed_pubmed_papers_keep_the_old_mark(self):
+        from paper import PaperStatus
+
+        self.store.add("graph neural networks", search_arxiv=False, search_web=False, pubmed_limit=5)
+        with StubServer() as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, self.library)
+            extract_metadata = extraction_agent.extract_metadata
+            failed = []
+
+            # the first paper fails as if the site had timed out
+            def fail_one(paper, token=None, stats=None):
+                paper = extract_metadata(paper, token, stats)
+                if not failed:
+                    failed.append(paper)
+                    paper.status = PaperStatus.FETCH_ERROR
+                return paper
+            extraction_agent.extract_metadata = fail_one
+            counts = refresh_all(self.store, self.library, search_agent=search_agent, extraction_agent=extraction_agent, rate_limits=FAST_LIMITS)
+            watch = self.store.get("graph neural networks")
+            self.assertEqual(counts, {"graph neural networks": 4})
+            self.assertNotIn('pubmed', watch['high_water_marks'])
+            self.assertEqual(len(self.store.seen_urls(watch['id'])), 4)
+
+            extraction_agent.extract_metadata = extract_metadata
+            counts = refresh_all(self.store, self.library, search_agent=search_agent, extraction_agent=extraction_agent, rate_limits=FAST_LIMITS)
+            self.assertEqual(counts, {"graph neural networks": 1})
+            self.assertIn('pubmed', self.store.get("graph neural networks")['high_water_marks'])
+
+    def test_refreshes_share_one_set_of_rate_limiters(self):
+        self.store.add("graph neural networks", search_arxiv=False, search_web=False, pubmed_limit=2)
+        self.store.add("message passing", search_arxiv=False, search_web=False, pubmed_limit=2)
+        with StubServer() as server:
+            search_agent, extraction_agent, _ = make_agents(server.url, self.library)
+            refresh_all(self.store, self.library, search_agent=search_agent, extraction_agent=extraction_agent, rate_limits={'pubmed': 20})
+        self.assertIs(search_agent.rate_limiters, extraction_agent.rate_limiters)
+        self.assertEqual(search_agent.rate_limiters['pubmed'].interval, 1 / 20)
+
+    def test_ddg_timelimit(self):
+        self.assertEqual(ddg_timelimit(3600), 'd')
+        self.assertEqual(ddg_timelimit(3 * 24 * 3600), 'w')
+        self.assertIsNone(ddg_timelimit(400 * 24 * 3600))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.bench_pipeline import make_agents
+from benchmarks.stub_server import StubServer
+from extraction_backends import BackendRouter, Document, RulesBackend, metered
+from cancel import CancelToken
+from paper import Paper, PaperStatus
+from pipeline import run_pipeline
+from yield_tracker import YieldTracker
+
+class TestYieldTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'source_yield.json')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_poor_sources_get_smaller_limits_in_later_runs(self):
+        tracker = YieldTracker(self.path)
+        self.assertEqual(tracker.limit('web', 20), 20)
+        for i in range(20):
+            tracker.record('web', usable=i < 2, cost=0.0006)
+            tracker.record('arxiv', usable=True)
+        tracker.save()
+
+        tracker = YieldTracker(self.path)
+        self.assertEqual(tracker.limit('arxiv', 20), 20)
+        self.assertEqual(tracker.limit('web', 20), 6)
+        self.assertEqual(tracker.limit('web', 3), 3)
+        self.assertEqual(YieldTracker(self.path, adaptive=False).limit('web', 20), 20)
+
+        # earlier runs count for less, so a better run moves the limit back up
+        for _ in range(20):
+            tracker.record('web', usable=True)
+        tracker.save()
+        self.assertAlmostEqual(tracker.history['web']['candidates'], 36)
+        self.assertEqual(YieldTracker(self.path).limit('web', 20), 20)
+
+    def test_a_run_stops_once_recent_candidates_are_not_usable(self):
+        tracker = YieldTracker(None, window=3)
+        source_run = tracker.start('web')
+        outcomes = [True, False, False, False, True]
+        handled = []
+        for usable in outcomes:
+            if not source_run.skip():
+                handled.append(usable)
+                source_run.record(usable, cost=0.001)
+
+        self.assertEqual(handled, [True, False, False, False])
+        report = tracker.report()['web']
+        self.assertEqual((report['candidates'], report['usable'], report['skipped']), (4, 1, 1))
+        self.assertAlmostEqual(report['cost_per_usable'], 0.004)
+
+    def test_duplicates_and_fetch_errors_do_not_count_against_a_source(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'sources': {'pubmed': {'candidates': 10, 'usable': 9, 'skipped': 0, 'cost': 0.0}}}, f)
+        tracker = YieldTracker(self.path, window=3)
+        source_run = tracker.start('pubmed')
+        for _ in range(5):
+            source_run.record_paper(Paper(status=PaperStatus.FETCH_ERROR), usable=False, cost=0.001)
+        source_run.record_paper(Paper(status=PaperStatus.COMPLETE), usable=True, duplicate=True)
+        self.assertFalse(source_run.exhausted)
+
+        report = tracker.report()['pubmed']
+        self.assertEqual((report['candidates'], report['duplicates'], report['errors']), (0, 1, 5))
+        self.assertAlmostEqual(report['cost'], 0.005)
+        # a history saved before the new counters existed is carried over
+        tracker.save()
+        self.assertEqual(YieldTracker(self.path).history['pubmed']['errors'], 5)
+
+    def test_meter_counts_only_its_own_thread(self):
+        router = BackendRouter([RulesBackend()])
+        router.backends[0].cost = 0.5
+        document = Document('http://example.com/a.pdf', 'pdf', "A Title\nJane Doe, John Smith\nAbstract\nIt works. Really.")
+        with metered() as meter:
+            router.extract(document, CancelToken())
+        router.extract(document, CancelToken())
+        self.assertEqual((meter.calls, meter.cost), (1, 0.5))
+
+    def test_pipeline_stops_extracting_web_results_that_are_not_papers(self):
+        tracker = YieldTracker(self.path)
+        with StubServer() as server:
+            search_agent, extraction_agent, storage_agent = make_agents(server.url, os.path.join(self.tmpdir.name, 'digest.json'))
+
+            def not_a_paper(paper, token=None, stats=None):
+                paper.status = PaperStatus.NOT_ACADEMIC
+                return paper
+            extraction_agent.extract_metadata = not_a_paper
+            run_pipeline("graph neural networks", search_arxiv=False, search_pubmed=False, ddg_limit=20,
+                         search_agent=search_agent, extraction_agent=extraction_agent, storage_agent=storage_agent, yield_tracker=tracker)
+
+        report = tracker.report()['web']
+        self.assertEqual((report['candidates'], report['usable'], report['skipped']), (5, 0, 15))
+        self.assertEqual(YieldTracker(self.path).history['web']['candidates'], 5)
+
+    def test_pipeline_keeps_extracting_through_fetch_errors(self):
+        tracker = YieldTracker(None)
+        with StubServer() as server:
+            search_agent, extraction_agent, storage_agent = make_agents(server.url, os.path.join(self.tmpdir.name, 'digest.json'))
+
+            def unreachable(paper, token=None, stats=None):
+                paper.status = PaperStatus.FETCH_ERROR
+                return paper
+            extraction_agent.extract_metadata = unreachable
+            run_pipeline("graph neural networks", search_arxiv=False, search_pubmed=False, ddg_limit=20,
+                         search_agent=search_agent, extraction_agent=extraction_agent, storage_agent=storage_agent, yield_tracker=tracker)
+
+        report = tracker.report()['web']
+        self.assertEqual((report['candidates'], report['errors'], report['skipped']), (0, 20, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logging_config import configure_logging, logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    query TEXT NOT NULL UNIQUE,
+    search_arxiv INTEGER NOT NULL DEFAULT 1,
+    search_pubmed INTEGER NOT NULL DEFAULT 1,
+    search_web INTEGER NOT NULL DEFAULT 1,
+    arxiv_limit INTEGER NOT NULL DEFAULT 20,
+    pubmed_limit INTEGER NOT NULL DEFAULT 20,
+    ddg_limit INTEGER NOT NULL DEFAULT 20,
+    high_water_marks TEXT NOT NULL DEFAULT '{}',
+    last_run_at REAL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen_urls (
+    query_id INTEGER NOT NULL REFERENCES queries (id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    PRIMARY KEY (query_id, url)
+) WITHOUT ROWID;
+"""
+
+# standing queries and how far each of them has already been read, so a nightly run only fetches what is new:
+# the newest arxiv submission, the last pubmed search date and the urls already handled for every source
+class WatchStore:
+    def __init__(self, path='watch_queries.db'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def add(self, query, search_arxiv=True, search_pubmed=True, search_web=True, arxiv_limit=20, pubmed_limit=20, ddg_limit=20):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO queries (query, search_arxiv, search_pubmed, search_web, arxiv_limit, pubmed_limit, ddg_limit, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (query) DO UPDATE SET "
+                "search_arxiv = excluded.search_arxiv, search_pubmed = excluded.search_pubmed, search_web = excluded.search_web, "
+                "arxiv_limit = excluded.arxiv_limit, pubmed_limit = excluded.pubmed_limit, ddg_limit = excluded.ddg_limit",
+                (query, search_arxiv, search_pubmed, search_web, arxiv_limit, pubmed_limit, ddg_limit, time.time())
+            )
+            row = self.conn.execute("SELECT id FROM queries WHERE query = ?", (query,)).fetchone()
+        return row['id']
+
+    def remove(self, query):
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM queries WHERE query = ?", (query,))
+        return cursor.rowcount > 0
+
+    def queries(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM queries ORDER BY id").fetchall()
+        return [self._row(row) for row in rows]
+
+    def get(self, query):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM queries WHERE query = ?", (query,)).fetchone()
+        return self._row(row) if row is not None else None
+
+    def _row(self, row):
+        watch = dict(row)
+        watch['high_water_marks'] = json.loads(watch['high_water_marks'])
+        return watch
+
+    def seen_urls(self, query_id):
+        with self.lock:
+            rows = self.conn.execute("SELECT url FROM seen_urls WHERE query_id = ?", (query_id,)).fetchall()
+        return {row['url'] for row in rows}
+
+    # marks and seen urls are written in one transaction, so a run that dies half way leaves the previous marks in place
+    def record_run(self, query_id, high_water_marks, new_urls):
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.executemany("INSERT OR IGNORE INTO seen_urls (query_id, url) VALUES (?, ?)", ((query_id, url) for url in new_urls))
+                self.conn.execute(
+                    "UPDATE queries SET high_water_marks = ?, last_run_at = ? WHERE id = ?",
+                    (json.dumps(high_water_marks), time.time(), query_id)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+
+def refresh_query(store, watch, storage_agent, search_agent=None, extraction_agent=None, timings=None, ranking_agent=None):
+    from pipeline import run_pipeline
+
+    seen = store.seen_urls(watch['id'])
+    already_seen = set(seen)
+    marks = dict(watch['high_water_marks'])
+    papers = run_pipeline(
+        watch['query'],
+        search_arxiv=bool(watch['search_arxiv']),
+        search_pubmed=bool(watch['search_pubmed']),
+        search_web=bool(watch['search_web']),
+        arxiv_limit=watch['arxiv_limit'],
+        pubmed_limit=watch['pubmed_limit'],
+        ddg_limit=watch['ddg_limit'],
+        search_agent=search_agent,
+        extraction_agent=extraction_agent,
+        storage_agent=storage_agent,
+        ranking_agent=ranking_agent,
+        timings=timings,
+        since=watch['high_water_marks'],
+        high_water_marks=marks,
+        seen_urls=seen,
+    )
+    store.record_run(watch['id'], marks, seen - already_seen)
+    return papers
+
+
+# queries are refreshed a few at a time, each one already searches its sources in parallel. rate_limits overrides
+# the session's requests per second for a source
+def refresh_all(store, library_path='library.jsonl', workers=4, search_agent=None, extraction_agent=None, timings=None, rate_limits=None):
+    from agents.search_agent import SearchAgent
+    from agents.extraction_agent import ExtractionAgent
+    from agents.ranking_agent import RankingAgent
+    from agents.storage_agent import StorageAgent
+    from ranking import PaperRanker
+    from session import make_rate_limiters
+
+    # the agents hold no per query state, so one of each is shared, the gemini client is only set up once and papers
+    # that several queries find are only vectorised once. they also share one set of rate limiters, so the queries
+    # refreshed at once stay within each api's limit together
+    search_agent = search_agent or SearchAgent()
+    extraction_agent = extraction_agent or ExtractionAgent()
+    ranking_agent = RankingAgent(PaperRanker())
+    rate_limiters = make_rate_limiters(rate_limits)
+    search_agent.rate_limiters = extraction_agent.rate_limiters = rate_limiters
+    watches = store.queries()
+
+    def refresh(watch):
+        try:
+            papers = refresh_query(store, watch, StorageAgent(library_path), search_agent, extraction_agent, timings, ranking_agent)
+            logger.info("Watch query '%s' found %s new papers.", watch['query'], len(papers))
+            return len(papers)
+        except Exception as e:
+            logger.error("Watch query '%s' failed: %s", watch['query'], e)
+            return 0
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip((watch['query'] for watch in watches), executor.map(refresh, watches)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Save standing queries and fetch only the papers that are new since their last run.")
+    parser.add_argument("--db", default="watch_queries.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="save a query to watch")
+    add.add_argument("query")
+    add.add_argument("--no-arxiv", action="store_true")
+    add.add_argument("--no-pubmed", action="store_true")
+    add.add_argument("--no-web", action="store_true")
+    add.add_argument("--arxiv-limit", type=int, default=20)
+    add.add_argument("--pubmed-limit", type=int, default=20)
+    add.add_argument("--ddg-limit", type=int, default=20)
+
+    remove = commands.add_parser("remove", help="stop watching a query")
+    remove.add_argument("query")
+
+    commands.add_parser("list", help="show the watched queries and when they last ran")
+
+    run = commands.add_parser("run", help="refresh every watched query")
+    run.add_argument("--library", default="library.jsonl", help="new papers are appended to this file")
+    run.add_argument("--workers", type=int, default=4, help="refresh this many queries at once")
+    args = parser.parse_args(argv)
+    configure_logging()
+
+    store = WatchStore(args.db)
+    try:
+        if args.command == "add":
+            store.add(args.query, not args.no_arxiv, not args.no_pubmed, not args.no_web, args.arxiv_limit, args.pubmed_limit, args.ddg_limit)
+            print(f"watching '{args.query}'")
+        elif args.command == "remove":
+            print(f"stopped watching '{args.query}'" if store.remove(args.query) else f"'{args.query}' was not being watched")
+        elif args.command == "list":
+            for watch in store.queries():
+                last_run = time.strftime('%Y-%m-%d %H:%M', time.localtime(watch['last_run_at'])) if watch['last_run_at'] else 'never'
+                print(f"{watch['query']}  (last run: {last_run})")
+        else:
+            start = time.perf_counter()
+            counts = refresh_all(store, args.library, args.workers)
+            print(f"refreshed {len(counts)} queries in {time.perf_counter() - start:.1f}s, appended {sum(counts.values())} new papers to {args.library}")
+    finally:
+        store.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
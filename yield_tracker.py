@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import deque
+
+from logging_config import logger
+from paper import PaperStatus
+
+# the counts from earlier runs are multiplied by this before each new run is added, so a source that got better or
+# worse is noticed within a few runs
+DECAY = 0.8
+# below this many candidates seen across runs the requested limits are used as they are
+MIN_HISTORY = 10
+# a source whose papers are usable at least this often keeps its full limit, one below it is cut in proportion
+TARGET_YIELD = 0.5
+# limits are never cut below this, so a source that improves can still show it
+MIN_LIMIT = 5
+# within a run a source stops being extracted once fewer than STOP_YIELD of its last WINDOW candidates were usable
+WINDOW = 5
+STOP_YIELD = 0.2
+
+# candidates that say nothing about how useful a source is are counted apart and left out of its yield, duplicates of a
+# paper another source returned first and fetches that failed on the network
+COUNTERS = ('candidates', 'usable', 'skipped', 'duplicates', 'errors', 'cost')
+TRANSIENT_STATUSES = frozenset({PaperStatus.FETCH_ERROR})
+
+
+# early stopping for the results of one source for one query. they are extracted in the order the search ranked
+# them, so once the recent ones stop being usable the rest are unlikely to be either
+class SourceRun:
+    def __init__(self, tracker, source):
+        self.tracker = tracker
+        self.source = source
+        self.recent = deque(maxlen=tracker.window)
+        self.lock = threading.Lock()
+
+    # with adaptation turned off the yield is still recorded but nothing is skipped
+    @property
+    def exhausted(self):
+        if not self.tracker.adaptive:
+            return False
+        with self.lock:
+            return len(self.recent) == self.recent.maxlen and sum(self.recent) < self.tracker.stop_yield * self.recent.maxlen
+
+    def record(self, usable, cost=0.0):
+        with self.lock:
+            self.recent.append(usable)
+        self.tracker.record(self.source, usable, cost)
+
+    # an extracted paper, duplicates and transient failures do not count towards the yield or the recent window
+    # but what was spent on them still does
+    def record_paper(self, paper, usable, duplicate=False, cost=0.0):
+        if duplicate or paper.status in TRANSIENT_STATUSES:
+            self.tracker.count(self.source, 'duplicates' if duplicate else 'errors')
+            self.tracker.count(self.source, 'cost', cost)
+        else:
+            self.record(usable, cost)
+
+    # checked before each extraction, a skipped candidate is counted but costs nothing
+    def skip(self):
+        if not self.exhausted:
+            return False
+        self.tracker.count(self.source, 'skipped')
+        return True
+
+
+# how many of the candidates each source returns turn out to be usable papers and what the extraction backends spent
+# on them, kept in a small json file across runs. the history sets how many candidates are asked for next time
+class YieldTracker:
+    def __init__(self, path='source_yield.json', adaptive=True, target_yield=TARGET_YIELD, min_limit=MIN_LIMIT,
+                 window=WINDOW, stop_yield=STOP_YIELD):
+        self.path = path
+        self.adaptive = adaptive
+        self.target_yield = target_yield
+        self.min_limit = min_limit
+        self.window = window
+        self.stop_yield = stop_yield
+        self.lock = threading.Lock()
+        self.history = self._load()
+        # counts not yet folded into the history, and everything counted since the tracker was made
+        self.current = {}
+        self.totals = {}
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)['sources']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not read source yield history from %s, starting over: %s", self.path, e)
+            return {}
+
+    def _counters(self, table, source):
+        return table.setdefault(source, dict.fromkeys(COUNTERS, 0))
+
+    def count(self, source, counter, amount=1):
+        with self.lock:
+            for table in (self.current, self.totals):
+                self._counters(table, source)[counter] += amount
+
+    def record(self, source, usable, cost=0.0):
+        with self.lock:
+            for table in (self.current, self.totals):
+                counters = self._counters(table, source)
+                counters['candidates'] += 1
+                counters['usable'] += bool(usable)
+                counters['cost'] += cost
+
+    def start(self, source):
+        return SourceRun(self, source)
+
+    # the share of a source's candidates that were usable, with one usable and one unusable candidate assumed up front
+    # so a handful of results do not swing it to either end
+    def expected_yield(self, source):
+        history = self.history.get(source)
+        if not history:
+            return None
+        return (history['usable'] + 1) / (history['candidates'] + 2)
+
+    # the limit to ask a source for, never more than was requested
+    def limit(self, source, requested):
+        history = self.history.get(source)
+        if not self.adaptive or not history or history['candidates'] < MIN_HISTORY:
+            return requested
+        expected = self.expected_yield(source)
+        if expected >= self.target_yield:
+            return requested
+        return max(min(self.min_limit, requested), math.ceil(requested * expected / self.target_yield))
+
+    # folds this run into the history and writes it out
+    def save(self):
+        with self.lock:
+            for source, counters in self.current.items():
+                history = self._counters(self.history, source)
+                for counter in COUNTERS:
+                    # histories written before a counter was added do not have it yet
+                    history[counter] = history.get(counter, 0) * DECAY + counters[counter]
+            self.current = {}
+            history = {source: dict(counters) for source, counters in self.history.items()}
+        if not self.path:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'sources': history}, f, indent=4)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            os.unlink(tmp_path)
+            logger.warning("Could not save source yield history to %s: %s", self.path, e)
+
+    # the counts for each source since the tracker was made, for the metrics output
+    def report(self):
+        with self.lock:
+            totals = {source: dict(counters) for source, counters in self.totals.items()}
+        report = {}
+        for source, counters in sorted(totals.items()):
+            candidates, usable = counters['candidates'], counters['usable']
+            report[source] = {
+                **counters,
+                'yield': usable / candidates if candidates else None,
+                'cost_per_usable': counters['cost'] / usable if usable else None,
+                'expected_yield': self.expected_yield(source),
+            }
+        return report
+
+    def summary(self):
+        parts = []
+        for source, stats in self.report().items():
+            part = f"{source} {stats['usable']}/{stats['candidates']} usable"
+            for counter in ('skipped', 'duplicates', 'errors'):
+                if stats[counter]:
+                    part += f", {stats[counter]} {counter}"
+            if stats['cost_per_usable'] is not None:
+                part += f", ${stats['cost_per_usable']:.4f} per usable paper"
+            parts.append(part)
+        return "; ".join(parts) or "no candidates"
+